@@ -10,20 +10,27 @@ from __future__ import print_function  # Python 2/3 compatibility
 from __future__ import with_statement
 
 import calendar
+import copy
 import datetime
+import decimal
 import json
 import locale
 import os
 import os.path
+import random
 import sys
 import syslog
+import threading
 import time
+import zlib
+from bisect import bisect_left, bisect_right
 from collections import OrderedDict
-from math import asin, atan2, cos, degrees, pi, radians, sin, sqrt
+from math import asin, atan2, cos, degrees, floor, pi, radians, sin, sqrt
 from re import match
 
 import configobj
 
+import weedb
 import weeutil.weeutil
 import weewx
 import weewx.reportengine
@@ -44,6 +51,7 @@ from weeutil.weeutil import (
     to_int,
 )
 from weewx.cheetahgenerator import SearchList
+from weewx.engine import StdService
 from weewx.tags import TimespanBinder
 
 if sys.version_info[0] >= 3:
@@ -107,193 +115,239 @@ class getData(SearchList):
     Collect all custom data and calculations, then return search list extension
     """
 
+    # The locale settings and the observation unit maps, keyed by the skin
+    # options they come from. Shared by all reports for the life of weewx.
+    locale_cache = {}
+    unit_maps_cache = {}
+
     def __init__(self, generator):
         SearchList.__init__(self, generator)
+        # Results of get_belchertown_data() for the current report cycle,
+        # keyed on the report generation time and the data binding.
+        self.cycle_cache = {}
+        # Compass sectors for the skin's ordinate names
+        self.compass = CompassSectors.for_skin(generator.skin_dict)
 
-    def get_gps_distance(self, pointA, pointB, distance_unit):
+    def get_gps_distances(self, pointA, points, distance_unit):
         """
+        The haversine distance and the bearing from pointA to each of
+        points, as [distance, cardinal direction, bearing] lists. Points are
+        (latitude, longitude) tuples in decimal degrees. The trigonometry of
+        pointA is only worked out once.
         https://www.geeksforgeeks.org/program-distance-two-points-earth/ and
-        https://stackoverflow.com/a/43960736 The math module contains a
-        function named radians which converts from degrees to radians.
-        """
-
-        if not isinstance((pointA, pointB), tuple):
-            raise TypeError("Only tuples are supported as arguments")
-        lat1 = pointA[0]
-        lon1 = pointA[1]
-        lat2 = pointB[0]
-        lon2 = pointB[1]
-        # convert decimal degrees to radians
-        lat1r, lon1r, lat2r, lon2r = map(radians, [lat1, lon1, lat2, lon2])
-        # Haversine formula
-        dlat = lat2r - lat1r
-        dlon = lon2r - lon1r
-        a = sin(dlat / 2) ** 2 + cos(lat1r) * cos(lat2r) * sin(dlon / 2) ** 2
-        c = 2 * asin(sqrt(a))
+        https://stackoverflow.com/a/43960736
+        """
         # Radius of earth in kilometers is 6371. Use 3956 for miles
         if distance_unit == "km":
             r = 6371
         else:
             # Assume mile
             r = 3956
-        bearing = self.get_gps_bearing(pointA, pointB)
-        # Returns distance as object 0 and bearing as object 1
-        return [(c * r), self.get_cardinal_direction(bearing), bearing]
-
-    def get_gps_bearing(self, pointA, pointB):
-        """
-        https://gist.github.com/jeromer/2005586
-        Calculates the bearing between two points.
-        :Parameters:
-          - pointA: The tuple representing the latitude/longitude for the
-            first point. Latitude and longitude must be in decimal degrees
-          - pointB: The tuple representing the latitude/longitude for the
-            second point. Latitude and longitude must be in decimal degrees
-        :Returns:
-          The bearing in degrees
-        :Returns Type:
-          float
-        """
-        if not isinstance((pointA, pointB), tuple):
-            raise TypeError("Only tuples are supported as arguments")
-        lat1 = radians(pointA[0])
-        lat2 = radians(pointB[0])
-        diffLong = radians(pointB[1] - pointA[1])
-        x = sin(diffLong) * cos(lat2)
-        y = cos(lat1) * sin(lat2) - (sin(lat1) * cos(lat2) * cos(diffLong))
-        initial_bearing = atan2(x, y)
-        # Now we have the initial bearing but math.atan2 return values
-        # from -180 to + 180 degrees which is not what we want for a compass bearing
-        # The solution is to normalize the initial bearing as shown below
-        initial_bearing = degrees(initial_bearing)
-        compass_bearing = (initial_bearing + 360) % 360
-        return compass_bearing
+        lat1r = radians(pointA[0])
+        lon1r = radians(pointA[1])
+        sin_lat1 = sin(lat1r)
+        cos_lat1 = cos(lat1r)
+        results = []
+        for lat2, lon2 in points:
+            lat2r = radians(lat2)
+            dlon = radians(lon2) - lon1r
+            sin_lat2 = sin(lat2r)
+            cos_lat2 = cos(lat2r)
+            cos_dlon = cos(dlon)
+            # Haversine formula
+            a = sin((lat2r - lat1r) / 2) ** 2 + cos_lat1 * cos_lat2 * sin(dlon / 2) ** 2
+            c = 2 * asin(min(1, sqrt(a)))
+            # Initial bearing, https://gist.github.com/jeromer/2005586
+            x = sin(dlon) * cos_lat2
+            y = cos_lat1 * sin_lat2 - (sin_lat1 * cos_lat2 * cos_dlon)
+            bearing = (degrees(atan2(x, y)) + 360) % 360
+            results.append([(c * r), self.get_cardinal_direction(bearing), bearing])
+        return results
 
     def get_cardinal_direction(self, degree, return_only_labels=False):
-        default_ordinate_names = [
-            "N",
-            "NNE",
-            "NE",
-            "ENE",
-            "E",
-            "ESE",
-            "SE",
-            "SSE",
-            "S",
-            "SSW",
-            "SW",
-            "WSW",
-            "W",
-            "WNW",
-            "NW",
-            "NNW",
-            "N/A",
-        ]
-        try:
-            ordinate_names = weeutil.weeutil.option_as_list(
-                self.generator.skin_dict["Units"]["Ordinates"]["directions"]
-            )
-        except KeyError:
-            ordinate_names = default_ordinate_names
-
         if return_only_labels:
-            return ordinate_names
-
-        if 0 <= degree <= 11.25:
-            return ordinate_names[0]
-        if 11.26 <= degree <= 33.75:
-            return ordinate_names[1]
-        if 33.76 <= degree <= 56.25:
-            return ordinate_names[2]
-        if 56.26 <= degree <= 78.75:
-            return ordinate_names[3]
-        if 78.76 <= degree <= 101.25:
-            return ordinate_names[4]
-        if 101.26 <= degree <= 123.75:
-            return ordinate_names[5]
-        if 123.76 <= degree <= 146.25:
-            return ordinate_names[6]
-        if 146.26 <= degree <= 168.75:
-            return ordinate_names[7]
-        if 168.76 <= degree <= 191.25:
-            return ordinate_names[8]
-        if 191.26 <= degree <= 213.75:
-            return ordinate_names[9]
-        if 213.76 <= degree <= 236.25:
-            return ordinate_names[10]
-        if 236.26 <= degree <= 258.75:
-            return ordinate_names[11]
-        if 258.76 <= degree <= 281.25:
-            return ordinate_names[12]
-        if 281.26 <= degree <= 303.75:
-            return ordinate_names[13]
-        if 303.76 <= degree <= 326.25:
-            return ordinate_names[14]
-        if 326.26 <= degree <= 348.75:
-            return ordinate_names[15]
-        if 348.76 <= degree <= 360:
-            return ordinate_names[0]
+            return self.compass.labels
+        return self.compass.name(degree)
 
-    def get_extension_list(self, timespan, db_lookup):
+    def get_range_record(self, record, obs_type, db_converter):
         """
-        Build the data needed for the Belchertown skin
+        Convert a daily range record [dateTime, total, min, max] from the
+        database unit to the skin's unit and format it. The range is
+        recalculated from the converted min and max since the unit may have
+        changed. Returns zeroes with the current time if there is no record.
         """
+        if record is None:
+            return [
+                calendar.timegm(time.gmtime()),
+                locale.format_string("%.1f", 0),
+                locale.format_string("%.1f", 0),
+                locale.format_string("%.1f", 0),
+            ]
 
-        global aqi
-        global aqi_category
-        global aqi_time
-        global aqi_location
+        # Find the unit group and the database unit for the observation
+        obs_group = weewx.units.obs_group_dict.get(obs_type)
+        obs_unit = db_converter.group_unit_dict.get(obs_group)
 
-        # Look for the debug flag which can be used to show more logging
-        weewx.debug = int(self.generator.config_dict.get("debug", 0))
+        # Find the number of decimals to round to based on the skin.conf
+        skin_obs_unit = self.generator.converter.group_unit_dict.get(obs_group)
+        obs_round = self.generator.skin_dict["Units"]["StringFormats"].get(
+            skin_obs_unit, "%.1f"
+        )
 
-        # Setup label dict for text and titles
-        try:
-            d = self.generator.skin_dict["Labels"]["Generic"]
-        except KeyError:
-            d = {}
-        label_dict = weeutil.weeutil.KeyDict(d)
+        # Min and max for this day
+        range_min = (
+            obs_round
+            % self.generator.converter.convert((record[2], obs_unit, obs_group))[0]
+        )
+        range_max = (
+            obs_round
+            % self.generator.converter.convert((record[3], obs_unit, obs_group))[0]
+        )
+        # Daily range total
+        range_total = obs_round % (float(range_max) - float(range_min))
+        # Replace the database values with the converted values
+        return [
+            record[0],
+            locale.format_string("%g", float(range_total)),
+            locale.format_string("%g", float(range_min)),
+            locale.format_string("%g", float(range_max)),
+        ]
+
+    def get_extension_list(self, timespan, db_lookup):
+        """
+        Return the search list extension for a template. CheetahGenerator
+        calls this once per template, so the skin data is built once per
+        report cycle and re-used by every template in that cycle. Set
+        belchertown_cycle_cache = 0 in Extras to rebuild it for every template.
+        """
 
-        # Setup database manager
         binding = self.generator.config_dict["StdReport"].get(
             "data_binding", "wx_binding"
         )
-        manager = self.generator.db_binder.get_manager(binding)
-
-        belchertown_debug = self.generator.skin_dict["Extras"].get(
-            "belchertown_debug", 0
+        cache_key = (self.generator.gen_ts, binding)
+        cycle_cache_enabled = to_bool(
+            self.generator.skin_dict["Extras"].get("belchertown_cycle_cache", 1)
         )
 
-        # Find the right HTML ROOT
-        if "HTML_ROOT" in self.generator.skin_dict:
-            html_root = os.path.join(
-                self.generator.config_dict["WEEWX_ROOT"],
-                self.generator.skin_dict["HTML_ROOT"],
-            )
+        if cycle_cache_enabled and cache_key in self.cycle_cache:
+            search_list_extension = dict(self.cycle_cache[cache_key])
         else:
-            html_root = os.path.join(
-                self.generator.config_dict["WEEWX_ROOT"],
-                self.generator.config_dict["StdReport"]["HTML_ROOT"],
-            )
+            search_list_extension = self.get_belchertown_data(db_lookup)
+            if cycle_cache_enabled:
+                # Only keep the current cycle around
+                self.cycle_cache = {cache_key: search_list_extension}
+                search_list_extension = dict(search_list_extension)
 
-        # Setup UTC offset hours for moment.js in index.html
-        moment_js_stop_struct = time.localtime(time.time())
-        moment_js_utc_offset = (
-            calendar.timegm(moment_js_stop_struct)
-            - calendar.timegm(time.gmtime(time.mktime(moment_js_stop_struct)))
-        ) / 60
+        # This portion is right from the weewx sample
+        # http://www.weewx.com/docs/customizing.htm
+        # The all time stats depend on the template's timespan, so they are
+        # never cached.
+        search_list_extension["alltime"] = TimespanBinder(
+            timespan,
+            db_lookup,
+            formatter=self.generator.formatter,
+            converter=self.generator.converter,
+            skin_dict=self.generator.skin_dict,
+        )
 
-        try:
-            moment_js_tz = self.generator.skin_dict["Units"]["TimeZone"].get("time_zone")
-        except KeyError:
-            moment_js_tz = ""
+        # Finally, return our extension as a list:
+        return [search_list_extension]
 
-# Highcharts UTC offset is the opposite of normal. Positive values are
-        # west, negative values are east of UTC.
-        # https://api.highcharts.com/highcharts/time.timezoneOffset Multiplying
-        # by -1 will reverse the number sign and keep 0 (not -0).
-        # https://stackoverflow.com/a/14053631/1177153
-        highcharts_timezoneoffset = moment_js_utc_offset * -1
+    def get_earthquake_events(
+        self, eqdata, earthquake_server, distance_unit, system_locale
+    ):
+        """
+        The events in an earthquake feed as dicts of time (unix epoch), url,
+        place, mag, lat and lon. Events that can't be read are skipped.
+        """
+        events = []
+        if not isinstance(eqdata, dict):
+            return events
+        for feature in eqdata.get("features", []):
+            try:
+                properties = feature["properties"]
+                if earthquake_server == "USGS":
+                    eqtime = properties["time"] / 1000
+                    equrl = properties["url"]
+                    eqplace = properties["place"]
+                    if distance_unit != "km":  # assume miles
+                        eqmatched = match(
+                            "(?P<distance>[0-9]*\\.?[0-9]+) km(?P<rest>.*)$", eqplace
+                        )
+                        if eqmatched:
+                            eqdist_miles = round(
+                                float(eqmatched.group("distance")) / 1.609, 1
+                            )
+                            eqplace = (
+                                str(eqdist_miles) + " miles" + eqmatched.group("rest")
+                            )
+                    eqmag = float(properties["mag"])
+                elif earthquake_server == "ReNaSS":
+                    # convert time to UNIX format
+                    eqtime = datetime.datetime.strptime(
+                        properties["time"], "%Y-%m-%dT%H:%M:%S.%fZ"
+                    )
+                    eqtime = int(
+                        (eqtime - datetime.datetime(1970, 1, 1)).total_seconds()
+                    )
+                    if match("fr_.*", system_locale):
+                        equrl = properties["url"]["fr"]
+                        eqplace = properties["description"]["fr"]
+                    else:
+                        equrl = properties["url"]["en"]
+                        eqplace = properties["description"]["en"]
+                    eqmag = float(properties["mag"])
+                elif earthquake_server == "GeoNet":
+                    # convert time to UNIX format
+                    eqtime = datetime.datetime.strptime(
+                        properties["time"], "%Y-%m-%dT%H:%M:%S.%fZ"
+                    )
+                    eqtime = int(
+                        (eqtime - datetime.datetime(1970, 1, 1)).total_seconds()
+                    )
+                    equrl = (
+                        "https://www.geonet.org.nz/earthquake/" + properties["publicID"]
+                    )
+                    eqplace = properties["locality"]
+                    eqmag = float(round(properties["magnitude"], 1))
+                else:
+                    return events
+                events.append(
+                    {
+                        "time": eqtime,
+                        "url": equrl,
+                        "place": eqplace,
+                        "mag": eqmag,
+                        "lat": round(feature["geometry"]["coordinates"][1], 4),
+                        "lon": round(feature["geometry"]["coordinates"][0], 4),
+                    }
+                )
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue
+        return events
+
+    def get_locale_settings(self, belchertown_debug):
+        """
+        The locale for moment.js and the Highcharts decimal and thousands
+        separators: (system_locale, locale_encoding, system_locale_js,
+        highcharts_decimal, highcharts_thousands). They only depend on the
+        skin options, so they are worked out once per set of options.
+        """
+        extras = self.generator.skin_dict["Extras"]
+        cache_key = (
+            extras["belchertown_locale"],
+            extras.get("highcharts_decimal", None),
+            extras.get("highcharts_thousands", None),
+        )
+        if cache_key in self.locale_cache:
+            settings, process_locale = self.locale_cache[cache_key]
+            if process_locale != locale.setlocale(locale.LC_ALL):
+                # Another report changed the locale of the process
+                try:
+                    locale.setlocale(locale.LC_ALL, process_locale)
+                except Exception:
+                    pass
+            return settings
 
         # If theme locale is auto, get the system locale for use with
         # moment.js, and the system decimal for use with highcharts
@@ -364,6 +418,139 @@ class getData(SearchList):
                 # Locale not found, default back to a comma
                 highcharts_thousands = ","
 
+        settings = (
+            system_locale,
+            locale_encoding,
+            system_locale_js,
+            highcharts_decimal,
+            highcharts_thousands,
+        )
+        self.locale_cache[cache_key] = (settings, locale.setlocale(locale.LC_ALL))
+        return settings
+
+    def get_obs_unit_maps(self):
+        """
+        The rounding and the unit label of every observation type, for the
+        JavaScript. They only change with the skin's units and the known
+        observation types, so they are cached on those. Returns copies the
+        caller can add to.
+        """
+        cache_key = (
+            str(self.generator.skin_dict.get("Units", {})),
+            tuple(sorted(self.generator.converter.group_unit_dict.items())),
+            tuple(sorted(weewx.units.obs_group_dict.items())),
+        )
+        if cache_key not in self.unit_maps_cache:
+            all_obs_rounding_json = OrderedDict()
+            all_obs_unit_labels_json = OrderedDict()
+            for obs in sorted(weewx.units.obs_group_dict):
+                try:
+                    # Find the unit from group (like group_temperature = degree_F)
+                    obs_group = weewx.units.obs_group_dict[obs]
+                    obs_unit = self.generator.converter.group_unit_dict[obs_group]
+                except:
+                    # Something's wrong. Continue this loop to ignore this group
+                    # (like group_dust or something non-standard)
+                    continue
+                try:
+                    # Find the number of decimals to round to based on group name
+                    obs_round = self.generator.skin_dict["Units"][
+                        "StringFormats"
+                    ].get(obs_unit, "0")[2]
+                except:
+                    obs_round = self.generator.skin_dict["Units"][
+                        "StringFormats"
+                    ].get(obs_unit, "0")
+                # Add to the rounding array
+                if obs not in all_obs_rounding_json:
+                    all_obs_rounding_json[obs] = str(obs_round)
+                # Get the unit's label
+                # Add to label array and strip whitespace if possible
+                if obs not in all_obs_unit_labels_json:
+                    obs_unit_label = weewx.units.get_label_string(
+                        self.generator.formatter, self.generator.converter, obs
+                    )
+                    all_obs_unit_labels_json[obs] = obs_unit_label
+            if len(self.unit_maps_cache) >= 8:
+                self.unit_maps_cache.clear()
+            self.unit_maps_cache[cache_key] = (
+                all_obs_rounding_json,
+                all_obs_unit_labels_json,
+            )
+        all_obs_rounding_json, all_obs_unit_labels_json = self.unit_maps_cache[
+            cache_key
+        ]
+        return OrderedDict(all_obs_rounding_json), OrderedDict(all_obs_unit_labels_json)
+
+    def get_belchertown_data(self, db_lookup):
+        """
+        Build the data needed for the Belchertown skin
+        """
+
+        global aqi
+        global aqi_category
+        global aqi_time
+        global aqi_location
+
+        # Look for the debug flag which can be used to show more logging
+        weewx.debug = int(self.generator.config_dict.get("debug", 0))
+
+        # Setup label dict for text and titles
+        try:
+            d = self.generator.skin_dict["Labels"]["Generic"]
+        except KeyError:
+            d = {}
+        label_dict = weeutil.weeutil.KeyDict(d)
+
+        # Setup database manager
+        binding = self.generator.config_dict["StdReport"].get(
+            "data_binding", "wx_binding"
+        )
+        manager = self.generator.db_binder.get_manager(binding)
+
+        belchertown_debug = self.generator.skin_dict["Extras"].get(
+            "belchertown_debug", 0
+        )
+
+        # Find the right HTML ROOT
+        if "HTML_ROOT" in self.generator.skin_dict:
+            html_root = os.path.join(
+                self.generator.config_dict["WEEWX_ROOT"],
+                self.generator.skin_dict["HTML_ROOT"],
+            )
+        else:
+            html_root = os.path.join(
+                self.generator.config_dict["WEEWX_ROOT"],
+                self.generator.config_dict["StdReport"]["HTML_ROOT"],
+            )
+
+        # Setup UTC offset hours for moment.js in index.html
+        moment_js_stop_struct = time.localtime(time.time())
+        moment_js_utc_offset = (
+            calendar.timegm(moment_js_stop_struct)
+            - calendar.timegm(time.gmtime(time.mktime(moment_js_stop_struct)))
+        ) / 60
+
+        try:
+            moment_js_tz = self.generator.skin_dict["Units"]["TimeZone"].get("time_zone")
+        except KeyError:
+            moment_js_tz = ""
+
+# Highcharts UTC offset is the opposite of normal. Positive values are
+        # west, negative values are east of UTC.
+        # https://api.highcharts.com/highcharts/time.timezoneOffset Multiplying
+        # by -1 will reverse the number sign and keep 0 (not -0).
+        # https://stackoverflow.com/a/14053631/1177153
+        highcharts_timezoneoffset = moment_js_utc_offset * -1
+
+        (
+            system_locale,
+            locale_encoding,
+            system_locale_js,
+            highcharts_decimal,
+            highcharts_thousands,
+        ) = self.get_locale_settings(belchertown_debug)
+
         # Get the archive interval for the highcharts gapsize
         try:
             archive_interval_ms = (
@@ -384,64 +571,40 @@ class getData(SearchList):
         # ('week', ['chart1', 'chart5', 'chart6', 'chart2', 'chart3', 'chart4']),
         # ('month', ['this_is_chart1', 'chart2_is_here', 'chart3', 'windSpeed_and_windDir', 'chart5', 'chart6', 'chart7']),
         # ('year', ['chart1', 'chart2', 'chart3', 'chart4', 'chart5'])])
-        chart_config_path = os.path.join(
-            self.generator.config_dict["WEEWX_ROOT"],
-            self.generator.skin_dict["SKIN_ROOT"],
-            self.generator.skin_dict.get("skin", ""),
-            "graphs.conf",
-        )
-        default_chart_config_path = os.path.join(
-            self.generator.config_dict["WEEWX_ROOT"],
-            self.generator.skin_dict["SKIN_ROOT"],
-            self.generator.skin_dict.get("skin", ""),
-            "graphs.conf.example",
+        chart_plan = ChartPlan.for_skin(
+            self.generator.config_dict, self.generator.skin_dict
         )
-        if os.path.exists(chart_config_path):
-            chart_dict = configobj.ConfigObj(chart_config_path, file_error=True)
-        else:
-            chart_dict = configobj.ConfigObj(default_chart_config_path, file_error=True)
         charts = OrderedDict()
-        for chart_timespan in chart_dict.sections:
-            timespan_chart_list = []
-            for plotname in chart_dict[chart_timespan].sections:
-                if plotname not in timespan_chart_list:
-                    timespan_chart_list.append(plotname)
-            charts[chart_timespan] = timespan_chart_list
+        for chart_group in chart_plan.groups:
+            charts[chart_group.name] = [plot.name for plot in chart_group.plots]
 
         # Create a dict of chart group titles for use on the graphs page
         # header. If no title defined, use the chart group name
         graphpage_titles = OrderedDict()
-        for chartgroup in chart_dict.sections:
-            if "title" in chart_dict[chartgroup]:
-                graphpage_titles[chartgroup] = chart_dict[chartgroup]["title"]
-            else:
-                graphpage_titles[chartgroup] = chartgroup
+        for chart_group in chart_plan.groups:
+            graphpage_titles[chart_group.name] = chart_group.scalars.get(
+                "title", chart_group.name
+            )
 
         # Create a dict of chart group page content for use on the graphs page
         # below the header.
         graphpage_content = OrderedDict()
-        for chartgroup in chart_dict.sections:
-            if "page_content" in chart_dict[chartgroup]:
-                graphpage_content[chartgroup] = chart_dict[chartgroup]["page_content"]
+        for chart_group in chart_plan.groups:
+            if "page_content" in chart_group.scalars:
+                graphpage_content[chart_group.name] = chart_group.scalars[
+                    "page_content"
+                ]
 
         # Setup the Graphs page button row based on the skin extras option and
         # the button_text from graphs.conf
         graph_page_buttons = ""
-        graph_page_graphgroup_buttons = []
-        for chartgroup in chart_dict.sections:
-            if (
-                "show_button" in chart_dict[chartgroup]
-                and chart_dict[chartgroup]["show_button"].lower() == "true"
-            ):
-                graph_page_graphgroup_buttons.append(chartgroup)
-        for gg in graph_page_graphgroup_buttons:
-            if "button_text" in chart_dict[gg]:
-                button_text = chart_dict[gg]["button_text"]
-            else:
-                button_text = gg
+        for chart_group in chart_plan.groups:
+            if chart_group.scalars.get("show_button", "").lower() != "true":
+                continue
+            button_text = chart_group.scalars.get("button_text", chart_group.name)
             graph_page_buttons += (
                 '<a href="./?graph='
-                + gg
+                + chart_group.name
                 + '"><button type="button" class="btn btn-primary">'
                 + button_text
                 + "</button></a>"
@@ -527,12 +690,10 @@ class getData(SearchList):
 
         wx_manager = db_lookup()
 
-        # Find the beginning of the current year
+        # Find the beginning of today. The records engine works out the
+        # current year from it.
         now = datetime.datetime.now()
-        date_time = "01/01/%s 00:00:00" % now.year
         pattern = "%m/%d/%Y %H:%M:%S"
-        year_start_epoch = int(time.mktime(time.strptime(date_time, pattern)))
-
         date_time = "%s/%s/%s 00:00:00" % (now.month, now.day, now.year)
         today_start_epoch = int(time.mktime(time.strptime(date_time, pattern)))
 
@@ -544,205 +705,74 @@ class getData(SearchList):
         # Bind to the appropriate standard converter units
         converter = weewx.units.StdUnitConverters[target_unit]
 
-        # Temperature Range Lookups
-
-        # 1. The database query finds the result based off the total column.
-        # 2. We need to convert the min, max to the site's requested unit.
-        # 3. We need to recalculate the min/max range because the unit may have changed.
-
-        year_outTemp_max_range_query = wx_manager.getSql(
-            "SELECT dateTime, ROUND( (max - min), 1 ) as total, ROUND( min, 1 ) as min, ROUND( max, 1 ) as max FROM archive_day_outTemp WHERE dateTime >= %s AND dateTime < %s AND min IS NOT NULL AND max IS NOT NULL ORDER BY total DESC LIMIT 1;"
-            % (year_start_epoch, today_start_epoch)
-        )
-        year_outTemp_min_range_query = wx_manager.getSql(
-            "SELECT dateTime, ROUND( (max - min), 1 ) as total, ROUND( min, 1 ) as min, ROUND( max, 1 ) as max FROM archive_day_outTemp WHERE dateTime >= %s AND dateTime < %s AND min IS NOT NULL AND max IS NOT NULL ORDER BY total ASC LIMIT 1;"
-            % (year_start_epoch, today_start_epoch)
-        )
-        at_outTemp_max_range_query = wx_manager.getSql(
-            "SELECT dateTime, ROUND( (max - min), 1 ) as total, ROUND( min, 1 ) as min, ROUND( max, 1 ) as max FROM archive_day_outTemp WHERE dateTime < %s AND min IS NOT NULL AND max IS NOT NULL ORDER BY total DESC LIMIT 1;"
-            % today_start_epoch
-        )
-        at_outTemp_min_range_query = wx_manager.getSql(
-            "SELECT dateTime, ROUND( (max - min), 1 ) as total, ROUND( min, 1 ) as min, ROUND( max, 1 ) as max FROM archive_day_outTemp WHERE dateTime < %s AND min IS NOT NULL AND max IS NOT NULL ORDER BY total ASC LIMIT 1;"
-            % today_start_epoch
+        # The records are kept up to date incrementally by the records engine
+        # instead of scanning the daily summaries on every report cycle.
+        # Observations to keep largest/smallest daily range records for.
+        # outTemp is always needed for the Records page.
+        range_observations = self.generator.skin_dict["Extras"].get(
+            "records_daily_range_observations", "outTemp"
         )
-
-        # Find the group_name for outTemp in database
-        outTemp_unit = converter.group_unit_dict["group_temperature"]
-
-        # Find the group_name for outTemp from the skin.conf
-        skin_outTemp_unit = self.generator.converter.group_unit_dict[
-            "group_temperature"
-        ]
-
-        # Find the number of decimals to round to based on the skin.conf
-        outTemp_round = self.generator.skin_dict["Units"]["StringFormats"].get(
-            skin_outTemp_unit, "%.1f"
+        if isinstance(range_observations, list) is False:
+            range_observations = range_observations.split()
+        if "outTemp" not in range_observations:
+            range_observations = ["outTemp"] + range_observations
+
+        # Only observations with a daily summary have daily range records
+        daykeys = getattr(wx_manager, "daykeys", ())
+        for obs in range_observations:
+            if obs not in daykeys:
+                logerr(
+                    "records_daily_range_observations: %s has no daily summary "
+                    "(archive_day_%s) and is skipped" % (obs, obs)
+                )
+        tracked_observations = [obs for obs in range_observations if obs in daykeys]
+
+        # Reports on the same binding can track different observations, so
+        # each list of observations has its own engine
+        engine_key = (binding, tuple(tracked_observations))
+        if engine_key not in records_engines:
+            # outTemp ranges are rounded to 1 decimal like the original SQL
+            # queries did.
+            records_engines[engine_key] = BelchertownRecords(
+                [
+                    DailyRangeRecords(obs, 1 if obs == "outTemp" else None)
+                    for obs in tracked_observations
+                ]
+                + [RainRecords(), RainStreakRecords()]
+            )
+            # Optionally check the incremental records against a full rebuild
+            # once when weewx starts.
+            if to_bool(
+                self.generator.skin_dict["Extras"].get("belchertown_records_verify", 0)
+            ):
+                records_engines[engine_key].verify(wx_manager, today_start_epoch)
+        records = records_engines[engine_key].get_records(
+            wx_manager, today_start_epoch
         )
 
-        # Largest Daily Temperature Range Conversions
-        # Max temperature for this day
-        if year_outTemp_max_range_query is not None:
-            year_outTemp_max_range_max_tuple = (
-                year_outTemp_max_range_query[3],
-                outTemp_unit,
-                "group_temperature",
-            )
-            year_outTemp_max_range_max = (
-                outTemp_round
-                % self.generator.converter.convert(year_outTemp_max_range_max_tuple)[0]
-            )
-            # Min temperature for this day
-            year_outTemp_max_range_min_tuple = (
-                year_outTemp_max_range_query[2],
-                outTemp_unit,
-                "group_temperature",
-            )
-            year_outTemp_max_range_min = (
-                outTemp_round
-                % self.generator.converter.convert(year_outTemp_max_range_min_tuple)[0]
-            )
-            # Largest Daily Temperature Range total
-            year_outTemp_max_range_total = outTemp_round % (
-                float(year_outTemp_max_range_max) - float(year_outTemp_max_range_min)
-            )
-            # Replace the SQL Query output with the converted values
-            year_outTemp_range_max = [
-                year_outTemp_max_range_query[0],
-                locale.format_string("%g", float(year_outTemp_max_range_total)),
-                locale.format_string("%g", float(year_outTemp_max_range_min)),
-                locale.format_string("%g", float(year_outTemp_max_range_max)),
-            ]
-        else:
-            year_outTemp_range_max = [
-                calendar.timegm(time.gmtime()),
-                locale.format_string("%.1f", 0),
-                locale.format_string("%.1f", 0),
-                locale.format_string("%.1f", 0),
-            ]
-
-        # Smallest Daily Temperature Range Conversions
-        # Max temperature for this day
-        if year_outTemp_min_range_query is not None:
-            year_outTemp_min_range_max_tuple = (
-                year_outTemp_min_range_query[3],
-                outTemp_unit,
-                "group_temperature",
-            )
-            year_outTemp_min_range_max = (
-                outTemp_round
-                % self.generator.converter.convert(year_outTemp_min_range_max_tuple)[0]
-            )
-            # Min temperature for this day
-            year_outTemp_min_range_min_tuple = (
-                year_outTemp_min_range_query[2],
-                outTemp_unit,
-                "group_temperature",
-            )
-            year_outTemp_min_range_min = (
-                outTemp_round
-                % self.generator.converter.convert(year_outTemp_min_range_min_tuple)[0]
-            )
-            # Smallest Daily Temperature Range total
-            year_outTemp_min_range_total = outTemp_round % (
-                float(year_outTemp_min_range_max) - float(year_outTemp_min_range_min)
-            )
-            # Replace the SQL Query output with the converted values
-            year_outTemp_range_min = [
-                year_outTemp_min_range_query[0],
-                locale.format_string("%g", float(year_outTemp_min_range_total)),
-                locale.format_string("%g", float(year_outTemp_min_range_min)),
-                locale.format_string("%g", float(year_outTemp_min_range_max)),
-            ]
-        else:
-            year_outTemp_range_min = [
-                calendar.timegm(time.gmtime()),
-                locale.format_string("%.1f", 0),
-                locale.format_string("%.1f", 0),
-                locale.format_string("%.1f", 0),
-            ]
+        # Daily Range Lookups
 
-        # All Time - Largest Daily Temperature Range Conversions
-        # Max temperature
-        if at_outTemp_max_range_query is not None:
-            at_outTemp_max_range_max_tuple = (
-                at_outTemp_max_range_query[3],
-                outTemp_unit,
-                "group_temperature",
-            )
-            at_outTemp_max_range_max = (
-                outTemp_round
-                % self.generator.converter.convert(at_outTemp_max_range_max_tuple)[0]
-            )
-            # Min temperature for this day
-            at_outTemp_max_range_min_tuple = (
-                at_outTemp_max_range_query[2],
-                outTemp_unit,
-                "group_temperature",
-            )
-            at_outTemp_max_range_min = (
-                outTemp_round
-                % self.generator.converter.convert(at_outTemp_max_range_min_tuple)[0]
-            )
-            # Largest Daily Temperature Range total
-            at_outTemp_max_range_total = outTemp_round % (
-                float(at_outTemp_max_range_max) - float(at_outTemp_max_range_min)
-            )
-            # Replace the SQL Query output with the converted values
-            at_outTemp_range_max = [
-                at_outTemp_max_range_query[0],
-                locale.format_string("%g", float(at_outTemp_max_range_total)),
-                locale.format_string("%g", float(at_outTemp_max_range_min)),
-                locale.format_string("%g", float(at_outTemp_max_range_max)),
-            ]
-        else:
-            at_outTemp_range_max = [
-                calendar.timegm(time.gmtime()),
-                locale.format_string("%.1f", 0),
-                locale.format_string("%.1f", 0),
-                locale.format_string("%.1f", 0),
-            ]
+        # 1. The records engine finds the result based off the total column.
+        # 2. We need to convert the min, max to the site's requested unit.
+        # 3. We need to recalculate the min/max range because the unit may have changed.
+        daily_range_records = OrderedDict()
+        for obs in range_observations:
+            daily_range_records[obs] = {}
+            # Skipped observations get the empty records
+            obs_records = records.get(
+                "%s_range" % obs,
+                dict.fromkeys(("year_max", "year_min", "at_max", "at_min")),
+            )
+            for key, record in obs_records.items():
+                daily_range_records[obs][key] = self.get_range_record(
+                    record, obs, converter
+                )
 
-        # All Time - Smallest Daily Temperature Range Conversions
-        # Max temperature for this day
-        if at_outTemp_min_range_query is not None:
-            at_outTemp_min_range_max_tuple = (
-                at_outTemp_min_range_query[3],
-                outTemp_unit,
-                "group_temperature",
-            )
-            at_outTemp_min_range_max = (
-                outTemp_round
-                % self.generator.converter.convert(at_outTemp_min_range_max_tuple)[0]
-            )
-            # Min temperature for this day
-            at_outTemp_min_range_min_tuple = (
-                at_outTemp_min_range_query[2],
-                outTemp_unit,
-                "group_temperature",
-            )
-            at_outTemp_min_range_min = (
-                outTemp_round
-                % self.generator.converter.convert(at_outTemp_min_range_min_tuple)[0]
-            )
-            # Smallest Daily Temperature Range total
-            at_outTemp_min_range_total = outTemp_round % (
-                float(at_outTemp_min_range_max) - float(at_outTemp_min_range_min)
-            )
-            # Replace the SQL Query output with the converted values
-            at_outTemp_range_min = [
-                at_outTemp_min_range_query[0],
-                locale.format_string("%g", float(at_outTemp_min_range_total)),
-                locale.format_string("%g", float(at_outTemp_min_range_min)),
-                locale.format_string("%g", float(at_outTemp_min_range_max)),
-            ]
-        else:
-            at_outTemp_range_min = [
-                calendar.timegm(time.gmtime()),
-                locale.format_string("%.1f", 0),
-                locale.format_string("%.1f", 0),
-                locale.format_string("%.1f", 0),
-            ]
+        # Largest and smallest daily temperature range for the year and all time
+        year_outTemp_range_max = daily_range_records["outTemp"]["year_max"]
+        year_outTemp_range_min = daily_range_records["outTemp"]["year_min"]
+        at_outTemp_range_max = daily_range_records["outTemp"]["at_max"]
+        at_outTemp_range_min = daily_range_records["outTemp"]["at_min"]
 
         # Rain lookups
         # Find the group_name for rain in database
@@ -756,11 +786,8 @@ class getData(SearchList):
             skin_rain_unit, "%.2f"
         )
 
-        # Rainiest Day
-        rainiest_day_query = wx_manager.getSql(
-            "SELECT dateTime, sum FROM archive_day_rain WHERE dateTime >= %s ORDER BY sum DESC LIMIT 1;"
-            % year_start_epoch
-        )
+        # Rainiest Day. Record is [dateTime, sum]
+        rainiest_day_query = records["rain"]["year_day"]
         if rainiest_day_query is not None:
             rainiest_day_tuple = (rainiest_day_query[1], rain_unit, "group_rain")
             rainiest_day_converted = (
@@ -774,9 +801,7 @@ class getData(SearchList):
             rainiest_day = [calendar.timegm(time.gmtime()), locale.format_string("%.2f", 0)]
 
         # All Time Rainiest Day
-        at_rainiest_day_query = wx_manager.getSql(
-            "SELECT dateTime, sum FROM archive_day_rain ORDER BY sum DESC LIMIT 1"
-        )
+        at_rainiest_day_query = records["rain"]["at_day"]
         at_rainiest_day_tuple = (at_rainiest_day_query[1], rain_unit, "group_rain")
         at_rainiest_day_converted = (
             rain_round % self.generator.converter.convert(at_rainiest_day_tuple)[0]
@@ -786,47 +811,11 @@ class getData(SearchList):
             locale.format_string("%g", float(at_rainiest_day_converted)),
         ]
 
-        # Find what kind of database we're working with and specify the
-        # correctly tailored SQL Query for each type of database
-        data_binding = self.generator.config_dict["StdArchive"]["data_binding"]
-        database = self.generator.config_dict["DataBindings"][data_binding]["database"]
-        database_type = self.generator.config_dict["Databases"][database][
-            "database_type"
-        ]
-        driver = self.generator.config_dict["DatabaseTypes"][database_type]["driver"]
-        if driver == "weedb.sqlite":
-            year_rainiest_month_sql = (
-                'SELECT strftime("%%m", datetime(dateTime, "unixepoch", "localtime")) as month, SUM( sum ) as total FROM archive_day_rain WHERE strftime("%%Y", datetime(dateTime, "unixepoch", "localtime")) = "%s" GROUP BY month ORDER BY total DESC LIMIT 1;'
-                % time.strftime("%Y", time.localtime(time.time()))
-            )
-            at_rainiest_month_sql = 'SELECT strftime("%m", datetime(dateTime, "unixepoch", "localtime")) as month, strftime("%Y", datetime(dateTime, "unixepoch", "localtime")) as year, SUM( sum ) as total FROM archive_day_rain GROUP BY month, year ORDER BY total DESC LIMIT 1;'
-            year_rain_data_sql = (
-                'SELECT dateTime, sum FROM archive_day_rain WHERE strftime("%%Y", datetime(dateTime, "unixepoch", "localtime")) = "%s" AND count > 0;'
-                % time.strftime("%Y", time.localtime(time.time()))
-            )
-            # The all stats from http://www.weewx.com/docs/customizing.htm
-            # doesn't seem to calculate "Total Rainfall for" all time stat
-            # correctly.
-            at_rain_highest_year_sql = 'SELECT strftime("%Y", datetime(dateTime, "unixepoch", "localtime")) as year, SUM( sum ) as total FROM archive_day_rain GROUP BY year ORDER BY total DESC LIMIT 1;'
-        elif driver == "weedb.mysql":
-            year_rainiest_month_sql = 'SELECT FROM_UNIXTIME( dateTime, "%%m" ) AS month, ROUND( SUM( sum ), 2 ) AS total FROM archive_day_rain WHERE year( FROM_UNIXTIME( dateTime ) ) = "{0}" GROUP BY month ORDER BY total DESC LIMIT 1;'.format(
-                time.strftime("%Y", time.localtime(time.time()))
-            )  # Why does this one require .format() but the other's don't?
-            at_rainiest_month_sql = 'SELECT FROM_UNIXTIME( dateTime, "%%m" ) AS month, FROM_UNIXTIME( dateTime, "%%Y" ) AS year, ROUND( SUM( sum ), 2 ) AS total FROM archive_day_rain GROUP BY month, year ORDER BY total DESC LIMIT 1;'
-            year_rain_data_sql = (
-                'SELECT dateTime, ROUND( sum, 2 ) FROM archive_day_rain WHERE year( FROM_UNIXTIME( dateTime ) ) = "%s" AND count > 0;'
-                % time.strftime("%Y", time.localtime(time.time()))
-            )
-            # The all stats from http://www.weewx.com/docs/customizing.htm
-            # doesn't seem to calculate "Total Rainfall for" all time stat
-            # correctly.
-            at_rain_highest_year_sql = 'SELECT FROM_UNIXTIME( dateTime, "%%Y" ) AS year, ROUND( SUM( sum ), 2 ) AS total FROM archive_day_rain GROUP BY year ORDER BY total DESC LIMIT 1;'
-
-        # Rainiest month
-        year_rainiest_month_query = wx_manager.getSql(year_rainiest_month_sql)
+        # Rainiest month. Records are [year, month, total]
+        year_rainiest_month_query = records["rain"]["year_month"]
         if year_rainiest_month_query is not None:
             year_rainiest_month_tuple = (
-                year_rainiest_month_query[1],
+                year_rainiest_month_query[2],
                 rain_unit,
                 "group_rain",
             )
@@ -835,7 +824,7 @@ class getData(SearchList):
                 % self.generator.converter.convert(year_rainiest_month_tuple)[0]
             )
             year_rainiest_month_name = calendar.month_name[
-                int(year_rainiest_month_query[0])
+                int(year_rainiest_month_query[1])
             ]
             year_rainiest_month = [
                 year_rainiest_month_name,
@@ -845,19 +834,19 @@ class getData(SearchList):
             year_rainiest_month = ["N/A", 0.0]
 
         # All time rainiest month
-        at_rainiest_month_query = wx_manager.getSql(at_rainiest_month_sql)
+        at_rainiest_month_query = records["rain"]["at_month"]
         at_rainiest_month_tuple = (at_rainiest_month_query[2], rain_unit, "group_rain")
         at_rainiest_month_converted = (
             rain_round % self.generator.converter.convert(at_rainiest_month_tuple)[0]
         )
-        at_rainiest_month_name = calendar.month_name[int(at_rainiest_month_query[0])]
+        at_rainiest_month_name = calendar.month_name[int(at_rainiest_month_query[1])]
         at_rainiest_month = [
-            "%s, %s" % (at_rainiest_month_name, at_rainiest_month_query[1]),
+            "%s, %s" % (at_rainiest_month_name, at_rainiest_month_query[0]),
             locale.format_string("%g", float(at_rainiest_month_converted)),
         ]
 
-        # All time rainiest year
-        at_rain_highest_year_query = wx_manager.getSql(at_rain_highest_year_sql)
+        # All time rainiest year. Record is [year, total]
+        at_rain_highest_year_query = records["rain"]["at_year"]
         at_rain_highest_year_tuple = (
             at_rain_highest_year_query[1],
             rain_unit,
@@ -871,105 +860,30 @@ class getData(SearchList):
             locale.format_string("%g", float(at_rain_highest_year_converted)),
         ]
 
-        # Consecutive days with/without rainfall
-        # dateTime needs to be epoch. Conversion done in the template using #echo
-        year_days_with_rain_total = 0
-        year_days_without_rain_total = 0
-        year_days_with_rain_output = {}
-        year_days_without_rain_output = {}
-        year_rain_query = wx_manager.genSql(year_rain_data_sql)
-        for row in year_rain_query:
-            # Original MySQL way: CASE WHEN sum!=0 THEN @total+1 ELSE 0 END
-            if row[1] != 0:
-                year_days_with_rain_total += 1
-            else:
-                year_days_with_rain_total = 0
-
-            # Original MySQL way: CASE WHEN sum=0 THEN @total+1 ELSE 0 END
-            if row[1] == 0:
-                year_days_without_rain_total += 1
-            else:
-                year_days_without_rain_total = 0
-
-            year_days_with_rain_output[row[0]] = year_days_with_rain_total
-            year_days_without_rain_output[row[0]] = year_days_without_rain_total
-
-        if year_days_with_rain_output:
-            year_days_with_rain = max(
-                zip(
-                    year_days_with_rain_output.values(),
-                    year_days_with_rain_output.keys(),
-                )
-            )
-        else:
+        # Consecutive days with/without rainfall. Streaks are [days, dateTime]
+        # where dateTime is the last day of the streak. dateTime needs to be
+        # epoch. Conversion done in the template using #echo
+        year_days_with_rain = records["rain_streak"]["year_wet"]
+        if year_days_with_rain is None:
             year_days_with_rain = [
                 locale.format_string("%.1f", 0),
                 calendar.timegm(time.gmtime()),
             ]
 
-        if year_days_without_rain_output:
-            year_days_without_rain = max(
-                zip(
-                    year_days_without_rain_output.values(),
-                    year_days_without_rain_output.keys(),
-                )
-            )
-        else:
+        year_days_without_rain = records["rain_streak"]["year_dry"]
+        if year_days_without_rain is None:
             year_days_without_rain = [
                 locale.format_string("%.1f", 0),
                 calendar.timegm(time.gmtime()),
             ]
 
-        at_days_with_rain_total = 0
-        at_days_without_rain_total = 0
-        at_days_with_rain_output = {}
-        at_days_without_rain_output = {}
-        at_rain_query = wx_manager.genSql(
-            "SELECT dateTime, ROUND( sum, 2 ) FROM archive_day_rain WHERE count > 0;"
-        )
-        for row in at_rain_query:
-            # Original MySQL way: CASE WHEN sum!=0 THEN @total+1 ELSE 0 END
-            if row[1] != 0:
-                at_days_with_rain_total += 1
-            else:
-                at_days_with_rain_total = 0
-
-            # Original MySQL way: CASE WHEN sum=0 THEN @total+1 ELSE 0 END
-            if row[1] == 0:
-                at_days_without_rain_total += 1
-            else:
-                at_days_without_rain_total = 0
-
-            at_days_with_rain_output[row[0]] = at_days_with_rain_total
-            at_days_without_rain_output[row[0]] = at_days_without_rain_total
-
-        if len(at_days_with_rain_output) > 0:
-            at_days_with_rain = max(
-                zip(at_days_with_rain_output.values(), at_days_with_rain_output.keys())
-            )
-        else:
+        at_days_with_rain = records["rain_streak"]["at_wet"]
+        if at_days_with_rain is None:
             at_days_with_rain = (0, 0)
-        if len(at_days_without_rain_output) > 0:
-            at_days_without_rain = max(
-                zip(
-                    at_days_without_rain_output.values(),
-                    at_days_without_rain_output.keys(),
-                )
-            )
-        else:
+        at_days_without_rain = records["rain_streak"]["at_dry"]
+        if at_days_without_rain is None:
             at_days_without_rain = (0, 0)
 
-        # This portion is right from the weewx sample
-        # http://www.weewx.com/docs/customizing.htm
-
-        all_stats = TimespanBinder(
-            timespan,
-            db_lookup,
-            formatter=self.generator.formatter,
-            converter=self.generator.converter,
-            skin_dict=self.generator.skin_dict,
-        )
-
         # Get the unit label from the skin dict for speed.
         windSpeed_unit = self.generator.skin_dict["Units"]["Groups"]["group_speed"]
         windSpeed_unit_label = self.generator.skin_dict["Units"]["Labels"][
@@ -1054,113 +968,39 @@ class getData(SearchList):
         # Forecast Data
         # ==============================================================================
 
-        if (
-            self.generator.skin_dict["Extras"]["forecast_enabled"] == "1"
-            and self.generator.skin_dict["Extras"]["forecast_api_id"] != ""
-            or "forecast_dev_file" in self.generator.skin_dict["Extras"]
-        ):
+        feeds = BelchertownFeeds(
+            self.generator.skin_dict["Extras"],
+            html_root,
+            self.generator.config_dict["Station"]["latitude"],
+            self.generator.config_dict["Station"]["longitude"],
+        )
+        # With background downloads the BelchertownDataService keeps the
+        # files fresh and they are only read here
+        background_downloads = to_bool(
+            self.generator.skin_dict["Extras"].get(
+                "belchertown_background_downloads", False
+            )
+        )
+        if background_downloads:
+            for filename, is_stale, update in feeds.feeds():
+                if not os.path.isfile(filename):
+                    loginf(
+                        "%s has not been downloaded by the background service yet"
+                        % filename
+                    )
+        else:
+            # Stale files are refreshed in the background, this report uses
+            # the ones that are there
+            feeds.revalidate()
 
-            forecast_file = html_root + "/json/forecast.json"
-            forecast_api_id = self.generator.skin_dict["Extras"]["forecast_api_id"]
-            forecast_api_secret = self.generator.skin_dict["Extras"][
-                "forecast_api_secret"
-            ]
+        if feeds.forecast_enabled() and os.path.isfile(feeds.forecast_file):
+
+            forecast_file = feeds.forecast_file
             forecast_units = self.generator.skin_dict["Extras"][
                 "forecast_units"
             ].lower()
-            latitude = self.generator.config_dict["Station"]["latitude"]
-            longitude = self.generator.config_dict["Station"]["longitude"]
-            forecast_stale_timer = self.generator.skin_dict["Extras"]["forecast_stale"]
-            forecast_is_stale = False
-
-            def aeris_coded_weather(data):
-                # https://www.aerisweather.com/support/docs/api/reference/weather-codes/
-                output = ""
-                coverage_code = data.split(":")[0]
-                intensity_code = data.split(":")[1]
-                weather_code = data.split(":")[2]
-
-                cloud_dict = {
-                    "CL": label_dict["forecast_cloud_code_CL"],
-                    "FW": label_dict["forecast_cloud_code_FW"],
-                    "SC": label_dict["forecast_cloud_code_SC"],
-                    "BK": label_dict["forecast_cloud_code_BK"],
-                    "OV": label_dict["forecast_cloud_code_OV"],
-                }
-
-                coverage_dict = {
-                    "AR": label_dict["forecast_coverage_code_AR"],
-                    "BR": label_dict["forecast_coverage_code_BR"],
-                    "C": label_dict["forecast_coverage_code_C"],
-                    "D": label_dict["forecast_coverage_code_D"],
-                    "FQ": label_dict["forecast_coverage_code_FQ"],
-                    "IN": label_dict["forecast_coverage_code_IN"],
-                    "IS": label_dict["forecast_coverage_code_IS"],
-                    "L": label_dict["forecast_coverage_code_L"],
-                    "NM": label_dict["forecast_coverage_code_NM"],
-                    "O": label_dict["forecast_coverage_code_O"],
-                    "PA": label_dict["forecast_coverage_code_PA"],
-                    "PD": label_dict["forecast_coverage_code_PD"],
-                    "S": label_dict["forecast_coverage_code_S"],
-                    "SC": label_dict["forecast_coverage_code_SC"],
-                    "VC": label_dict["forecast_coverage_code_VC"],
-                    "WD": label_dict["forecast_coverage_code_WD"],
-                }
-
-                intensity_dict = {
-                    "VL": label_dict["forecast_intensity_code_VL"],
-                    "L": label_dict["forecast_intensity_code_L"],
-                    "H": label_dict["forecast_intensity_code_H"],
-                    "VH": label_dict["forecast_intensity_code_VH"],
-                }
-
-                weather_dict = {
-                    "A": label_dict["forecast_weather_code_A"],
-                    "BD": label_dict["forecast_weather_code_BD"],
-                    "BN": label_dict["forecast_weather_code_BN"],
-                    "BR": label_dict["forecast_weather_code_BR"],
-                    "BS": label_dict["forecast_weather_code_BS"],
-                    "BY": label_dict["forecast_weather_code_BY"],
-                    "F": label_dict["forecast_weather_code_F"],
-                    "FR": label_dict["forecast_weather_code_FR"],
-                    "H": label_dict["forecast_weather_code_H"],
-                    "IC": label_dict["forecast_weather_code_IC"],
-                    "IF": label_dict["forecast_weather_code_IF"],
-                    "IP": label_dict["forecast_weather_code_IP"],
-                    "K": label_dict["forecast_weather_code_K"],
-                    "L": label_dict["forecast_weather_code_L"],
-                    "R": label_dict["forecast_weather_code_R"],
-                    "RW": label_dict["forecast_weather_code_RW"],
-                    "RS": label_dict["forecast_weather_code_RS"],
-                    "SI": label_dict["forecast_weather_code_SI"],
-                    "WM": label_dict["forecast_weather_code_WM"],
-                    "S": label_dict["forecast_weather_code_S"],
-                    "SW": label_dict["forecast_weather_code_SW"],
-                    "T": label_dict["forecast_weather_code_T"],
-                    "UP": label_dict["forecast_weather_code_UP"],
-                    "VA": label_dict["forecast_weather_code_VA"],
-                    "WP": label_dict["forecast_weather_code_WP"],
-                    "ZF": label_dict["forecast_weather_code_ZF"],
-                    "ZL": label_dict["forecast_weather_code_ZL"],
-                    "ZR": label_dict["forecast_weather_code_ZR"],
-                    "ZY": label_dict["forecast_weather_code_ZY"],
-                }
 
-                # Check if the weather_code is in the cloud_dict and use that
-                # if it's there. If not then it's a combined weather code.
-                if weather_code in cloud_dict:
-                    return cloud_dict[weather_code]
-
-                # Add the coverage if it's present, and full observation
-                # forecast is requested
-                if coverage_code:
-                    output += coverage_dict[coverage_code] + " "
-                # Add the intensity if it's present
-                if intensity_code:
-                    output += intensity_dict[intensity_code] + " "
-                # Weather output
-                output += weather_dict[weather_code]
-                return output
+            aeris_coded_weather = AerisCodedWeather.for_labels(label_dict)
 
             def aeris_icon(data):
                 # https://www.aerisweather.com/support/docs/api/reference/icon-list/
@@ -1172,251 +1012,14 @@ class getData(SearchList):
                 )
                 if os.path.exists(iconlist_file_path):
                     icon_name = data.split(".")[0]  # Remove .png
-                    with open(iconlist_file_path, "r") as dict:
-                        icon_dict = json.load(dict)
+                    icon_dict = json_files.load(iconlist_file_path)
                     return icon_dict[icon_name]
                 else:
                     logerr("aeris-icon-list.json is missing in " + iconlist_file_path)
                     return 'unknown'
 
-            forecast_lang = self.generator.skin_dict["Extras"]["forecast_lang"].lower()
-            if self.generator.skin_dict["Extras"]["forecast_aeris_use_metar"] == "1":
-                forecast_current_url = (
-                    "https://api.aerisapi.com/observations/%s,%s?&format=json&filter=allstations&filter=metar&limit=1&client_id=%s&client_secret=%s"
-                    % (latitude, longitude, forecast_api_id, forecast_api_secret)
-                )
-            else:
-                forecast_current_url = (
-                    "https://api.aerisapi.com/observations/%s,%s?&format=json&filter=allstations&limit=1&client_id=%s&client_secret=%s"
-                    % (latitude, longitude, forecast_api_id, forecast_api_secret)
-                )
-            forecast_24hr_url = (
-                "https://api.aerisapi.com/forecasts/%s,%s?&format=json&filter=day&limit=7&client_id=%s&client_secret=%s"
-                % (latitude, longitude, forecast_api_id, forecast_api_secret)
-            )
-            forecast_3hr_url = (
-                "https://api.aerisapi.com/forecasts/%s,%s?&format=json&filter=3hr&limit=8&client_id=%s&client_secret=%s"
-                % (latitude, longitude, forecast_api_id, forecast_api_secret)
-            )
-            forecast_1hr_url = (
-                "https://api.aerisapi.com/forecasts/%s,%s?&format=json&filter=1hr&limit=16&client_id=%s&client_secret=%s"
-                % (latitude, longitude, forecast_api_id, forecast_api_secret)
-            )
-            aqi_url = (
-                "https://api.aerisapi.com/airquality/closest?p=%s,%s&format=json&radius=50mi&limit=1&client_id=%s&client_secret=%s"
-                % (latitude, longitude, forecast_api_id, forecast_api_secret)
-            )
-            if self.generator.skin_dict["Extras"]["forecast_alert_limit"]:
-                forecast_alert_limit = self.generator.skin_dict["Extras"][
-                    "forecast_alert_limit"
-                ]
-                forecast_alerts_url = "https://api.aerisapi.com/alerts/%s,%s?&format=json&limit=%s&lang=%s&client_id=%s&client_secret=%s" % (
-                    latitude,
-                    longitude,
-                    forecast_alert_limit,
-                    forecast_lang,
-                    forecast_api_id,
-                    forecast_api_secret,
-                )
-            else:
-                # Default to 1 alerts to show if the option is missing. Can go up to 10
-                forecast_alerts_url = "https://api.aerisapi.com/alerts/%s,%s?&format=json&limit=1&lang=%s&client_id=%s&client_secret=%s" % (
-                    latitude,
-                    longitude,
-                    forecast_lang,
-                    forecast_api_id,
-                    forecast_api_secret,
-                )
-
-            # Determine if the file exists and get it's modified time, enhanced
-            # for 1 hr forecast to load close to the hour
-            if os.path.isfile(forecast_file):
-                if (int(time.time()) - int(os.path.getmtime(forecast_file))) > int(
-                    forecast_stale_timer
-                ):
-                    forecast_is_stale = True
-                else:
-                    # catches repeated calls every archive interval (300secs)
-                    if (
-                        time.strftime("%M") < "05"
-                        and int(time.time()) - int(os.path.getmtime(forecast_file))
-                    ) > int(300):
-                        forecast_is_stale = True
-            else:
-                # File doesn't exist, download a new copy
-                forecast_is_stale = True
-
-            # File is stale, download a new copy
-            if forecast_is_stale:
-                try:
-                    if sys.version_info[0] >= 3:
-                        from urllib.request import Request, urlopen
-                    else:
-                        # Python 2
-                        from urllib2 import Request, urlopen
-
-                    user_agent = "Mozilla/5.0 (Macintosh; U; Intel Mac OS X 10_6_4; en-US) AppleWebKit/534.3 (KHTML, like Gecko) Chrome/6.0.472.63 Safari/534.3"
-                    headers = {"User-Agent": user_agent}
-                    if "forecast_dev_file" in self.generator.skin_dict["Extras"]:
-                        # Hidden option to use a pre-downloaded forecast file
-                        # rather than using API calls for no reason
-                        dev_forecast_file = self.generator.skin_dict["Extras"][
-                            "forecast_dev_file"
-                        ]
-                        req = Request(dev_forecast_file, None, headers)
-                        response = urlopen(req)
-                        forecast_file_result = response.read()
-                        response.close()
-                    else:
-                        # Current conditions
-                        req = Request(forecast_current_url, None, headers)
-                        response = urlopen(req)
-                        current_page = response.read()
-                        response.close()
-                        # 24hr forecast (was Forecast)
-                        req = Request(forecast_24hr_url, None, headers)
-                        response = urlopen(req)
-                        forecast_24hr_page = response.read()
-                        response.close()
-                        # 3hr forecast
-                        req = Request(forecast_3hr_url, None, headers)
-                        response = urlopen(req)
-                        forecast_3hr_page = response.read()
-                        response.close()
-                        # 1hr forecast
-                        req = Request(forecast_1hr_url, None, headers)
-                        response = urlopen(req)
-                        forecast_1hr_page = response.read()
-                        response.close()
-                        # AQI
-                        req = Request(aqi_url, None, headers)
-                        response = urlopen(req)
-                        aqi_page = response.read()
-                        response.close()
-                        if (
-                            self.generator.skin_dict["Extras"]["forecast_alert_enabled"]
-                            == "1"
-                        ):
-                            # Alerts
-                            req = Request(forecast_alerts_url, None, headers)
-                            response = urlopen(req)
-                            alerts_page = response.read()
-                            response.close()
-
-                        # Combine all into 1 file
-                        if (
-                            self.generator.skin_dict["Extras"]["forecast_alert_enabled"]
-                            == "1"
-                        ):
-                            try:
-                                forecast_file_result = json.dumps(
-                                    {
-                                        "timestamp": int(time.time()),
-                                        "current": [json.loads(current_page)],
-                                        "forecast_24hr": [
-                                            json.loads(forecast_24hr_page)
-                                        ],
-                                        "forecast_3hr": [json.loads(forecast_3hr_page)],
-                                        "forecast_1hr": [json.loads(forecast_1hr_page)],
-                                        "alerts": [json.loads(alerts_page)],
-                                        "aqi": [json.loads(aqi_page)],
-                                    }
-                                )
-                            except:
-                                forecast_file_result = json.dumps(
-                                    {
-                                        "timestamp": int(time.time()),
-                                        "current": [
-                                            json.loads(current_page.decode("utf-8"))
-                                        ],
-                                        "forecast_24hr": [
-                                            json.loads(
-                                                forecast_24hr_page.decode("utf-8")
-                                            )
-                                        ],
-                                        "forecast_3hr": [
-                                            json.loads(
-                                                forecast_3hr_page.decode("utf-8")
-                                            )
-                                        ],
-                                        "forecast_1hr": [
-                                            json.loads(
-                                                forecast_1hr_page.decode("utf-8")
-                                            )
-                                        ],
-                                        "alerts": [
-                                            json.loads(alerts_page.decode("utf-8"))
-                                        ],
-                                        "aqi": [json.loads(aqi_page.decode("utf-8"))],
-                                    }
-                                )
-                        else:
-                            try:
-                                forecast_file_result = json.dumps(
-                                    {
-                                        "timestamp": int(time.time()),
-                                        "current": [json.loads(current_page)],
-                                        "forecast_24hr": [
-                                            json.loads(forecast_24hr_page)
-                                        ],
-                                        "forecast_3hr": [json.loads(forecast_3hr_page)],
-                                        "forecast_1hr": [json.loads(forecast_1hr_page)],
-                                        "aqi": [json.loads(aqi_page)],
-                                    }
-                                )
-                            except:
-                                forecast_file_result = json.dumps(
-                                    {
-                                        "timestamp": int(time.time()),
-                                        "current": [
-                                            json.loads(current_page.decode("utf-8"))
-                                        ],
-                                        "forecast_24hr": [
-                                            json.loads(
-                                                forecast_24hr_page.decode("utf-8")
-                                            )
-                                        ],
-                                        "forecast_3hr": [
-                                            json.loads(
-                                                forecast_3hr_page.decode("utf-8")
-                                            )
-                                        ],
-                                        "forecast_1hr": [
-                                            json.loads(
-                                                forecast_1hr_page.decode("utf-8")
-                                            )
-                                        ],
-                                        "aqi": [json.loads(aqi_page.decode("utf-8"))],
-                                    }
-                                )
-                except Exception as error:
-                    raise Warning(
-                        "Error downloading forecast data. "
-                        "Check the URL in your configuration and try again. "
-                        "You are trying to use URL: %s, and the error is: %s"
-                        % (forecast_24hr_url, error)
-                    )
-
-                # Save forecast data to file. w+ creates the file if it doesn't
-                # exist, and truncates the file and re-writes it everytime
-                try:
-                    with open(forecast_file, "wb+") as file:
-                        try:
-                            # Python 2/3
-                            file.write(forecast_file_result.encode("utf-8"))
-                        except:
-                            # Catch errors caused by ASCII characters in Python2
-                            file.write(forecast_file_result)
-                        loginf("New forecast file downloaded to %s" % forecast_file)
-                except IOError as e:
-                    raise Warning(
-                        "Error writing forecast info to %s. Reason: %s"
-                        % (forecast_file, e)
-                    )
-
             # Process the forecast file
-            with open(forecast_file, "r") as read_file:
-                data = json.load(read_file)
+            data = json_files.load(forecast_file)
 
             try:
                 cloud_cover = "{}%".format(data["current"][0]["response"]["ob"]["sky"])
@@ -1480,7 +1083,7 @@ class getData(SearchList):
                 and self.generator.skin_dict["Extras"]["forecast_aeris_use_metar"]
                 == "1"
             ):
-                current_obs_summary = aeris_coded_weather(
+                current_obs_summary = aeris_coded_weather.translate(
                     data["current"][0]["response"]["ob"]["weatherPrimaryCoded"]
                 )
                 current_obs_icon = (
@@ -1531,11 +1134,8 @@ class getData(SearchList):
         # ==============================================================================
 
         # Only process if Earthquake data is enabled
-        if self.generator.skin_dict["Extras"]["earthquake_enabled"] == "1":
-            earthquake_file = html_root + "/json/earthquake.json"
-            earthquake_stale_timer = self.generator.skin_dict["Extras"][
-                "earthquake_stale"
-            ]
+        if feeds.earthquake_enabled() and os.path.isfile(feeds.earthquake_file):
+            earthquake_file = feeds.earthquake_file
             latitude = self.generator.config_dict["Station"]["latitude"]
             longitude = self.generator.config_dict["Station"]["longitude"]
             distance_unit = self.generator.converter.group_unit_dict["group_distance"]
@@ -1545,206 +1145,75 @@ class getData(SearchList):
             eq_distance_round = self.generator.skin_dict["Units"]["StringFormats"].get(
                 distance_unit, "%.1f"
             )
-            earthquake_maxradiuskm = self.generator.skin_dict["Extras"][
-                "earthquake_maxradiuskm"
-            ]
-            # Sample URL from Belchertown Weather:
-            # http://earthquake.usgs.gov/fdsnws/event/1/query?limit=1&lat=42.223&lon=-72.374&maxradiuskm=1000&format=geojson&nodata=204&minmag=2
-            if self.generator.skin_dict["Extras"]["earthquake_server"] == "USGS":
-                earthquake_url = (
-                    "http://earthquake.usgs.gov/fdsnws/event/1/query?limit=1&lat=%s&lon=%s&maxradiuskm=%s&format=geojson&nodata=204&minmag=2"
-                    % (latitude, longitude, earthquake_maxradiuskm)
-                )
-            elif self.generator.skin_dict["Extras"]["earthquake_server"] == "GeoNet":
-                earthquake_url = (
-                    "https://api.geonet.org.nz/quake?MMI=%s"
-                    % self.generator.skin_dict["Extras"]["geonet_mmi"]
-                )
-            elif self.generator.skin_dict["Extras"]["earthquake_server"] == "ReNaSS":
-                # Calculate min/max latitude and min/max longitude from radius and station location. https://stackoverflow.com/a/23118314
-                lat = float(latitude)
-                long = float(longitude)
-                radiusInKm = int(earthquake_maxradiuskm)
-
-                kmInLongitudeDegree = 111.320 * cos( lat / 180.0 * pi)
-
-                deltaLat = radiusInKm / 111.1
-                deltaLong = radiusInKm / kmInLongitudeDegree
-
-                minLat = lat - deltaLat
-                maxLat = lat + deltaLat
-                minLong = long - deltaLong
-                maxLong = long + deltaLong
-
-                earthquake_url = (
-                    "https://api.franceseisme.fr/fdsnws/event/1/query?eventtype=earthquake&minmagnitude=2&minlatitude=%.2f&minlongitude=%.2f&maxlatitude=%.2f&maxlongitude=%.2f&format=json&limit=1&orderby=time"
-                    % (minLat, minLong, maxLat, maxLong) 
-                )
-            earthquake_is_stale = False
+            # Process the earthquake file
+            try:
+                eqdata = json_files.load(earthquake_file)
+            except:
+                eqdata = {}
 
-            # Determine if the file exists and get it's modified time
-            if os.path.isfile(earthquake_file):
-                if (int(time.time()) - int(os.path.getmtime(earthquake_file))) > int(
-                    earthquake_stale_timer
-                ):
-                    earthquake_is_stale = True
+            earthquake_server = self.generator.skin_dict["Extras"]["earthquake_server"]
+            events = self.get_earthquake_events(
+                eqdata, earthquake_server, distance_unit, system_locale
+            )
+            # Distances and bearings of all the events at once, in km to
+            # compare with the radius and in the display unit
+            points = [(event["lat"], event["lon"]) for event in events]
+            station = (float(latitude), float(longitude))
+            km_distances = self.get_gps_distances(station, points, "km")
+            distances = km_distances
+            if distance_unit != "km":
+                distances = self.get_gps_distances(station, points, distance_unit)
+            maxradiuskm = float(
+                self.generator.skin_dict["Extras"].get("earthquake_maxradiuskm", 1000)
+            )
+            events = [
+                (event, distance)
+                for event, km_distance, distance in zip(events, km_distances, distances)
+                if km_distance[0] <= maxradiuskm
+            ]
+            earthquake_sort = self.generator.skin_dict["Extras"].get(
+                "earthquake_sort", "time"
+            )
+            if earthquake_sort == "distance":
+                events.sort(key=lambda event: event[1][0])
+            elif earthquake_sort == "magnitude":
+                events.sort(key=lambda event: event[0]["mag"], reverse=True)
             else:
-                # File doesn't exist, download a new copy
-                earthquake_is_stale = True
-
-            # File is stale, download a new copy
-            if earthquake_is_stale:
-                # Download new earthquake data
-                try:
-                    if sys.version_info[0] >= 3:
-                        from urllib.request import Request, urlopen
-                    else:
-                        # Python 2
-                        from urllib2 import Request, urlopen
-
-                    user_agent = "Mozilla/5.0 (Macintosh; U; Intel Mac OS X 10_6_4; en-US) AppleWebKit/534.3 (KHTML, like Gecko) Chrome/6.0.472.63 Safari/534.3"
-                    headers = {"User-Agent": user_agent}
-                    req = Request(earthquake_url, None, headers)
-                    response = urlopen(req)
-                    page = response.read()
-                    response.close()
-                    if weewx.debug:
-                        logdbg(
-                            "Downloading earthquake data using urllib2 was successful"
-                        )
-                except Exception as forecast_error:
-                    if weewx.debug:
-                        logdbg(
-                            "Error downloading earthquake data with urllib2, reverting to curl and subprocess. "
-                            "Full error: %s" % forecast_error
-                        )
-                    # Nested try - only execute if the urllib2 method fails
-                    try:
-                        import subprocess
-
-                        command = 'curl -L --silent "%s"' % earthquake_url
-                        p = subprocess.Popen(
-                            command,
-                            shell=True,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.STDOUT,
-                        )
-                        page = p.communicate()[0]
-                        if weewx.debug:
-                            logdbg(
-                                "Downloading earthquake data with curl was successful."
-                            )
-                    except Exception as error:
-                        raise Warning(
-                            "Error downloading earthquake data using urllib2 and subprocess curl. "
-                            "Your software may need to be updated, or the URL is incorrect. "
-                            "You are trying to use URL: %s, and the error is: %s"
-                            % (earthquake_url, error)
-                        )
-
-                # Save earthquake data to file. w+ creates the file if it
-                # doesn't exist, and truncates the file and re-writes it
-                # everytime
-                try:
-                    with open(earthquake_file, "wb+") as file:
-                        try:
-                            # Python 2/3
-                            file.write(page.encode("utf-8"))
-                        except:
-                            # Catch errors caused by ASCII characters in Python2
-                            file.write(page)
-                        if weewx.debug:
-                            logdbg("Earthquake data saved to %s" % earthquake_file)
-                except IOError as e:
-                    raise Warning(
-                        "Error writing earthquake data to %s. Reason: %s"
-                        % (earthquake_file, e)
-                    )
-
-            # Process the earthquake file
-            with open(earthquake_file, "r") as read_file:
-                try:
-                    eqdata = json.load(read_file)
-                except:
-                    eqdata = ""
+                events.sort(key=lambda event: event[0]["time"], reverse=True)
 
-            try:
-                if self.generator.skin_dict["Extras"]["earthquake_server"] == "USGS":
-                    eqtime = eqdata["features"][0]["properties"]["time"] / 1000
-                    equrl = eqdata["features"][0]["properties"]["url"]
-                    if distance_unit == "km":
-                        eqplace = eqdata["features"][0]["properties"]["place"]
-                    else:  # assume miles
-                        try:
-                            eqmatched = match(
-                                "(?P<distance>[0-9]*\\.?[0-9]+) km(?P<rest>.*)$",
-                                eqdata["features"][0]["properties"]["place"],
-                            )
-                            eqdist_km = eqmatched.group("distance")
-                            eqdist_miles = round(float(eqdist_km) / 1.609, 1)
-                            eqplace = (
-                                str(eqdist_miles) + " miles" + eqmatched.group("rest")
-                            )
-                        except:
-                            eqplace = eqdata["features"][0]["properties"]["place"]
-                    eqmag = locale.format_string(
-                        "%g", float(eqdata["features"][0]["properties"]["mag"])
-                    )
-                elif (
-                    self.generator.skin_dict["Extras"]["earthquake_server"] == "ReNaSS"
-                ):
-                    eqtime = eqdata["features"][0]["properties"]["time"]
-                    # convert time to UNIX format
-                    eqtime = datetime.datetime.strptime(eqtime, "%Y-%m-%dT%H:%M:%S.%fZ")
-                    eqtime = int(
-                        (eqtime - datetime.datetime(1970, 1, 1)).total_seconds()
-                    )
-                    if match("fr_.*", system_locale):
-                        equrl = eqdata["features"][0]["properties"]["url"]["fr"]
-                        eqplace = eqdata["features"][0]["properties"]["description"]["fr"]
-                    else:
-                        equrl = eqdata["features"][0]["properties"]["url"]["en"]
-                        eqplace = eqdata["features"][0]["properties"]["description"]["en"]
-                    eqmag = format(
-                         eqdata["features"][0]["properties"]["mag"], ".1f"
-                    )
-                elif (
-                    self.generator.skin_dict["Extras"]["earthquake_server"] == "GeoNet"
-                ):
-                    eqtime = eqdata["features"][0]["properties"]["time"]
-                    # convert time to UNIX format
-                    eqtime = datetime.datetime.strptime(eqtime, "%Y-%m-%dT%H:%M:%S.%fZ")
-                    eqtime = int(
-                        (eqtime - datetime.datetime(1970, 1, 1)).total_seconds()
-                    )
-                    equrl = (
-                        "https://www.geonet.org.nz/earthquake/"
-                        + eqdata["features"][0]["properties"]["publicID"]
-                    )
-                    eqplace = eqdata["features"][0]["properties"]["locality"]
-                    eqmag = locale.format_string(
-                        "%g",
-                        float(
-                            round(eqdata["features"][0]["properties"]["magnitude"], 1)
+            earthquake_events = []
+            for event, distance in events:
+                if earthquake_server == "ReNaSS":
+                    eqmag = format(event["mag"], ".1f")
+                else:
+                    eqmag = locale.format_string("%g", event["mag"])
+                earthquake_events.append(
+                    {
+                        "time": event["time"],
+                        "url": event["url"],
+                        "place": event["place"],
+                        "magnitude": eqmag,
+                        "lat": str(event["lat"]),
+                        "lon": str(event["lon"]),
+                        "distance_away": locale.format_string(
+                            "%g", float(eq_distance_round % distance[0])
                         ),
-                    )
-                eqlat = str(
-                    round(eqdata["features"][0]["geometry"]["coordinates"][1], 4)
-                )
-                eqlon = str(
-                    round(eqdata["features"][0]["geometry"]["coordinates"][0], 4)
-                )
-                eqdistance_bearing = self.get_gps_distance(
-                    (float(latitude), float(longitude)),
-                    (float(eqlat), float(eqlon)),
-                    distance_unit,
+                        "bearing": distance[1],
+                        "bearing_raw": distance[2],
+                    }
                 )
-                eqdistance = locale.format_string(
-                    "%g", float(eq_distance_round % eqdistance_bearing[0])
-                )
-                eqbearing = eqdistance_bearing[1]
-                eqbearing_raw = eqdistance_bearing[2]
-            except:
+
+            if earthquake_events:
+                eqtime = earthquake_events[0]["time"]
+                equrl = earthquake_events[0]["url"]
+                eqplace = earthquake_events[0]["place"]
+                eqmag = earthquake_events[0]["magnitude"]
+                eqlat = earthquake_events[0]["lat"]
+                eqlon = earthquake_events[0]["lon"]
+                eqdistance = earthquake_events[0]["distance_away"]
+                eqbearing = earthquake_events[0]["bearing"]
+                eqbearing_raw = earthquake_events[0]["bearing_raw"]
+            else:
                 # No earthquake data
                 eqtime = label_dict["earthquake_no_data"]
                 equrl = ""
@@ -1757,6 +1226,7 @@ class getData(SearchList):
                 eqbearing_raw = ""
 
         else:
+            earthquake_events = []
             eqtime = ""
             equrl = ""
             eqplace = ""
@@ -1781,17 +1251,64 @@ class getData(SearchList):
         # Check if this is a list. If not then we have 1 item, so force it into a list
         if isinstance(station_observations, list) is False:
             station_observations = station_observations.split()
-        current_stamp = manager.lastGoodStamp()
-        current_record = manager.getRecord(current_stamp)
-        current = weewx.tags.CurrentObj(
-            db_lookup,
-            station_obs_binding,
-            current_stamp,
-            self.generator.formatter,
-            self.generator.converter,
-            None,
-            current_record
-        )
+
+        # The current record of each data binding, fetched once and shared by
+        # all the observations that use the binding
+        current_objs = {}
+
+        def get_current(obs_binding):
+            if obs_binding not in current_objs:
+                if obs_binding is None:
+                    obs_binding_manager = manager
+                else:
+                    obs_binding_manager = self.generator.db_binder.get_manager(
+                        obs_binding
+                    )
+                obs_stamp = obs_binding_manager.lastGoodStamp()
+                obs_record = obs_binding_manager.getRecord(obs_stamp)
+                current_objs[obs_binding] = (
+                    obs_stamp,
+                    weewx.tags.CurrentObj(
+                        db_lookup,
+                        obs_binding,
+                        obs_stamp,
+                        self.generator.formatter,
+                        self.generator.converter,
+                        None,
+                        obs_record
+                    ),
+                )
+            return current_objs[obs_binding]
+
+        # The records 3 hours apart for the pressure trends, like $trend with
+        # the default binding, fetched once per time
+        trend_records = {}
+
+        def get_trend(obs, obs_stamp):
+            if obs_stamp not in trend_records:
+                trend_manager = db_lookup()
+                trend_records[obs_stamp] = (
+                    trend_manager.getRecord(obs_stamp, 300),
+                    trend_manager.getRecord(obs_stamp - 10800, 300),
+                )
+            now_record, then_record = trend_records[obs_stamp]
+            try:
+                now_vt = self.generator.converter.convert(
+                    weewx.units.as_value_tuple(now_record, obs)
+                )
+                then_vt = self.generator.converter.convert(
+                    weewx.units.as_value_tuple(then_record, obs)
+                )
+            except KeyError:
+                return "N/A"
+            if now_vt.value is None or then_vt.value is None:
+                trend = weewx.units.ValueTuple(None, now_vt.unit, now_vt.group)
+            else:
+                trend = now_vt - then_vt
+            return weewx.units.ValueHelper(
+                trend, "current", self.generator.formatter, self.generator.converter
+            )
+
         for obs in station_observations:
             if "data_binding" in obs:
                 station_obs_binding = obs[obs.find("(") + 1 : obs.rfind(")")].split(
@@ -1800,21 +1317,7 @@ class getData(SearchList):
                     1
                 ]  # Thanks https://stackoverflow.com/a/40811994/1177153
                 obs = obs.split("(")[0]
-            if station_obs_binding is not None:
-                obs_binding_manager = self.generator.db_binder.get_manager(
-                    station_obs_binding
-                )
-                current_stamp = obs_binding_manager.lastGoodStamp()
-                current_record = obs_binding_manager.getRecord(current_stamp)
-                current = weewx.tags.CurrentObj(
-                    db_lookup,
-                    station_obs_binding,
-                    current_stamp,
-                    self.generator.formatter,
-                    self.generator.converter,
-                    None,
-                    current_record
-                )
+            current_stamp, current = get_current(station_obs_binding)
 
             if obs == "visibility":
                 try:
@@ -1881,16 +1384,7 @@ class getData(SearchList):
             if obs in ("barometer", "pressure", "altimeter"):
                 # Append the trend arrow to the pressure observation. Need this
                 # for non-mqtt pages
-                trend = weewx.tags.TrendObj(
-                    10800,
-                    300,
-                    db_lookup,
-                    None,
-                    current_stamp,
-                    self.generator.formatter,
-                    self.generator.converter,
-                )
-                obs_trend = getattr(trend, obs)
+                obs_trend = get_trend(obs, current_stamp)
                 station_obs_html += (
                     ' <span class="pressure-trend">'  # Maintain leading spacing
                 )
@@ -1910,44 +1404,14 @@ class getData(SearchList):
         # Get all observations and their rounding values
         # ==============================================================================
 
-        all_obs_rounding_json = OrderedDict()
-        all_obs_unit_labels_json = OrderedDict()
-        for obs in sorted(weewx.units.obs_group_dict):
-            try:
-                # Find the unit from group (like group_temperature = degree_F)
-                obs_group = weewx.units.obs_group_dict[obs]
-                obs_unit = self.generator.converter.group_unit_dict[obs_group]
-            except:
-                # Something's wrong. Continue this loop to ignore this group
-                # (like group_dust or something non-standard)
-                continue
-            try:
-                # Find the number of decimals to round to based on group name
-                obs_round = self.generator.skin_dict["Units"]["StringFormats"].get(
-                    obs_unit, "0"
-                )[2]
-            except:
-                obs_round = self.generator.skin_dict["Units"]["StringFormats"].get(
-                    obs_unit, "0"
-                )
-            # Add to the rounding array
-            if obs not in all_obs_rounding_json:
-                all_obs_rounding_json[obs] = str(obs_round)
-            # Get the unit's label
-            # Add to label array and strip whitespace if possible
-            if obs not in all_obs_unit_labels_json:
-                obs_unit_label = weewx.units.get_label_string(
-                    self.generator.formatter, self.generator.converter, obs
-                )
-                all_obs_unit_labels_json[obs] = obs_unit_label
-
-            # Special handling items
-            if visibility:
-                all_obs_rounding_json["visibility"] = "2"
-                all_obs_unit_labels_json["visibility"] = visibility_unit
-            else:
-                all_obs_rounding_json["visibility"] = ""
-                all_obs_unit_labels_json["visibility"] = ""
+        all_obs_rounding_json, all_obs_unit_labels_json = self.get_obs_unit_maps()
+        # Special handling items
+        if visibility:
+            all_obs_rounding_json["visibility"] = "2"
+            all_obs_unit_labels_json["visibility"] = visibility_unit
+        else:
+            all_obs_rounding_json["visibility"] = ""
+            all_obs_unit_labels_json["visibility"] = ""
 
         # ==============================================================================
         # Social Share
@@ -2028,92 +1492,2807 @@ class getData(SearchList):
 
 
 
-        # Include custom.css if it exists in the HTML_ROOT folder
-        custom_css_file = html_root + "/custom.css"
-        # Determine if the file exists
-        custom_css_exists = os.path.isfile(custom_css_file)
+        # Include custom.css if it exists in the HTML_ROOT folder
+        custom_css_file = html_root + "/custom.css"
+        # Determine if the file exists
+        custom_css_exists = os.path.isfile(custom_css_file)
+
+        # Build the search list with the new values
+        search_list_extension = {
+            "belchertown_version": VERSION,
+            "belchertown_debug": belchertown_debug,
+            "moment_js_utc_offset": moment_js_utc_offset,
+            "moment_js_tz": moment_js_tz,
+            "highcharts_timezoneoffset": highcharts_timezoneoffset,
+            "system_locale": system_locale,
+            "system_locale_js": system_locale_js,
+            "locale_encoding": locale_encoding,
+            "highcharts_decimal": highcharts_decimal,
+            "highcharts_thousands": highcharts_thousands,
+            "radar_html": radar_html,
+            "radar_html_dark": radar_html_dark,
+            "radar_html_kiosk": radar_html_kiosk,
+            "archive_interval_ms": archive_interval_ms,
+            "ordinate_names": ordinate_names,
+            "charts": json.dumps(charts),
+            "graphpage_titles": json.dumps(graphpage_titles),
+            "graphpage_titles_dict": graphpage_titles,
+            "graphpage_content": json.dumps(graphpage_content),
+            "graph_page_buttons": graph_page_buttons,
+            "year_outTemp_range_max": year_outTemp_range_max,
+            "year_outTemp_range_min": year_outTemp_range_min,
+            "at_outTemp_range_max": at_outTemp_range_max,
+            "at_outTemp_range_min": at_outTemp_range_min,
+            "daily_range_records": daily_range_records,
+            "rainiest_day": rainiest_day,
+            "at_rainiest_day": at_rainiest_day,
+            "year_rainiest_month": year_rainiest_month,
+            "at_rainiest_month": at_rainiest_month,
+            "at_rain_highest_year": at_rain_highest_year,
+            "year_days_with_rain": year_days_with_rain,
+            "year_days_without_rain": year_days_without_rain,
+            "at_days_with_rain": at_days_with_rain,
+            "at_days_without_rain": at_days_without_rain,
+            "windSpeedUnitLabel": windSpeed_unit_label,
+            "noaa_header_html": noaa_header_html,
+            "default_noaa_file": default_noaa_file,
+            "current_obs_icon": current_obs_icon,
+            "current_obs_summary": current_obs_summary,
+            "visibility": visibility,
+            "visibility_unit": visibility_unit,
+            "cloud_cover": cloud_cover,
+            "station_obs_json": json.dumps(station_obs_json),
+            "station_obs_html": station_obs_html,
+            "all_obs_rounding_json": json.dumps(all_obs_rounding_json),
+            "all_obs_unit_labels_json": json.dumps(all_obs_unit_labels_json),
+            "earthquake_events": earthquake_events,
+            "earthquake_time": eqtime,
+            "earthquake_url": equrl,
+            "earthquake_place": eqplace,
+            "earthquake_magnitude": eqmag,
+            "earthquake_lat": eqlat,
+            "earthquake_lon": eqlon,
+            "earthquake_distance_away": eqdistance,
+            "earthquake_distance_label": eq_distance_label,
+            "earthquake_bearing": eqbearing,
+            "earthquake_bearing_raw": eqbearing_raw,
+            "social_html": social_html,
+            "custom_css_exists": custom_css_exists,
+            "aqi": aqi,
+            "aqi_category": aqi_category,
+            "aqi_location": aqi_location,
+            "beaufort0": label_dict["beaufort0"],
+            "beaufort1": label_dict["beaufort1"],
+            "beaufort2": label_dict["beaufort2"],
+            "beaufort3": label_dict["beaufort3"],
+            "beaufort4": label_dict["beaufort4"],
+            "beaufort5": label_dict["beaufort5"],
+            "beaufort6": label_dict["beaufort6"],
+            "beaufort7": label_dict["beaufort7"],
+            "beaufort8": label_dict["beaufort8"],
+            "beaufort9": label_dict["beaufort9"],
+            "beaufort10": label_dict["beaufort10"],
+            "beaufort11": label_dict["beaufort11"],
+            "beaufort12": label_dict["beaufort12"],
+            "mqtt_websockets_port_kiosk": mqtt_websockets_port_kiosk,
+            "mqtt_websockets_ssl_kiosk": mqtt_websockets_ssl_kiosk,
+        }
+        return search_list_extension
+
+
+# ======================================================================================
+# Compass directions
+# ======================================================================================
+
+
+class CompassSectors(object):
+    """
+    Maps wind directions and bearings to compass sectors. The names follow
+    the [Units][[Ordinates]] directions option: one name per sector
+    starting at north and going clockwise, then the name to use when there
+    is no direction. The number of names sets the number of sectors, 16 by
+    default.
+
+    Sector i is centred on i * width and covers half a sector either side,
+    so the lookup is one division: floor((degree + width / 2) / width) % n.
+    """
+
+    default_names = (
+        "N",
+        "NNE",
+        "NE",
+        "ENE",
+        "E",
+        "ESE",
+        "SE",
+        "SSE",
+        "S",
+        "SSW",
+        "SW",
+        "WSW",
+        "W",
+        "WNW",
+        "NW",
+        "NNW",
+        "N/A",
+    )
+
+    # Shared instances, keyed by the names
+    instances = {}
+
+    def __init__(self, names):
+        self.labels = list(names)
+        self.names = self.labels[:-1]
+        self.no_direction = self.labels[-1]
+        self.count = len(self.names)
+        self.width = 360.0 / self.count
+        self.offset = self.width / 2
+
+    @classmethod
+    def for_names(cls, names=None):
+        names = tuple(names or cls.default_names)
+        compass = cls.instances.get(names)
+        if compass is None:
+            compass = cls.instances[names] = cls(names)
+        return compass
+
+    @classmethod
+    def for_skin(cls, skin_dict):
+        """The compass for a skin's [Units][[Ordinates]] directions"""
+        try:
+            names = weeutil.weeutil.option_as_list(
+                skin_dict["Units"]["Ordinates"]["directions"]
+            )
+        except KeyError:
+            names = None
+        if names is not None and len(names) < 2:
+            logerr(
+                "[Units][[Ordinates]] directions needs a name for each compass "
+                "sector and one for no direction, using the default directions"
+            )
+            names = None
+        return cls.for_names(names)
+
+    def index(self, degree):
+        """The sector of degree, or None if there is no direction"""
+        if degree is None:
+            return None
+        return int(floor((degree + self.offset) / self.width)) % self.count
+
+    def indexes(self, degrees):
+        """The sectors of a list of directions"""
+        width = self.width
+        offset = self.offset
+        count = self.count
+        return [
+            None if degree is None else int(floor((degree + offset) / width)) % count
+            for degree in degrees
+        ]
+
+    def name(self, degree):
+        index = self.index(degree)
+        return self.no_direction if index is None else self.names[index]
+
+    def name_list(self, degrees):
+        names = self.names
+        return [
+            self.no_direction if index is None else names[index]
+            for index in self.indexes(degrees)
+        ]
+
+
+class WindRose(object):
+    """
+    The windRose chart: the wind speed summed by compass sector and speed
+    bin, as a percentage of the total. The sectors are the compass
+    sectors, and the speed bins are Beaufort-like bins for the chart's
+    wind speed unit or the edges given for the line.
+
+    edges are the lower edges of the bins after the first, in the wind
+    speed unit, so a speed goes in bin bisect_right(edges, speed).
+    """
+
+    # The edges and labels of the default speed bins by wind speed unit
+    speed_bins = {
+        "mile_per_hour": (
+            (1, 4, 8, 13, 19, 25),
+            ("< 1", "1-3", "4-7", "8-12", "13-18", "19-24", "25+"),
+        ),
+        "km_per_hour": (
+            (2, 6, 12, 20, 29, 39),
+            ("< 2", "2-5", "6-11", "12-19", "20-28", "29-38", "39+"),
+        ),
+        "meter_per_second": (
+            (0.5, 1.6, 3.4, 5.6, 8, 10.8),
+            ("< 0.5", "0.5-1.5", "1.6-3.3", "3.4-5.5", "5.6-7.9", "8-10.7", "10.8+"),
+        ),
+        "knot": (
+            (1, 4, 7, 11, 17, 22),
+            ("< 1", "1-3", "4-6", "7-10", "11-16", "17-21", "22+"),
+        ),
+        "beaufort": ((2, 3, 4, 5, 6, 7), ("0", "1", "2", "3", "4", "5", "6+")),
+    }
+    speed_bins["mile_per_hour2"] = speed_bins["mile_per_hour"]
+    speed_bins["km_per_hour2"] = speed_bins["km_per_hour"]
+    speed_bins["meter_per_second2"] = speed_bins["meter_per_second"]
+    speed_bins["knot2"] = speed_bins["knot"]
+
+    # The default colors of the speed bins, the beauford0 to beauford6
+    # options of the line. More bins re-use them.
+    colors = (
+        "#7cb5ec",
+        "#b2df8a",
+        "#f7a35c",
+        "#8c6bb1",
+        "#dd3497",
+        "#e4d354",
+        "#268bd2",
+    )
+
+    def __init__(self, compass, edges, labels):
+        self.compass = compass
+        self.edges = tuple(edges)
+        self.labels = tuple(labels)
+
+    @classmethod
+    def for_unit(cls, compass, unit, edges=None):
+        """
+        The windrose for a wind speed unit, with the default bins or the
+        given edges. None if the unit has no default bins.
+        """
+        if edges:
+            try:
+                edges = sorted(float(edge) for edge in edges)
+            except ValueError:
+                logerr(
+                    "windrose_speed_bins %s is not a list of numbers, "
+                    "using the default bins" % ", ".join(edges)
+                )
+            else:
+                labels = (
+                    ["< %g" % edges[0]]
+                    + ["%g-%g" % pair for pair in zip(edges, edges[1:])]
+                    + ["%g+" % edges[-1]]
+                )
+                return cls(compass, edges, labels)
+        if unit not in cls.speed_bins:
+            return None
+        return cls(compass, *cls.speed_bins[unit])
+
+    def histogram(self, windDirs, windSpeeds):
+        """
+        The wind speed summed by speed bin and sector, rounded to 1 decimal
+        place, in one pass over the samples. Samples without a direction or
+        a speed are left out.
+        """
+        edges = self.edges
+        rose = [[0.0] * self.compass.count for label in self.labels]
+        for sector, windSpeed in zip(self.compass.indexes(windDirs), windSpeeds):
+            if sector is not None and windSpeed is not None:
+                rose[bisect_right(edges, windSpeed)][sector] += windSpeed
+        return [[round(total, 1) for total in speed_bin] for speed_bin in rose]
+
+    def series(self, windDirs, windSpeeds, unit_label, colors):
+        """
+        The Highcharts column series of the windrose, one per speed bin,
+        with the percentage of the total wind in each sector
+        """
+        rose = self.histogram(windDirs, windSpeeds)
+        wind_sum = sum(total for speed_bin in rose for total in speed_bin)
+        if wind_sum > 0:
+            rose = [
+                [round(total / wind_sum * 100) for total in speed_bin]
+                for speed_bin in rose
+            ]
+        return [
+            {
+                "name": "%s %s" % (label, unit_label),
+                "type": "column",
+                "color": colors.get(i, self.colors[i % len(self.colors)]),
+                "zIndex": 106 - i,
+                "stacking": "normal",
+                "fillOpacity": 0.75,
+                "data": speed_bin,
+            }
+            for i, (label, speed_bin) in enumerate(zip(self.labels, rose))
+        ]
+
+
+# ======================================================================================
+# External data
+# ======================================================================================
+
+
+class HTTPResponse(object):
+    """The result of HTTPClient.get: status, headers (lower case names) and body"""
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def validators(self):
+        """The ETag and Last-Modified headers, to send with the next request"""
+        validators = {}
+        if "etag" in self.headers:
+            validators["etag"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            validators["last_modified"] = self.headers["last-modified"]
+        return validators
+
+
+class CircuitBreaker(object):
+    """
+    Stops calling an endpoint that keeps failing. After threshold failed
+    downloads in a row the circuit opens and requests fail straight away for
+    a cool-down which starts at cooldown seconds and doubles with every
+    failure after that, up to max_cooldown. The first request after the
+    cool-down is let through, and a success closes the circuit again.
+    """
+
+    def __init__(self, threshold=2, cooldown=60, max_cooldown=3600):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = {}
+        self.open_until = {}
+        self.lock = threading.Lock()
+
+    def retry_in(self, key):
+        """Seconds until key can be tried again, 0 if the circuit is closed"""
+        with self.lock:
+            return max(0, self.open_until.get(key, 0) - time.time())
+
+    def success(self, key):
+        with self.lock:
+            if self.failures.pop(key, 0) >= self.threshold:
+                loginf("%s is working again" % key)
+            self.open_until.pop(key, None)
+
+    def failure(self, key):
+        with self.lock:
+            failures = self.failures.get(key, 0) + 1
+            self.failures[key] = failures
+            if failures < self.threshold:
+                return
+            cooldown = min(
+                self.max_cooldown,
+                self.cooldown * 2 ** min(failures - self.threshold, 16),
+            )
+            self.open_until[key] = time.time() + cooldown
+        loginf(
+            "%s failed %s times in a row, not trying it again for %s seconds"
+            % (key, failures, int(cooldown))
+        )
+
+
+class HTTPClient(object):
+    """
+    The HTTP client used for all external feeds (Aeris, USGS, GeoNet,
+    ReNaSS).
+
+    Connections are kept open and reused per host, so the forecast parts and
+    later report cycles don't each pay for a new TCP and TLS handshake.
+    Responses are requested gzip compressed. Connection errors, timeouts,
+    429 and 5xx responses are retried with a jittered exponential backoff.
+    Redirects are followed.
+
+    Each request is counted in stats (requests, bytes, seconds, retries,
+    errors and reused connections) and logged with debug on.
+    """
+
+    max_idle = 4
+    max_redirects = 5
+
+    def __init__(self, retries=2, backoff=1.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker()
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.stats = dict(
+            (name, 0) for name in ("requests", "bytes", "seconds", "retries", "errors", "reused")
+        )
+
+    def count(self, **kwargs):
+        with self.lock:
+            for name, value in kwargs.items():
+                self.stats[name] += value
+
+    def get_connection(self, scheme, host, port, timeout):
+        """Return an idle connection to the host, or a new one"""
+        key = (scheme, host, port)
+        with self.lock:
+            connections = self.idle.get(key)
+            if connections:
+                connection = connections.pop()
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+        if sys.version_info[0] >= 3:
+            from http.client import HTTPConnection, HTTPSConnection
+        else:
+            # Python 2
+            from httplib import HTTPConnection, HTTPSConnection
+        if scheme == "https":
+            return HTTPSConnection(host, port, timeout=timeout), False
+        return HTTPConnection(host, port, timeout=timeout), False
+
+    def release_connection(self, scheme, host, port, connection):
+        key = (scheme, host, port)
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < self.max_idle:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def request(self, url, headers, timeout):
+        """Send one GET request and return the HTTPResponse"""
+        if sys.version_info[0] >= 3:
+            from urllib.parse import urlsplit
+        else:
+            # Python 2
+            from urlparse import urlsplit
+
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        request_headers = {"Accept-Encoding": "gzip"}
+        request_headers.update(headers)
+
+        while True:
+            connection, reused = self.get_connection(scheme, parts.hostname, port, timeout)
+            try:
+                connection.request("GET", path, headers=request_headers)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except Exception:
+                connection.close()
+                if reused:
+                    # The server closed the idle connection, try a new one
+                    continue
+                raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            self.release_connection(scheme, parts.hostname, port, connection)
+        if reused:
+            self.count(reused=1)
+
+        response_headers = dict(
+            (name.lower(), value) for name, value in response.getheaders()
+        )
+        size = len(body)
+        if response_headers.get("content-encoding") == "gzip":
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        self.count(bytes=size)
+        return HTTPResponse(response.status, response_headers, body)
+
+    def get(self, url, headers=None, timeout=10, name=None, cancel=None):
+        """
+        Download url. Returns the final HTTPResponse, which can be a 2xx or
+        a 304. Raises IOError if the download fails after the retries.
+
+        name is the feed the URL belongs to. Feeds that share a host and path
+        and only differ in the query (like the forecast parts) each get their
+        own circuit breaker. Without a name the host and path are used.
+
+        cancel is an optional threading.Event. Once it is set the download
+        is given up before the next retry, without counting as a failure.
+        """
+        if sys.version_info[0] >= 3:
+            from urllib.parse import urljoin, urlsplit
+        else:
+            # Python 2
+            from urlparse import urljoin, urlsplit
+
+        if urlsplit(url).scheme.lower() not in ("http", "https"):
+            # e.g. a file:// URL for forecast_dev_file
+            if sys.version_info[0] >= 3:
+                from urllib.request import urlopen
+            else:
+                # Python 2
+                from urllib2 import urlopen
+            response = urlopen(url, timeout=timeout)
+            try:
+                return HTTPResponse(200, {}, response.read())
+            finally:
+                response.close()
+
+        # Only log the host and path since the query can contain API keys
+        log_url = "%s://%s%s" % urlsplit(url)[:3]
+        breaker_key = name or log_url
+        retry_in = self.breaker.retry_in(breaker_key)
+        if retry_in:
+            raise IOError(
+                "%s is failing, not trying it again for %d seconds"
+                % (breaker_key, retry_in)
+            )
+        start_ts = time.time()
+        self.count(requests=1)
+        attempt = 0
+        redirects = 0
+        while True:
+            error = None
+            try:
+                response = self.request(url, headers or {}, timeout)
+            except Exception as e:
+                error = e
+                response = None
+
+            if (
+                response is not None
+                and response.status in (301, 302, 303, 307, 308)
+                and "location" in response.headers
+                and redirects < self.max_redirects
+            ):
+                url = urljoin(url, response.headers["location"])
+                redirects += 1
+                continue
+            if response is not None and response.status < 400:
+                break
+            if response is not None:
+                error = IOError("HTTP error %s" % response.status)
+                if response.status != 429 and response.status < 500:
+                    # Retrying won't help
+                    attempt = self.retries
+            if cancel is not None and cancel.is_set():
+                raise IOError("Gave up downloading %s: %s" % (log_url, error))
+            if attempt >= self.retries:
+                self.count(errors=1, seconds=time.time() - start_ts)
+                self.breaker.failure(breaker_key)
+                raise IOError("Error downloading %s: %s" % (log_url, error))
+            # Jittered exponential backoff
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            attempt += 1
+            self.count(retries=1)
+            logdbg(
+                "Retrying %s in %.1f seconds after: %s" % (log_url, delay, error)
+            )
+            if cancel is None:
+                time.sleep(delay)
+            elif cancel.wait(delay):
+                raise IOError("Gave up downloading %s: %s" % (log_url, error))
+
+        elapsed = time.time() - start_ts
+        self.count(seconds=elapsed)
+        self.breaker.success(breaker_key)
+        if weewx.debug:
+            logdbg(
+                "Downloaded %s in %.2f seconds, %s bytes, status %s. Totals: %s"
+                % (log_url, elapsed, len(response.body), response.status, self.stats)
+            )
+        return response
+
+
+# The HTTP client for all external feeds, shared for the life of weewx
+http_client = HTTPClient()
+
+
+def fetch_urls(urls, headers, timeout, deadline, url_headers=None):
+    """
+    Download several URLs at the same time with the shared http_client.
+    Each request gives up after timeout seconds, and the whole download
+    after deadline seconds. url_headers can add headers to some of the
+    requests, keyed like urls.
+
+    Returns a dict of the HTTPResponses that were downloaded, keyed like
+    urls. Pages that could not be downloaded in time are logged and left
+    out, so the caller can decide what to do with a partial result. The
+    downloads still running at the deadline are cancelled: they stop
+    before their next retry and their result is thrown away.
+    """
+    pages = {}
+    url_headers = url_headers or {}
+    cancel = threading.Event()
+    lock = threading.Lock()
+
+    def fetch(name, url):
+        request_headers = dict(headers)
+        request_headers.update(url_headers.get(name, {}))
+        try:
+            page = http_client.get(url, request_headers, timeout, name, cancel)
+        except Exception as error:
+            if not cancel.is_set():
+                logerr("Error downloading %s. The error was: %s" % (name, error))
+            return
+        with lock:
+            if not cancel.is_set():
+                pages[name] = page
+
+    threads = OrderedDict()
+    for name, url in urls.items():
+        threads[name] = threading.Thread(target=fetch, args=(name, url))
+        # Don't let a download that hangs keep weewx from exiting
+        threads[name].daemon = True
+        threads[name].start()
+
+    deadline_ts = time.time() + deadline
+    for thread in threads.values():
+        thread.join(max(0, deadline_ts - time.time()))
+
+    with lock:
+        cancel.set()
+        results = dict(pages)
+    for name in threads:
+        if name not in results and threads[name].is_alive():
+            logerr("Gave up downloading %s after %s seconds" % (name, deadline))
+    return results
+
+
+class AerisCodedWeather(object):
+    """
+    Translates Aeris coded weather (coverage:intensity:weather, e.g. "C:L:RW")
+    into words using the forecast_cloud_code_*, forecast_coverage_code_*,
+    forecast_intensity_code_* and forecast_weather_code_* labels.
+    https://www.aerisweather.com/support/docs/api/reference/weather-codes/
+
+    Use for_labels() to get a translator. The tables are built once for
+    each set of labels and shared.
+    """
+
+    tables = ("cloud", "coverage", "intensity", "weather")
+    # The codes Aeris gives in place of a weather code for the cloud cover
+    cloud_codes = ("CL", "FW", "SC", "BK", "OV")
+    translators = {}
+
+    def __init__(self, codes):
+        # codes: {table: {code: text}}
+        self.cloud = codes["cloud"]
+        self.coverage = codes["coverage"]
+        self.intensity = codes["intensity"]
+        self.weather = codes["weather"]
+
+    @classmethod
+    def for_labels(cls, labels):
+        codes = dict((table, {}) for table in cls.tables)
+        for name, text in labels.items():
+            for table in cls.tables:
+                prefix = "forecast_%s_code_" % table
+                if name.startswith(prefix):
+                    codes[table][name[len(prefix):]] = text
+        key = tuple(
+            (table, tuple(sorted(codes[table].items()))) for table in cls.tables
+        )
+        if key not in cls.translators:
+            cls.translators[key] = cls(codes)
+        return cls.translators[key]
+
+    def label(self, table, code):
+        """
+        The text of a code. Like a label missing from skin.conf, a code
+        without one is shown as the name of its label.
+        """
+        return getattr(self, table).get(code, "forecast_%s_code_%s" % (table, code))
+
+    def translate(self, coded):
+        """Translate one coded weather string"""
+        coverage_code, intensity_code, weather_code = coded.split(":")[:3]
+        # Check if the weather_code is a cloud code and use that if it is.
+        # If not then it's a combined weather code.
+        if weather_code in self.cloud_codes or weather_code in self.cloud:
+            return self.label("cloud", weather_code)
+        words = []
+        # Add the coverage and intensity if they're present
+        if coverage_code:
+            words.append(self.label("coverage", coverage_code))
+        if intensity_code:
+            words.append(self.label("intensity", intensity_code))
+        words.append(self.label("weather", weather_code))
+        return " ".join(words)
+
+
+class JsonFileCache(object):
+    """
+    Parsed JSON files, kept for the life of weewx and only parsed again when
+    the file changes (its mtime, size or inode). At most max_files files are
+    kept, the least recently used are dropped.
+
+    The parsed data is shared, so it must not be modified.
+    """
+
+    def __init__(self, max_files=8):
+        self.max_files = max_files
+        self.files = OrderedDict()
+        # Shared by the report thread and the background download service
+        self.lock = threading.Lock()
+
+    def load(self, filename):
+        """
+        Return the parsed contents of filename. Raises IOError/OSError if it
+        can't be read and ValueError if it isn't valid JSON, like json.load.
+        """
+        stat = os.stat(filename)
+        key = (stat.st_mtime, stat.st_size, stat.st_ino)
+        with self.lock:
+            entry = self.files.pop(filename, None)
+            if entry is not None and entry[0] == key:
+                self.files[filename] = entry
+                return entry[1]
+        with open(filename, "r") as read_file:
+            data = json.load(read_file)
+        with self.lock:
+            self.files[filename] = (key, data)
+            while len(self.files) > self.max_files:
+                self.files.popitem(last=False)
+        return data
+
+
+# The JSON files read by the skin: forecast.json, earthquake.json and the
+# Aeris icon list
+json_files = JsonFileCache()
+
+
+def project_json(data, fields):
+    """
+    Keep only the fields of data that are in fields, a dict of field name to
+    the fields to keep inside it, or None to keep the whole value. Lists are
+    projected item by item.
+    """
+    if isinstance(data, list):
+        return [project_json(item, fields) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return OrderedDict(
+        (name, data[name] if subfields is None else project_json(data[name], subfields))
+        for name, subfields in fields.items()
+        if name in data
+    )
+
+
+class BelchertownFeeds(object):
+    """
+    Downloads the external data used by the skin into the json folder of
+    HTML_ROOT: the AerisWeather forecast, AQI and alerts (forecast.json) and
+    the latest earthquake (earthquake.json).
+
+    getData uses it to refresh stale files during report generation. The
+    refresh runs in a background thread while the report uses the previous
+    file, so a slow or failing server doesn't hold up the report. With
+    belchertown_background_downloads = 1 the BelchertownDataService does
+    the downloads instead, and getData only reads the files.
+    """
+
+    # The refreshes started by revalidate, keyed by file name
+    refreshing = {}
+    refreshing_lock = threading.Lock()
+
+    # forecast.json only keeps the fields of the Aeris responses which
+    # getData and belchertown.js.tmpl use. Change forecast_version when
+    # forecast_fields changes.
+    forecast_version = 2
+    forecast_periods = dict.fromkeys(
+        (
+            "timestamp",
+            "icon",
+            "weatherPrimaryCoded",
+            "avgTempC",
+            "avgTempF",
+            "minTempC",
+            "minTempF",
+            "maxTempC",
+            "maxTempF",
+            "dewpointC",
+            "dewpointF",
+            "windSpeedKTS",
+            "windSpeedKPH",
+            "windSpeedMPH",
+            "windGustKTS",
+            "windGustKPH",
+            "windGustMPH",
+            "pop",
+            "humidity",
+            "snowCM",
+            "snowIN",
+        )
+    )
+    forecast_fields = {
+        "current": {
+            "ob": dict.fromkeys(
+                ("sky", "weatherPrimaryCoded", "icon", "visibilityKM", "visibilityMI")
+            )
+        },
+        "forecast_24hr": {"periods": forecast_periods},
+        "forecast_3hr": {"periods": forecast_periods},
+        "forecast_1hr": {"periods": forecast_periods},
+        "alerts": {
+            "details": dict.fromkeys(("type", "name", "body")),
+            "timestamps": {"expires": None},
+        },
+        "aqi": {
+            "place": {"name": None},
+            "periods": dict.fromkeys(("aqi", "category", "timestamp")),
+        },
+    }
+
+    user_agent = "Mozilla/5.0 (Macintosh; U; Intel Mac OS X 10_6_4; en-US) AppleWebKit/534.3 (KHTML, like Gecko) Chrome/6.0.472.63 Safari/534.3"
+
+    def __init__(self, extras, html_root, latitude, longitude):
+        self.extras = extras
+        self.latitude = latitude
+        self.longitude = longitude
+        self.forecast_file = os.path.join(html_root, "json", "forecast.json")
+        self.forecast_raw_file = os.path.join(html_root, "json", "forecast_raw.json")
+        self.earthquake_file = os.path.join(html_root, "json", "earthquake.json")
+        self.headers = {"User-Agent": self.user_agent}
+
+    def forecast_enabled(self):
+        return (
+            self.extras.get("forecast_enabled") == "1"
+            and self.extras.get("forecast_api_id", "") != ""
+            or "forecast_dev_file" in self.extras
+        )
+
+    def earthquake_enabled(self):
+        return self.extras.get("earthquake_enabled") == "1"
+
+    def file_age(self, filename):
+        """Seconds since filename was written, or None if it doesn't exist"""
+        if not os.path.isfile(filename):
+            return None
+        return int(time.time()) - int(os.path.getmtime(filename))
+
+    def write_file(self, filename, data):
+        """
+        Write data to filename through a temporary file in the same folder,
+        so the web server and the templates never see a partly written file.
+        """
+        tmp_filename = "%s.%s.tmp" % (filename, os.getpid())
+        with open(tmp_filename, "wb") as file:
+            file.write(data)
+        try:
+            os.replace(tmp_filename, filename)
+        except AttributeError:
+            # Python 2. rename replaces the file on POSIX
+            os.rename(tmp_filename, filename)
+
+    def project_forecast(self, name, response):
+        """The parts of an Aeris response that are kept in forecast.json"""
+        return project_json(
+            response,
+            {"success": None, "error": None, "response": self.forecast_fields[name]},
+        )
+
+    def forecast_urls(self):
+        """The Aeris URLs of each part of forecast.json, in file order"""
+        latitude = self.latitude
+        longitude = self.longitude
+        forecast_api_id = self.extras["forecast_api_id"]
+        forecast_api_secret = self.extras["forecast_api_secret"]
+        forecast_lang = self.extras["forecast_lang"].lower()
+
+        urls = OrderedDict()
+        if self.extras["forecast_aeris_use_metar"] == "1":
+            urls["current"] = (
+                "https://api.aerisapi.com/observations/%s,%s?&format=json&filter=allstations&filter=metar&limit=1&client_id=%s&client_secret=%s"
+                % (latitude, longitude, forecast_api_id, forecast_api_secret)
+            )
+        else:
+            urls["current"] = (
+                "https://api.aerisapi.com/observations/%s,%s?&format=json&filter=allstations&limit=1&client_id=%s&client_secret=%s"
+                % (latitude, longitude, forecast_api_id, forecast_api_secret)
+            )
+        urls["forecast_24hr"] = (
+            "https://api.aerisapi.com/forecasts/%s,%s?&format=json&filter=day&limit=7&client_id=%s&client_secret=%s"
+            % (latitude, longitude, forecast_api_id, forecast_api_secret)
+        )
+        urls["forecast_3hr"] = (
+            "https://api.aerisapi.com/forecasts/%s,%s?&format=json&filter=3hr&limit=8&client_id=%s&client_secret=%s"
+            % (latitude, longitude, forecast_api_id, forecast_api_secret)
+        )
+        urls["forecast_1hr"] = (
+            "https://api.aerisapi.com/forecasts/%s,%s?&format=json&filter=1hr&limit=16&client_id=%s&client_secret=%s"
+            % (latitude, longitude, forecast_api_id, forecast_api_secret)
+        )
+        if self.extras["forecast_alert_enabled"] == "1":
+            # Default to 1 alerts to show if the option is missing. Can go up to 10
+            forecast_alert_limit = self.extras.get("forecast_alert_limit") or 1
+            urls["alerts"] = (
+                "https://api.aerisapi.com/alerts/%s,%s?&format=json&limit=%s&lang=%s&client_id=%s&client_secret=%s"
+                % (
+                    latitude,
+                    longitude,
+                    forecast_alert_limit,
+                    forecast_lang,
+                    forecast_api_id,
+                    forecast_api_secret,
+                )
+            )
+        urls["aqi"] = (
+            "https://api.aerisapi.com/airquality/closest?p=%s,%s&format=json&radius=50mi&limit=1&client_id=%s&client_secret=%s"
+            % (latitude, longitude, forecast_api_id, forecast_api_secret)
+        )
+        return urls
+
+    def load_meta(self, filename):
+        """
+        Read the sidecar file (filename.meta) which records when each feed
+        in filename was downloaded. Returns None if there isn't one.
+        """
+        try:
+            with open(filename + ".meta", "r") as read_file:
+                return json.load(read_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def save_meta(self, filename, meta):
+        try:
+            self.write_file(filename + ".meta", json.dumps(meta).encode("utf-8"))
+        except (IOError, OSError) as e:
+            logerr("Error writing %s.meta. Reason: %s" % (filename, e))
+
+    def conditional_headers(self, feed_meta):
+        """
+        The If-None-Match and If-Modified-Since headers for a feed we
+        already have, so the server can answer 304 if it hasn't changed
+        """
+        headers = {}
+        if feed_meta.get("etag"):
+            headers["If-None-Match"] = feed_meta["etag"]
+        if feed_meta.get("last_modified"):
+            headers["If-Modified-Since"] = feed_meta["last_modified"]
+        return headers
+
+    def forecast_feed_stale(self, name):
+        """The staleness timer of a part of the forecast, in seconds"""
+        suffix = name.replace("forecast_", "")
+        return int(
+            self.extras.get("forecast_stale_%s" % suffix)
+            or self.extras["forecast_stale"]
+        )
+
+    def stale_forecast_feeds(self):
+        """The parts of the forecast that need to be downloaded"""
+        forecast_urls = self.forecast_urls()
+        file_age = self.file_age(self.forecast_file)
+        if file_age is None:
+            # File doesn't exist, download a new copy
+            return list(forecast_urls)
+        meta = self.load_meta(self.forecast_file)
+        now = time.time()
+        stale = []
+        for name in forecast_urls:
+            if meta is None:
+                # Written before the parts were tracked, use the file's time
+                age = file_age
+            elif name in meta.get("feeds", {}):
+                age = now - meta["feeds"][name]["fetched"]
+            else:
+                # New part, e.g. alerts were just enabled
+                stale.append(name)
+                continue
+            if age > self.forecast_feed_stale(name):
+                stale.append(name)
+            elif name == "forecast_1hr" and time.strftime("%M") < "05" and age > 300:
+                # Enhanced for the 1 hr forecast to load close to the hour.
+                # Catches repeated calls every archive interval (300secs)
+                stale.append(name)
+        return stale
+
+    def forecast_is_stale(self):
+        if "forecast_dev_file" in self.extras:
+            age = self.file_age(self.forecast_file)
+            return age is None or age > int(self.extras["forecast_stale"])
+        return len(self.stale_forecast_feeds()) > 0
+
+    def update_forecast(self):
+        """
+        Download the stale parts of forecast.json and merge them with the
+        rest of the previous file. Raises Warning if the forecast can't be
+        downloaded or saved.
+        """
+        forecast_file = self.forecast_file
+        forecast_timeout = float(self.extras.get("forecast_timeout", 10))
+        forecast_deadline = float(self.extras.get("forecast_deadline", 30))
+        meta = None
+        if "forecast_dev_file" in self.extras:
+            # Hidden option to use a pre-downloaded forecast file rather than
+            # using API calls for no reason
+            dev_forecast_file = self.extras["forecast_dev_file"]
+            pages = fetch_urls(
+                {"forecast_dev_file": dev_forecast_file},
+                self.headers,
+                forecast_timeout,
+                forecast_deadline,
+            )
+            if "forecast_dev_file" not in pages:
+                raise Warning(
+                    "Error downloading forecast data from %s" % dev_forecast_file
+                )
+            forecast_file_result = pages["forecast_dev_file"].body
+        else:
+            forecast_urls = self.forecast_urls()
+            stale = self.stale_forecast_feeds()
+
+            previous_forecast = {}
+            if os.path.isfile(forecast_file):
+                try:
+                    previous_forecast = json_files.load(forecast_file)
+                except Exception as error:
+                    logerr(
+                        "Unable to read the previous forecast file %s. "
+                        "The error was: %s" % (forecast_file, error)
+                    )
+            meta = self.load_meta(forecast_file) or {}
+            feeds_meta = meta.setdefault("feeds", {})
+            if not feeds_meta and "timestamp" in previous_forecast:
+                # Written before the parts were tracked
+                for name in previous_forecast:
+                    if name in self.forecast_fields:
+                        feeds_meta[name] = {"fetched": previous_forecast["timestamp"]}
+
+            # Download the stale parts of the forecast at the same time. The
+            # parts we still have are only sent again if they changed
+            pages = fetch_urls(
+                OrderedDict((name, forecast_urls[name]) for name in stale),
+                self.headers,
+                forecast_timeout,
+                forecast_deadline,
+                dict(
+                    (name, self.conditional_headers(feeds_meta[name]))
+                    for name in stale
+                    if name in previous_forecast and name in feeds_meta
+                ),
+            )
+
+            forecast_data = OrderedDict(
+                [("timestamp", int(time.time())), ("version", self.forecast_version)]
+            )
+            save_raw = to_bool(self.extras.get("forecast_save_raw", False))
+            raw_data = OrderedDict([("timestamp", forecast_data["timestamp"])])
+            if save_raw:
+                try:
+                    raw_data.update(json_files.load(self.forecast_raw_file))
+                except Exception:
+                    pass
+                raw_data["timestamp"] = forecast_data["timestamp"]
+            downloaded = []
+            not_modified = []
+            missing = []
+            for name in forecast_urls:
+                if name in pages and pages[name].status == 304:
+                    # Unchanged, keep the part we have as if it was new
+                    feeds_meta[name]["fetched"] = int(time.time())
+                    not_modified.append(name)
+                elif name in pages:
+                    try:
+                        response = json.loads(pages[name].body.decode("utf-8"))
+                        forecast_data[name] = [self.project_forecast(name, response)]
+                        raw_data[name] = [response]
+                        feeds_meta[name] = dict(
+                            fetched=int(time.time()), **pages[name].validators()
+                        )
+                        downloaded.append(name)
+                        continue
+                    except ValueError as error:
+                        logerr(
+                            "Forecast %s data is not valid JSON. The error "
+                            "was: %s" % (name, error)
+                        )
+                if name in previous_forecast:
+                    # Not stale, not modified or couldn't be downloaded.
+                    # Failed parts stay stale and are tried again on the
+                    # next update. Files from older versions of the skin
+                    # have the whole response
+                    forecast_data[name] = [
+                        self.project_forecast(name, response)
+                        for response in previous_forecast[name]
+                    ]
+                else:
+                    missing.append(name)
+
+            if missing:
+                raise Warning(
+                    "Error downloading forecast data. "
+                    "Check the forecast settings in your configuration and "
+                    "try again. Unable to download: %s" % ", ".join(missing)
+                )
+            failed = [
+                name for name in stale if name not in downloaded + not_modified
+            ]
+            if failed:
+                loginf(
+                    "Unable to download all of the forecast, using the "
+                    "previous forecast for: %s" % ", ".join(failed)
+                )
+            if not downloaded:
+                # Nothing new was downloaded, keep the previous file
+                if not_modified:
+                    if weewx.debug:
+                        logdbg(
+                            "Forecast not modified: %s" % ", ".join(not_modified)
+                        )
+                    self.save_meta(forecast_file, meta)
+                return
+            forecast_file_result = json.dumps(
+                forecast_data, separators=(",", ":")
+            ).encode("utf-8")
+            if save_raw:
+                # The full responses, to help with debugging
+                try:
+                    self.write_file(
+                        self.forecast_raw_file, json.dumps(raw_data).encode("utf-8")
+                    )
+                except (IOError, OSError) as e:
+                    logerr(
+                        "Error writing %s. Reason: %s" % (self.forecast_raw_file, e)
+                    )
+
+        try:
+            self.write_file(forecast_file, forecast_file_result)
+            loginf("New forecast file downloaded to %s" % forecast_file)
+        except (IOError, OSError) as e:
+            raise Warning(
+                "Error writing forecast info to %s. Reason: %s" % (forecast_file, e)
+            )
+        if meta is not None:
+            self.save_meta(forecast_file, meta)
+
+    def earthquake_url(self):
+        latitude = self.latitude
+        longitude = self.longitude
+        earthquake_maxradiuskm = self.extras["earthquake_maxradiuskm"]
+        earthquake_server = self.extras["earthquake_server"]
+        earthquake_limit = to_int(self.extras.get("earthquake_limit", 1))
+        # Sample URL from Belchertown Weather:
+        # http://earthquake.usgs.gov/fdsnws/event/1/query?limit=1&lat=42.223&lon=-72.374&maxradiuskm=1000&format=geojson&nodata=204&minmag=2
+        if earthquake_server == "USGS":
+            return (
+                "http://earthquake.usgs.gov/fdsnws/event/1/query?limit=%s&lat=%s&lon=%s&maxradiuskm=%s&format=geojson&nodata=204&minmag=2"
+                % (earthquake_limit, latitude, longitude, earthquake_maxradiuskm)
+            )
+        elif earthquake_server == "GeoNet":
+            return "https://api.geonet.org.nz/quake?MMI=%s" % self.extras["geonet_mmi"]
+        elif earthquake_server == "ReNaSS":
+            # Calculate min/max latitude and min/max longitude from radius and station location. https://stackoverflow.com/a/23118314
+            lat = float(latitude)
+            long = float(longitude)
+            radiusInKm = int(earthquake_maxradiuskm)
+
+            kmInLongitudeDegree = 111.320 * cos(lat / 180.0 * pi)
+
+            deltaLat = radiusInKm / 111.1
+            deltaLong = radiusInKm / kmInLongitudeDegree
+
+            minLat = lat - deltaLat
+            maxLat = lat + deltaLat
+            minLong = long - deltaLong
+            maxLong = long + deltaLong
+
+            return (
+                "https://api.franceseisme.fr/fdsnws/event/1/query?eventtype=earthquake&minmagnitude=2&minlatitude=%.2f&minlongitude=%.2f&maxlatitude=%.2f&maxlongitude=%.2f&format=json&limit=%s&orderby=time"
+                % (minLat, minLong, maxLat, maxLong, earthquake_limit)
+            )
+        raise Warning("Unknown earthquake_server %s" % earthquake_server)
+
+    def earthquake_is_stale(self):
+        age = self.file_age(self.earthquake_file)
+        if age is None:
+            # Download a new copy if the file doesn't exist
+            return True
+        meta = self.load_meta(self.earthquake_file)
+        if meta is not None and "fetched" in meta:
+            # A 304 doesn't touch the file, only its meta
+            age = time.time() - meta["fetched"]
+        return age > int(self.extras["earthquake_stale"])
+
+    def update_earthquake(self):
+        """
+        Download a new earthquake.json, or only mark it as fresh if the
+        server says it hasn't changed. Raises Warning if the earthquake data
+        can't be downloaded or saved.
+        """
+        earthquake_url = self.earthquake_url()
+        earthquake_file = self.earthquake_file
+        headers = dict(self.headers)
+        meta = None
+        if os.path.isfile(earthquake_file):
+            meta = self.load_meta(earthquake_file)
+            if meta is not None and meta.get("url") == earthquake_url:
+                headers.update(self.conditional_headers(meta))
+        try:
+            response = http_client.get(
+                earthquake_url,
+                headers,
+                float(self.extras.get("earthquake_timeout", 10)),
+                "earthquake",
+            )
+        except Exception as error:
+            raise Warning(
+                "Error downloading earthquake data. "
+                "Check the earthquake settings in your configuration and try "
+                "again. The error is: %s" % error
+            )
+
+        if response.status == 304:
+            meta["fetched"] = int(time.time())
+            self.save_meta(earthquake_file, meta)
+            if weewx.debug:
+                logdbg("Earthquake data not modified")
+            return
+
+        try:
+            self.write_file(earthquake_file, response.body)
+            if weewx.debug:
+                logdbg("Earthquake data saved to %s" % earthquake_file)
+        except (IOError, OSError) as e:
+            raise Warning(
+                "Error writing earthquake data to %s. Reason: %s" % (earthquake_file, e)
+            )
+        self.save_meta(
+            earthquake_file,
+            dict(fetched=int(time.time()), url=earthquake_url, **response.validators()),
+        )
+
+    def feeds(self):
+        """(file, is_stale, update) of each enabled feed"""
+        feeds = []
+        if self.forecast_enabled():
+            feeds.append((self.forecast_file, self.forecast_is_stale, self.update_forecast))
+        if self.earthquake_enabled():
+            feeds.append(
+                (self.earthquake_file, self.earthquake_is_stale, self.update_earthquake)
+            )
+        return feeds
+
+    def run_update(self, update):
+        try:
+            update()
+        except Exception as error:
+            logerr("Download failed: %s" % error)
+
+    def refresh(self):
+        """Download the enabled feeds that are stale. Errors are logged."""
+        for filename, is_stale, update in self.feeds():
+            try:
+                stale = is_stale()
+            except Exception as error:
+                logerr("Background download failed: %s" % error)
+                continue
+            if stale:
+                self.run_update(update)
+
+    def revalidate(self):
+        """
+        Stale-while-revalidate for getData. A stale file is refreshed in a
+        background thread and the report uses the file that's there. Only a
+        missing file is downloaded straight away, since there is nothing to
+        show without it. Errors are logged, not raised.
+        """
+        for filename, is_stale, update in self.feeds():
+            if not os.path.isfile(filename):
+                self.run_update(update)
+                continue
+            try:
+                if not is_stale():
+                    continue
+            except Exception as error:
+                logerr("Error checking %s: %s" % (filename, error))
+                continue
+            with self.refreshing_lock:
+                thread = self.refreshing.get(filename)
+                if thread is not None and thread.is_alive():
+                    # The last refresh is still running
+                    continue
+                thread = threading.Thread(
+                    target=self.run_update,
+                    args=(update,),
+                    name="belchertown-refresh",
+                )
+                # Don't let a download that hangs keep weewx from exiting
+                thread.daemon = True
+                self.refreshing[filename] = thread
+                thread.start()
+
+
+class BelchertownDataService(StdService):
+    """
+    Downloads the forecast and earthquake data in a background thread, so
+    the report cycle never waits on the network. It runs for each report
+    using the Belchertown skin that has belchertown_background_downloads = 1
+    and does nothing otherwise.
+
+    The feeds are checked every belchertown_background_interval seconds
+    (default 60) and only downloaded once they are stale, using the same
+    forecast_stale and earthquake_stale settings as the skin.
+    """
+
+    def __init__(self, engine, config_dict):
+        super(BelchertownDataService, self).__init__(engine, config_dict)
+        self.stop_event = threading.Event()
+        self.threads = []
+
+        try:
+            from weewx.reportengine import build_skin_dict
+        except ImportError:
+            logerr("Background downloads need weewx 4.6 or later")
+            return
+
+        for report in config_dict.get("StdReport", {}).sections:
+            if config_dict["StdReport"][report].get("skin") != "Belchertown":
+                continue
+            skin_dict = build_skin_dict(config_dict, report)
+            extras = skin_dict.get("Extras", {})
+            if not to_bool(extras.get("belchertown_background_downloads", False)):
+                continue
+            html_root = os.path.join(
+                config_dict["WEEWX_ROOT"],
+                skin_dict.get("HTML_ROOT", config_dict["StdReport"].get("HTML_ROOT", "")),
+            )
+            feeds = BelchertownFeeds(
+                extras,
+                html_root,
+                config_dict["Station"]["latitude"],
+                config_dict["Station"]["longitude"],
+            )
+            interval = to_int(extras.get("belchertown_background_interval", 60))
+            thread = threading.Thread(
+                target=self.run, args=(feeds, interval), name="belchertown-%s" % report
+            )
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+            loginf(
+                "Background downloads started for report %s, every %s seconds"
+                % (report, interval)
+            )
+
+    def run(self, feeds, interval):
+        while not self.stop_event.is_set():
+            feeds.refresh()
+            self.stop_event.wait(interval)
+
+    def shutDown(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(10)
+
+
+# ======================================================================================
+# Records
+# ======================================================================================
+
+
+class DailyRangeRecords(object):
+    """
+    Largest and smallest daily range (max - min) of an observation, for the
+    current year and for all time. Days are read from archive_day_<obs>, so
+    any observation with a daily summary can be used. All four records come
+    from the same pass over the daily summary. Today is not included since
+    the day is not complete yet.
+
+    If places is set, the range, min and max are rounded to that many
+    decimals before they are compared.
+    """
+
+    include_today = False
+
+    def __init__(self, obs_type, places=None):
+        self.obs_type = obs_type
+        self.places = places
+        self.name = "%s_range" % obs_type
+        self.table = "archive_day_%s" % obs_type
+        self.columns = ("min", "max")
+
+    def new_state(self):
+        return {
+            "year": None,
+            "year_max": None,
+            "year_min": None,
+            "at_max": None,
+            "at_min": None,
+        }
+
+    def add_day(self, state, row):
+        if row["min"] is None or row["max"] is None:
+            return
+        # Records are [dateTime, total, min, max]
+        record = [row["dateTime"], row["max"] - row["min"], row["min"], row["max"]]
+        if self.places is not None:
+            record[1:] = [round(value, self.places) for value in record[1:]]
+        day_year = time.localtime(row["dateTime"]).tm_year
+        if day_year != state["year"]:
+            state["year"] = day_year
+            state["year_max"] = None
+            state["year_min"] = None
+        for key in ("year_max", "at_max"):
+            if state[key] is None or record[1] > state[key][1]:
+                state[key] = record
+        for key in ("year_min", "at_min"):
+            if state[key] is None or record[1] < state[key][1]:
+                state[key] = record
+
+    def results(self, state, year):
+        if state["year"] != year:
+            year_max = year_min = None
+        else:
+            year_max = state["year_max"]
+            year_min = state["year_min"]
+        return {
+            "year_max": year_max,
+            "year_min": year_min,
+            "at_max": state["at_max"],
+            "at_min": state["at_min"],
+        }
+
+
+class RainRecords(object):
+    """
+    Rainiest day, month and year. Month and year totals are kept as running
+    totals in the station's local time, and compared to the best completed
+    month and year as each one closes.
+    """
+
+    name = "rain"
+    table = "archive_day_rain"
+    columns = ("sum",)
+    include_today = True
+
+    def new_state(self):
+        return {
+            "year": None,
+            "year_day": None,
+            "year_month": None,
+            "year_total": 0.0,
+            "month": None,
+            "month_total": 0.0,
+            "at_day": None,
+            "at_month": None,
+            "at_year": None,
+        }
+
+    def add_day(self, state, row):
+        if row["sum"] is None:
+            return
+        day = time.localtime(row["dateTime"])
+        if [day.tm_year, day.tm_mon] != state["month"]:
+            self.close_month(state)
+            state["month"] = [day.tm_year, day.tm_mon]
+            state["month_total"] = 0.0
+        if day.tm_year != state["year"]:
+            self.close_year(state)
+            state["year"] = day.tm_year
+            state["year_total"] = 0.0
+            state["year_day"] = None
+            state["year_month"] = None
+        state["month_total"] += row["sum"]
+        state["year_total"] += row["sum"]
+        for key in ("year_day", "at_day"):
+            if state[key] is None or row["sum"] > state[key][1]:
+                state[key] = [row["dateTime"], row["sum"]]
+
+    def close_month(self, state):
+        if state["month"] is None:
+            return
+        # [year, month, total]
+        month = state["month"] + [state["month_total"]]
+        if state["at_month"] is None or month[2] > state["at_month"][2]:
+            state["at_month"] = month
+        if month[0] == state["year"] and (
+            state["year_month"] is None or month[2] > state["year_month"][2]
+        ):
+            state["year_month"] = month
+
+    def close_year(self, state):
+        if state["year"] is None:
+            return
+        if state["at_year"] is None or state["year_total"] > state["at_year"][1]:
+            state["at_year"] = [state["year"], state["year_total"]]
+
+    def results(self, state, year):
+        # The running month and year are candidates too, so close them on
+        # this copy of the state.
+        self.close_month(state)
+        self.close_year(state)
+        if state["year"] != year:
+            year_day = year_month = None
+        else:
+            year_day = state["year_day"]
+            year_month = state["year_month"]
+        return {
+            "year_day": year_day,
+            "year_month": year_month,
+            "at_day": state["at_day"],
+            "at_month": state["at_month"],
+            "at_year": state["at_year"],
+        }
+
+
+class RainStreakRecords(object):
+    """
+    Consecutive days with and without rain. The current streaks are
+    extended one day at a time, and the best streaks are kept with the date
+    they ended. Days without any archive records do not break a streak.
+    """
+
+    name = "rain_streak"
+    table = "archive_day_rain"
+    columns = ("sum", "count")
+    include_today = True
+
+    def new_state(self):
+        return {
+            "year": None,
+            "year_wet": 0,
+            "year_dry": 0,
+            "year_best_wet": None,
+            "year_best_dry": None,
+            "wet": 0,
+            "dry": 0,
+            "best_wet": None,
+            "best_dry": None,
+        }
+
+    def add_day(self, state, row):
+        if not row["count"] or row["sum"] is None:
+            return
+        day_year = time.localtime(row["dateTime"]).tm_year
+        if day_year != state["year"]:
+            state["year"] = day_year
+            state["year_wet"] = state["year_dry"] = 0
+            state["year_best_wet"] = state["year_best_dry"] = None
+        wet = round(row["sum"], 2) != 0
+        for prefix in ("year_", ""):
+            if wet:
+                state[prefix + "wet"] += 1
+                state[prefix + "dry"] = 0
+            else:
+                state[prefix + "wet"] = 0
+                state[prefix + "dry"] += 1
+            # Streaks are [days, dateTime]. Ties go to the most recent streak.
+            for kind in ("wet", "dry"):
+                streak = [state[prefix + kind], row["dateTime"]]
+                best = prefix + "best_" + kind
+                if state[best] is None or streak >= state[best]:
+                    state[best] = streak
+
+    def results(self, state, year):
+        if state["year"] != year:
+            year_wet = year_dry = None
+        else:
+            year_wet = state["year_best_wet"]
+            year_dry = state["year_best_dry"]
+        return {
+            "year_wet": year_wet,
+            "year_dry": year_dry,
+            "at_wet": state["best_wet"],
+            "at_dry": state["best_dry"],
+        }
+
+
+def sql_number(value):
+    """
+    A number from the database as an int or float. MySQL returns SUM() as a
+    Decimal, which json can't store.
+    """
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return value
+
+
+def add_sums(sums, others):
+    """Add two lists of SUM() results. None, the sum of no rows, counts as 0"""
+    return [(a or 0) + (b or 0) for a, b in zip(sums, others)]
+
+
+def sums_match(sums, others):
+    """Compare two lists of sums, which can differ by rounding"""
+    if len(sums) != len(others):
+        return False
+    for a, b in zip(sums, others):
+        a = a or 0.0
+        b = b or 0.0
+        if abs(a - b) > 1e-12 * max(1.0, abs(a), abs(b)):
+            return False
+    return True
+
+
+class BelchertownRecords(object):
+    """
+    Keeps the year-to-date and all time records used by the skin in a small
+    state table (belchertown_records) in the station database.
+
+    Only the daily summaries newer than the watermark are read on each
+    report cycle, so looking up the records does not depend on how long the
+    station has existed. The records are rebuilt from scratch when the daily
+    summaries before the watermark change. Days that are added or removed
+    (e.g. by a rebuild or a backfill) are noticed on the next report cycle.
+    Changed values (a corrected reading, or records added to a day that was
+    already there) are noticed when weewx starts and at the start of each
+    day. Drop the belchertown_records table to force a rebuild.
+    """
+
+    table_name = "belchertown_records"
+    state_version = 3
+
+    # Checked every report cycle. Only reads the dateTime primary key.
+    shape_sql = "SELECT COUNT(*), MIN(dateTime), MAX(dateTime) FROM %s WHERE dateTime < ?;"
+    # The sums of the values, checked when weewx starts and once a day. The
+    # days folded in are added to the saved sums, so they are never read twice
+    sums_sql = (
+        "SELECT SUM(min), SUM(max), SUM(sum), SUM(count) FROM %s "
+        "WHERE dateTime >= ? AND dateTime < ?;"
+    )
+
+    def __init__(self, trackers):
+        self.trackers = trackers
+        self.state = None
+        self.persist = True
+        # The start of the day the sums were last checked
+        self.checked_ts = None
+
+    def tables(self):
+        """Group the trackers by the daily summary table they read"""
+        tables = OrderedDict()
+        for tracker in self.trackers:
+            tables.setdefault(tracker.table, []).append(tracker)
+        return tables
+
+    def columns(self, table):
+        """The columns to select from a table for all of its trackers"""
+        names = ["dateTime"]
+        for tracker in self.tables()[table]:
+            names.extend(c for c in tracker.columns if c not in names)
+        return names
+
+    def new_state(self):
+        return {
+            "version": self.state_version,
+            "watermark": None,
+            "tables": {},
+            "records": dict(
+                (tracker.name, tracker.new_state()) for tracker in self.trackers
+            ),
+        }
+
+    def load_state(self, manager):
+        """Read the saved state, creating the state table if needed"""
+        try:
+            if self.table_name not in manager.connection.tables():
+                with weedb.Transaction(manager.connection) as cursor:
+                    cursor.execute(
+                        "CREATE TABLE %s (record_name VARCHAR(64) NOT NULL "
+                        "PRIMARY KEY, record_json TEXT)" % self.table_name
+                    )
+                loginf("Records: created the %s table" % self.table_name)
+                return None
+            saved = {}
+            for row in manager.genSql(
+                "SELECT record_name, record_json FROM %s" % self.table_name
+            ):
+                saved[row[0]] = json.loads(row[1])
+        except Exception as error:
+            logerr(
+                "Records: unable to use the %s table, records will be kept in "
+                "memory only. The error was: %s" % (self.table_name, error)
+            )
+            self.persist = False
+            return None
+
+        state = saved.pop("meta", None)
+        if state is None or state.get("version") != self.state_version:
+            return None
+        state["records"] = saved
+        for tracker in self.trackers:
+            if tracker.name not in saved:
+                # A new tracker was added, so everything has to be rebuilt
+                return None
+        return state
+
+    def save_state(self, manager):
+        if not self.persist:
+            return
+        meta = dict(
+            (key, value) for key, value in self.state.items() if key != "records"
+        )
+        rows = [("meta", meta)] + list(self.state["records"].items())
+        try:
+            with weedb.Transaction(manager.connection) as cursor:
+                for name, value in rows:
+                    cursor.execute(
+                        "REPLACE INTO %s (record_name, record_json) VALUES (?, ?)"
+                        % self.table_name,
+                        (name, json.dumps(value)),
+                    )
+        except Exception as error:
+            logerr(
+                "Records: unable to save the records to the %s table. "
+                "The error was: %s" % (self.table_name, error)
+            )
+
+    def shape(self, manager, table, stop_ts):
+        """The number of days, first and last day before stop_ts"""
+        return [
+            sql_number(value)
+            for value in manager.getSql(self.shape_sql % table, (stop_ts,))
+        ]
+
+    def sums(self, manager, table, start_ts, stop_ts):
+        """The sums of the values of the days from start_ts up to stop_ts"""
+        return [
+            sql_number(value)
+            for value in manager.getSql(self.sums_sql % table, (start_ts, stop_ts))
+        ]
+
+    def is_valid(self, manager, check_sums):
+        """
+        Check that the daily summaries before the watermark are the ones we
+        processed. With check_sums the values are compared too, which reads
+        every day before the watermark.
+        """
+        watermark = self.state["watermark"]
+        if watermark is None:
+            return False
+        for table in self.tables():
+            saved = self.state["tables"].get(table)
+            if saved is None or self.shape(manager, table, watermark) != saved["shape"]:
+                return False
+            if check_sums and not sums_match(
+                self.sums(manager, table, 0, watermark), saved["sums"]
+            ):
+                return False
+        return True
+
+    def fold(self, manager, state, start_ts, stop_ts):
+        """Add the days from start_ts up to stop_ts to the state"""
+        for table, trackers in self.tables().items():
+            names = self.columns(table)
+            for row in manager.genSql(
+                "SELECT %s FROM %s WHERE dateTime >= ? AND dateTime < ? "
+                "ORDER BY dateTime ASC;" % (", ".join(names), table),
+                (start_ts, stop_ts),
+            ):
+                row = dict(zip(names, row))
+                for tracker in trackers:
+                    tracker.add_day(state["records"][tracker.name], row)
+            sums = self.sums(manager, table, start_ts, stop_ts)
+            if table in state["tables"]:
+                sums = add_sums(state["tables"][table]["sums"], sums)
+            state["tables"][table] = {
+                "shape": self.shape(manager, table, stop_ts),
+                "sums": sums,
+            }
+        state["watermark"] = stop_ts
+
+    def update(self, manager, today_start_ts):
+        """Process the complete days since the watermark"""
+        if self.state is None:
+            self.state = self.load_state(manager)
+        check_sums = self.checked_ts != today_start_ts
+        rebuild = self.state is None or not self.is_valid(manager, check_sums)
+        self.checked_ts = today_start_ts
+        if rebuild:
+            if self.state is not None:
+                loginf("Records: the daily summaries have changed, rebuilding")
+            self.state = self.new_state()
+        elif self.state["watermark"] >= today_start_ts:
+            return
+
+        self.fold(manager, self.state, self.state["watermark"] or 0, today_start_ts)
+        self.save_state(manager)
+
+    def verify(self, manager, today_start_ts):
+        """
+        Rebuild the records from scratch and compare them to the incremental
+        records. If they differ the rebuilt records are used and saved.
+        """
+        self.update(manager, today_start_ts)
+        state = self.new_state()
+        self.fold(manager, state, 0, today_start_ts)
+        # Compare through JSON, which is how the state is stored. The sums
+        # of the tables can differ by rounding, so only the records count
+        if json.loads(json.dumps(state["records"])) == json.loads(
+            json.dumps(self.state["records"])
+        ):
+            loginf("Records: verified the records against a full rebuild")
+            return True
+        for name in state["records"]:
+            if state["records"][name] != self.state["records"].get(name):
+                logerr(
+                    "Records: %s does not match a full rebuild. Incremental: %s, "
+                    "rebuilt: %s" % (name, self.state["records"].get(name), state["records"][name])
+                )
+        logerr("Records: using the rebuilt records")
+        self.state = state
+        self.save_state(manager)
+        return False
+
+    def get_records(self, manager, today_start_ts):
+        """
+        Return the records of each tracker. Trackers which include today get
+        today's daily summary added to a copy of their state.
+        """
+        self.update(manager, today_start_ts)
+        year = time.localtime(today_start_ts).tm_year
+        today_rows = {}
+        records = {}
+        for tracker in self.trackers:
+            state = self.state["records"][tracker.name]
+            if tracker.include_today:
+                if tracker.table not in today_rows:
+                    names = self.columns(tracker.table)
+                    today_rows[tracker.table] = [
+                        dict(zip(names, row))
+                        for row in manager.genSql(
+                            "SELECT %s FROM %s WHERE dateTime >= ?;"
+                            % (", ".join(names), tracker.table),
+                            (today_start_ts,),
+                        )
+                    ]
+                state = copy.deepcopy(state)
+                for row in today_rows[tracker.table]:
+                    tracker.add_day(state, row)
+            records[tracker.name] = tracker.results(state, year)
+        return records
+
+
+# Records engines, keyed by data binding and the daily range observations.
+# They live for the life of weewx so the records only need to be read from the
+# database once.
+records_engines = {}
+
+
+# ======================================================================================
+# Database indexes
+# ======================================================================================
+
+
+class BelchertownIndexes(object):
+    """
+    Optional covering indexes for the queries the skin runs against the
+    archive table (belchertown_index_advisor = 1).
+
+    The xAxis_groupby charts read a single observation over a range of
+    archive records. The stock weewx schema only has the dateTime primary
+    key, so each of these queries reads whole archive rows. An index on
+    (dateTime, observation) answers the query from the index alone. The
+    query plan before and after creating the index is logged.
+
+    The local time grouping key itself can't be indexed or stored in a
+    generated column, since it depends on the time zone of the server
+    (SQLite does not allow localtime in index expressions and MySQL does
+    not allow FROM_UNIXTIME in generated columns). The daily summaries are
+    not indexed either. The skin only reads them in dateTime order, which
+    their primary key already provides.
+
+    The indexes aren't free: every archive record weewx inserts also has
+    to be added to each of them, one more B-tree write per index, and each
+    index takes about as much disk space as a two column table with a row
+    per archive record. With one record per archive interval this doesn't
+    matter, but it slows down imports and rebuilds of the archive.
+
+    The indexes are kept when belchertown_index_advisor is set back to 0.
+    belchertown_index_advisor = drop drops them instead (drop()).
+
+    Each index is only checked once per binding for the life of weewx.
+    """
+
+    def __init__(self):
+        self.checked = set()
+        self.dropped = set()
+
+    def explain(self, manager, driver, sql):
+        """Return the query plan of a query as a single line for the log"""
+        if driver == "weedb.sqlite":
+            # The last column of EXPLAIN QUERY PLAN is the description
+            return "; ".join(
+                str(row[-1]) for row in manager.genSql("EXPLAIN QUERY PLAN " + sql)
+            )
+        return "; ".join(
+            str(tuple(row)) for row in manager.genSql("EXPLAIN " + sql)
+        )
+
+    def index_exists(self, manager, driver, table, index_name):
+        if driver == "weedb.sqlite":
+            row = manager.getSql(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name = ?;",
+                (index_name,),
+            )
+            return row is not None
+        # SHOW INDEX returns the index name in the third column
+        for row in manager.genSql("SHOW INDEX FROM %s;" % table):
+            if row[2] == index_name:
+                return True
+        return False
+
+    def index_names(self, manager, driver, table):
+        """The names of the indexes the skin created on table"""
+        prefix = "belchertown_%s_" % table
+        if driver == "weedb.sqlite":
+            names = [
+                row[0]
+                for row in manager.genSql(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' "
+                    "AND tbl_name = ?;",
+                    (table,),
+                )
+            ]
+        else:
+            names = [row[2] for row in manager.genSql("SHOW INDEX FROM %s;" % table)]
+        return sorted(set(name for name in names if name.startswith(prefix)))
+
+    def drop(self, binding, manager, driver):
+        """Drop the indexes the skin created on the archive table"""
+        if binding in self.dropped:
+            return
+        self.dropped.add(binding)
+        # Create them again if the advisor is turned back on
+        self.checked = set(key for key in self.checked if key[0] != binding)
+
+        table = manager.table_name
+        try:
+            for index_name in self.index_names(manager, driver, table):
+                with weedb.Transaction(manager.connection) as cursor:
+                    if driver == "weedb.sqlite":
+                        cursor.execute("DROP INDEX %s;" % index_name)
+                    else:
+                        cursor.execute("DROP INDEX %s ON %s;" % (index_name, table))
+                loginf("Indexes: dropped index %s on %s" % (index_name, table))
+        except Exception as error:
+            logerr(
+                "Indexes: unable to drop the indexes on %s. The error was: %s"
+                % (table, error)
+            )
+
+    def advise(self, binding, manager, driver, observation, sql):
+        """Create the covering index for a query on one archive observation"""
+        key = (binding, observation)
+        if key in self.checked:
+            return
+        self.checked.add(key)
+        self.dropped.discard(binding)
+
+        table = manager.table_name
+        if observation not in manager.sqlkeys:
+            # Not a column, e.g. an xtype. Nothing to index.
+            return
+        index_name = "belchertown_%s_%s" % (table, observation)
+        try:
+            if self.index_exists(manager, driver, table, index_name):
+                logdbg("Indexes: %s already exists" % index_name)
+                return
+            before = self.explain(manager, driver, sql)
+            with weedb.Transaction(manager.connection) as cursor:
+                cursor.execute(
+                    "CREATE INDEX %s ON %s (dateTime, %s);"
+                    % (index_name, table, observation)
+                )
+            after = self.explain(manager, driver, sql)
+        except Exception as error:
+            logerr(
+                "Indexes: unable to create index %s. The error was: %s"
+                % (index_name, error)
+            )
+            return
+        loginf(
+            "Indexes: created index %s on %s (dateTime, %s). "
+            "Query plan before: %s. Query plan after: %s"
+            % (index_name, table, observation, before, after)
+        )
+
+
+# Indexes already checked. Shared by all reports for the life of weewx.
+belchertown_indexes = BelchertownIndexes()
+
+
+# ======================================================================================
+# Rollups
+# ======================================================================================
+
+
+def month_start(ts):
+    """Start of the local month containing ts"""
+    t = time.localtime(ts)
+    return int(time.mktime((t.tm_year, t.tm_mon, 1, 0, 0, 0, 0, 0, -1)))
+
+
+def next_month(ts):
+    """Start of the local month after the one containing ts"""
+    t = time.localtime(ts)
+    if t.tm_mon == 12:
+        return int(time.mktime((t.tm_year + 1, 1, 1, 0, 0, 0, 0, 0, -1)))
+    return int(time.mktime((t.tm_year, t.tm_mon + 1, 1, 0, 0, 0, 0, 0, -1)))
+
+
+def year_start(ts):
+    """Start of the local year containing ts"""
+    return int(time.mktime((time.localtime(ts).tm_year, 1, 1, 0, 0, 0, 0, 0, -1)))
+
+
+def next_year(ts):
+    """Start of the local year after the one containing ts"""
+    return int(
+        time.mktime((time.localtime(ts).tm_year + 1, 1, 1, 0, 0, 0, 0, 0, -1))
+    )
+
+
+class BelchertownRollups(object):
+    """
+    Monthly and yearly summaries of an observation, kept in the
+    belchertown_month_<obs> and belchertown_year_<obs> tables next to the
+    weewx daily summaries (belchertown_rollups = 1). The months and years
+    are in the station's local time.
+
+    Only complete months and years are stored. Each report cycle the months
+    that closed since the last row are added from the daily summaries, and
+    the years from the months. If the daily summaries before the last month
+    no longer match the months both tables are rebuilt. Days that are added
+    or removed (e.g. by a rebuild or a backfill) are noticed on the next
+    report cycle. Changed values (a corrected reading, or records added to
+    a day that was already there) are noticed when weewx starts and at the
+    start of each day. Drop the tables to force a rebuild.
+
+    The xAxis_groupby month and year charts read whole years and months
+    from these tables and only the days at the edges of the chart from the
+    daily summaries.
+    """
+
+    columns = (
+        "dateTime",
+        "min",
+        "max",
+        "sum",
+        "count",
+        "wsum",
+        "sumtime",
+        "days",
+        "datadays",
+        "maxsum",
+        "minsum",
+    )
+    day_columns = ("dateTime", "min", "max", "sum", "count", "wsum", "sumtime")
+
+    # The number of days and the first and last day of the daily summaries
+    # and of the months made from them, checked on every update. Only reads
+    # the dateTime primary key of the daily summaries.
+    day_shape_sql = (
+        "SELECT COUNT(*), MIN(dateTime), MAX(dateTime) "
+        "FROM archive_day_%s WHERE dateTime < ?;"
+    )
+    month_shape_sql = "SELECT SUM(days), MIN(dateTime), MAX(dateTime) FROM %s;"
+
+    # Fingerprints of the values, checked when weewx starts and once a day.
+    # The counts, min and max match exactly, the sums up to rounding.
+    day_fingerprint_sql = (
+        "SELECT MIN(dateTime), COUNT(*), COALESCE(SUM(count), 0), "
+        "COALESCE(SUM(sumtime), 0), MIN(min), "
+        "MAX(max), SUM(sum), SUM(wsum), SUM(max), SUM(min) "
+        "FROM archive_day_%s WHERE dateTime < ?;"
+    )
+    month_fingerprint_sql = (
+        "SELECT MIN(dateTime), SUM(days), COALESCE(SUM(count), 0), "
+        "COALESCE(SUM(sumtime), 0), MIN(min), "
+        "MAX(max), SUM(sum), SUM(wsum), SUM(maxsum), SUM(minsum) FROM %s;"
+    )
+    exact_columns = 6
+
+    def __init__(self):
+        # The report cycle each observation was last updated in
+        self.updated = {}
+        # The (month, year) watermarks of each observation
+        self.watermarks = {}
+        # The start of the day the values of each observation were checked
+        self.checked = {}
+
+    def table(self, period, obs_type):
+        # Not archive_<period>_<obs>, which could clash with the weewx
+        # daily summaries (archive_day_<obs>) of an observation
+        return "belchertown_%s_%s" % (period, obs_type)
+
+    def supports(self, xAxis_groupby, aggregate_type, average_type):
+        """Can the xAxis_groupby daily summary query be answered by the rollups"""
+        if xAxis_groupby not in ("month", "year"):
+            return False
+        if aggregate_type in ("sum", "min", "max"):
+            return True
+        return aggregate_type == "avg" and average_type in (None, "sum", "min", "max")
+
+    def new_row(self, ts):
+        return {
+            "dateTime": ts,
+            "min": None,
+            "max": None,
+            "sum": 0.0,
+            "count": 0,
+            "wsum": 0.0,
+            "sumtime": 0,
+            "days": 0,
+            "datadays": 0,
+            "maxsum": 0.0,
+            "minsum": 0.0,
+        }
+
+    def day_row(self, row):
+        """Turn a daily summary row into a rollup row of one day"""
+        row = dict(zip(self.day_columns, row))
+        has_data = row["max"] is not None
+        row["days"] = 1
+        row["datadays"] = 1 if has_data else 0
+        row["maxsum"] = row["max"] if has_data else 0.0
+        row["minsum"] = row["min"] if row["min"] is not None else 0.0
+        return row
+
+    def add_row(self, total, row):
+        """Add a day, month or year row to a running total"""
+        if row["min"] is not None and (total["min"] is None or row["min"] < total["min"]):
+            total["min"] = row["min"]
+        if row["max"] is not None and (total["max"] is None or row["max"] > total["max"]):
+            total["max"] = row["max"]
+        for name in ("sum", "count", "wsum", "sumtime", "days", "datadays", "maxsum", "minsum"):
+            total[name] += row[name] or 0
+
+    def create_tables(self, manager, obs_type):
+        tables = manager.connection.tables()
+        for period in ("month", "year"):
+            table = self.table(period, obs_type)
+            if table in tables:
+                continue
+            with weedb.Transaction(manager.connection) as cursor:
+                cursor.execute(
+                    "CREATE TABLE %s (dateTime INTEGER NOT NULL PRIMARY KEY, "
+                    "min REAL, max REAL, sum REAL, count INTEGER, wsum REAL, "
+                    "sumtime INTEGER, days INTEGER, datadays INTEGER, "
+                    "maxsum REAL, minsum REAL)" % table
+                )
+            loginf("Rollups: created the %s table" % table)
+
+    def get_watermarks(self, manager, obs_type, check_values):
+        """
+        Return the end of the stored months and years, or None if the tables
+        have to be rebuilt. A watermark of 0 means nothing is stored yet.
+        With check_values the values are compared too, which reads every day
+        before the last month.
+        """
+        month_table = self.table("month", obs_type)
+        year_table = self.table("year", obs_type)
+        month_days, first_month, last_month = manager.getSql(
+            self.month_shape_sql % month_table
+        )
+        last_year, year_days = manager.getSql(
+            "SELECT MAX(dateTime), SUM(days) FROM %s;" % year_table
+        )
+        if last_month is None:
+            return (0, 0) if last_year is None else None
+
+        month_watermark = next_month(last_month)
+        day_count, first_day, last_day = manager.getSql(
+            self.day_shape_sql % obs_type, (month_watermark,)
+        )
+        if first_day is None:
+            return None
+        shape = [day_count, month_start(first_day), month_start(last_day)]
+        if shape != [month_days, first_month, last_month]:
+            return None
+        if check_values:
+            days = [
+                sql_number(value)
+                for value in manager.getSql(
+                    self.day_fingerprint_sql % obs_type, (month_watermark,)
+                )
+            ]
+            months = [
+                sql_number(value)
+                for value in manager.getSql(self.month_fingerprint_sql % month_table)
+            ]
+            days[0] = month_start(days[0])
+            if not self.fingerprints_match(days, months):
+                return None
+
+        if last_year is None:
+            return month_watermark, 0
+        year_watermark = next_year(last_year)
+        if year_watermark > month_watermark:
+            return None
+        row = manager.getSql(
+            "SELECT SUM(days) FROM %s WHERE dateTime < ?;" % month_table,
+            (year_watermark,),
+        )
+        if row[0] != year_days:
+            return None
+        return month_watermark, year_watermark
+
+    def fingerprints_match(self, days, months):
+        """Compare the fingerprints of the daily summaries and the months"""
+        exact = self.exact_columns
+        return days[:exact] == months[:exact] and sums_match(days[exact:], months[exact:])
+
+    def save_rows(self, manager, table, rows):
+        with weedb.Transaction(manager.connection) as cursor:
+            for row in rows:
+                cursor.execute(
+                    "REPLACE INTO %s (%s) VALUES (%s)"
+                    % (table, ", ".join(self.columns), ", ".join("?" * len(self.columns))),
+                    tuple(row[name] for name in self.columns),
+                )
+
+    def update(self, manager, obs_type, today_start_ts, cycle):
+        """
+        Add the months and years that closed since the last update. Returns
+        False if the rollups can't be used for this observation.
+        """
+        if self.updated.get(obs_type) == cycle:
+            return obs_type in self.watermarks
+        self.updated[obs_type] = cycle
+        self.watermarks.pop(obs_type, None)
+
+        month_table = self.table("month", obs_type)
+        year_table = self.table("year", obs_type)
+        month_stop = month_start(today_start_ts)
+        year_stop = year_start(today_start_ts)
+        try:
+            if "archive_day_%s" % obs_type not in manager.connection.tables():
+                return False
+            self.create_tables(manager, obs_type)
+            check_values = self.checked.get(obs_type) != today_start_ts
+            self.checked[obs_type] = today_start_ts
+            watermarks = self.get_watermarks(manager, obs_type, check_values)
+            if watermarks is None:
+                loginf("Rollups: the daily summaries have changed, rebuilding %s" % obs_type)
+                with weedb.Transaction(manager.connection) as cursor:
+                    cursor.execute("DELETE FROM %s" % month_table)
+                    cursor.execute("DELETE FROM %s" % year_table)
+                watermarks = (0, 0)
+            month_watermark, year_watermark = watermarks
+
+            if month_watermark < month_stop:
+                months = OrderedDict()
+                for row in manager.genSql(
+                    "SELECT %s FROM archive_day_%s WHERE dateTime >= ? AND dateTime < ? "
+                    "ORDER BY dateTime ASC;" % (", ".join(self.day_columns), obs_type),
+                    (month_watermark, month_stop),
+                ):
+                    row = self.day_row(row)
+                    ts = month_start(row["dateTime"])
+                    if ts not in months:
+                        months[ts] = self.new_row(ts)
+                    self.add_row(months[ts], row)
+                self.save_rows(manager, month_table, months.values())
+                if months:
+                    month_watermark = next_month(next(reversed(months)))
+
+            if year_watermark < year_stop:
+                years = OrderedDict()
+                for row in manager.genSql(
+                    "SELECT %s FROM %s WHERE dateTime >= ? AND dateTime < ? "
+                    "ORDER BY dateTime ASC;" % (", ".join(self.columns), month_table),
+                    (year_watermark, year_stop),
+                ):
+                    row = dict(zip(self.columns, row))
+                    ts = year_start(row["dateTime"])
+                    if ts not in years:
+                        years[ts] = self.new_row(ts)
+                    self.add_row(years[ts], row)
+                self.save_rows(manager, year_table, years.values())
+                if years:
+                    year_watermark = next_year(next(reversed(years)))
+        except Exception as error:
+            logerr(
+                "Rollups: unable to use the rollups for %s, using the daily "
+                "summaries. The error was: %s" % (obs_type, error)
+            )
+            return False
+
+        self.watermarks[obs_type] = (month_watermark, year_watermark)
+        return True
+
+    def get_rows(self, manager, obs_type, xAxis_groupby, start_ts, stop_ts):
+        """
+        Return the rows covering start_ts to stop_ts, using whole years (for
+        the year groupby) and whole months where they are stored, and the
+        daily summaries for the rest.
+        """
+        month_watermark, year_watermark = self.watermarks[obs_type]
+        levels = [("month", month_start, next_month, month_watermark)]
+        if xAxis_groupby == "year":
+            levels.insert(0, ("year", year_start, next_year, year_watermark))
+
+        rows = []
+        spans = [(start_ts, stop_ts)]
+        for period, period_start, period_next, watermark in levels:
+            remaining = []
+            for span_start, span_stop in spans:
+                first = span_start
+                if period_start(first) != first:
+                    first = period_next(first)
+                last = min(period_start(span_stop), watermark)
+                if first >= last:
+                    remaining.append((span_start, span_stop))
+                    continue
+                for row in manager.genSql(
+                    "SELECT %s FROM %s WHERE dateTime >= ? AND dateTime < ?;"
+                    % (", ".join(self.columns), self.table(period, obs_type)),
+                    (first, last),
+                ):
+                    rows.append(dict(zip(self.columns, row)))
+                remaining.extend([(span_start, first), (last, span_stop)])
+            spans = [span for span in remaining if span[0] < span[1]]
+
+        for span_start, span_stop in spans:
+            for row in manager.genSql(
+                "SELECT %s FROM archive_day_%s WHERE dateTime >= ? AND dateTime < ?;"
+                % (", ".join(self.day_columns), obs_type),
+                (span_start, span_stop),
+            ):
+                rows.append(self.day_row(row))
+
+        rows.sort(key=lambda row: row["dateTime"])
+        return rows
+
+    def get_groupby(
+        self, manager, obs_type, xAxis_groupby, aggregate_type, average_type,
+        start_ts, stop_ts, chronological
+    ):
+        """
+        Return the (label, value) pairs of an xAxis_groupby chart, the same
+        as the daily summary queries in get_observation_data.
+        """
+        if xAxis_groupby == "month":
+            label_format, bucket_format = "%m", "%Y%m"
+        else:
+            label_format, bucket_format = "%Y", "%Y"
+
+        totals = OrderedDict()
+        # Sums of each month (or year) for avg(sum)
+        bucket_sums = OrderedDict()
+        for row in self.get_rows(manager, obs_type, xAxis_groupby, start_ts, stop_ts):
+            row_time = time.localtime(row["dateTime"])
+            label = time.strftime(label_format, row_time)
+            if label not in totals:
+                totals[label] = self.new_row(row["dateTime"])
+            self.add_row(totals[label], row)
+            bucket = (label, time.strftime(bucket_format, row_time))
+            bucket_sums[bucket] = bucket_sums.get(bucket, 0.0) + (row["sum"] or 0.0)
+
+        labels = list(totals) if chronological else sorted(totals)
+        values = []
+        for label in labels:
+            total = totals[label]
+            if aggregate_type != "avg":
+                value = total[aggregate_type]
+            elif average_type is None:
+                value = total["wsum"] / total["sumtime"] if total["sumtime"] else None
+            elif average_type == "sum":
+                sums = [v for (l, b), v in bucket_sums.items() if l == label]
+                value = sum(sums) / len(sums)
+            else:
+                value = (
+                    total[average_type + "sum"] / total["datadays"]
+                    if total["datadays"]
+                    else None
+                )
+            values.append((label, value))
+        return values
+
+
+# Rollups, keyed by data binding. They live for the life of weewx.
+rollup_engines = {}
+
+
+# ======================================================================================
+# Aggregated series
+# ======================================================================================
+
+
+def aggregate_series_supported(
+    archive, obs_type, timespan, aggregate_type, aggregate_interval
+):
+    """
+    Whether get_aggregate_series() can build this aggregated series. It
+    reads columns of the archive table (and their daily summaries) only, so
+    derived types like wind are left to weewx.xtypes. So are the series that
+    the weewx daily summaries already build in one grouped query.
+    """
+    if aggregate_type not in ("min", "max", "sum", "count", "avg", "cumulative"):
+        return False
+    if obs_type not in getattr(archive, "sqlkeys", ()):
+        return False
+    if archive.first_timestamp is None or archive.last_timestamp is None:
+        return False
+    if (
+        aggregate_type != "cumulative"
+        and "get_series" in vars(weewx.xtypes.DailySummaries)
+        and obs_type in getattr(archive, "daykeys", ())
+        and (
+            isStartOfDay(timespan.start) or timespan.start == archive.first_timestamp
+        )
+        and (isStartOfDay(timespan.stop) or timespan.stop == archive.last_timestamp)
+        and (
+            aggregate_interval
+            in (
+                weeutil.weeutil.nominal_intervals["month"],
+                weeutil.weeutil.nominal_intervals["year"],
+            )
+            or aggregate_interval % 86400 == 0
+        )
+    ):
+        return False
+    return True
+
+
+def column_total(rows, index):
+    """SUM() of a column of rows, None if it has no values"""
+    values = [row[index] for row in rows if row[index] is not None]
+    return sum(values) if values else None
+
+
+def aggregate_days(aggregate_type, rows):
+    """
+    Aggregate the daily summary rows (dateTime, min, max, sum, count, wsum,
+    sumtime) of one interval the way weewx does from the daily summaries
+    """
+    if aggregate_type in ("min", "max"):
+        index = 1 if aggregate_type == "min" else 2
+        values = [row[index] for row in rows if row[index] is not None]
+        if not values:
+            return None
+        return min(values) if aggregate_type == "min" else max(values)
+    if aggregate_type == "sum":
+        return column_total(rows, 3)
+    if aggregate_type == "count":
+        count = column_total(rows, 4)
+        return None if count is None else int(count)
+    wsum = column_total(rows, 5)
+    sumtime = column_total(rows, 6)
+    if wsum is None or sumtime is None:
+        return None
+    return wsum / sumtime if sumtime else None
+
+
+def aggregate_values(aggregate_type, values):
+    """
+    Aggregate the non-null archive values of one interval the way weewx
+    does from the archive table
+    """
+    if aggregate_type == "count":
+        return len(values)
+    if not values:
+        return None
+    if aggregate_type == "min":
+        return min(values)
+    if aggregate_type == "max":
+        return max(values)
+    if aggregate_type == "sum":
+        return sum(values)
+    return float(sum(values)) / len(values)
+
+
+def get_archive_series(archive, obs_types, timespan):
+    """
+    weewx.xtypes.get_series() without aggregation for several archive
+    columns, read in one query. Returns a dict of the series by observation
+    type, with the same ValueTuples as weewx.
+    """
+    vectors = dict((obs_type, []) for obs_type in obs_types)
+    start_vec = []
+    stop_vec = []
+    std_unit_system = None
+    for row in archive.genSql(
+        "SELECT dateTime, usUnits, `interval`, %s FROM %s "
+        "WHERE dateTime > ? AND dateTime <= ?"
+        % (", ".join(obs_types), archive.table_name),
+        (timespan.start, timespan.stop),
+    ):
+        if std_unit_system:
+            if std_unit_system != row[1]:
+                raise weewx.UnsupportedFeature(
+                    "Unit type cannot change within an aggregation interval."
+                )
+        else:
+            std_unit_system = row[1]
+        start_vec.append(row[0] - row[2] * 60)
+        stop_vec.append(row[0])
+        for index, obs_type in enumerate(obs_types):
+            vectors[obs_type].append(row[index + 3])
+
+    series = {}
+    for obs_type in obs_types:
+        unit, unit_group = weewx.units.getStandardUnitType(
+            std_unit_system, obs_type, None
+        )
+        series[obs_type] = (
+            weewx.units.ValueTuple(list(start_vec), "unix_epoch", "group_time"),
+            weewx.units.ValueTuple(list(stop_vec), "unix_epoch", "group_time"),
+            weewx.units.ValueTuple(vectors[obs_type], unit, unit_group),
+        )
+    return series
+
+
+def get_aggregate_series(
+    archive, obs_types, timespan, aggregate_types, aggregate_interval
+):
+    """
+    weewx.xtypes.get_series() for archive columns and one or more
+    aggregations of them, with the series read in one archive query instead
+    of one aggregate query per interval, column and aggregation. Returns a
+    dict of the series by (observation type, aggregate type).
+
+    The intervals are the same as weewx uses. An interval that starts and
+    ends at midnight is aggregated from the daily summary rows, like weewx
+    does, and any other interval from the archive rows. The rows are read
+    once for all the intervals and split up by time, and the result has the
+    same values, units and ValueTuple shapes as weewx.xtypes.get_series().
+    """
+    first_ts = archive.first_timestamp
+    last_ts = archive.last_timestamp
+    daykeys = getattr(archive, "daykeys", ())
+
+    # The intervals weewx would aggregate, and whether each is on midnight
+    # boundaries so the daily summaries can be used
+    spans = []
+    for span in weeutil.weeutil.intervalgen(
+        timespan.start, timespan.stop, aggregate_interval
+    ):
+        if span.stop <= first_ts:
+            continue
+        if span.start >= last_ts:
+            break
+        on_days = (isStartOfDay(span.start) or span.start == first_ts) and (
+            isStartOfDay(span.stop) or span.stop == last_ts
+        )
+        spans.append((span, on_days))
+
+    day_spans = [span for span, on_days in spans if on_days]
+    day_rows = {}
+    for obs_type in obs_types:
+        if day_spans and obs_type in daykeys:
+            rows = list(
+                archive.genSql(
+                    "SELECT dateTime, min, max, sum, count, wsum, sumtime "
+                    "FROM %s_day_%s WHERE dateTime >= ? AND dateTime < ? "
+                    "ORDER BY dateTime" % (archive.table_name, obs_type),
+                    (startOfDay(day_spans[0].start), day_spans[-1].stop),
+                )
+            )
+            day_rows[obs_type] = ([row[0] for row in rows], rows)
+
+    # The non-null values and their times, by observation type
+    archive_rows = dict((obs_type, ([], [])) for obs_type in obs_types)
+    archive_spans = [
+        span
+        for span, on_days in spans
+        if not on_days or len(day_rows) < len(obs_types)
+    ]
+    if archive_spans:
+        for row in archive.genSql(
+            "SELECT dateTime, %s FROM %s WHERE dateTime > ? AND dateTime <= ? "
+            "AND (%s) ORDER BY dateTime"
+            % (
+                ", ".join(obs_types),
+                archive.table_name,
+                " OR ".join("%s IS NOT NULL" % obs_type for obs_type in obs_types),
+            ),
+            (archive_spans[0].start, archive_spans[-1].stop),
+        ):
+            for index, obs_type in enumerate(obs_types):
+                if row[index + 1] is not None:
+                    archive_rows[obs_type][0].append(row[0])
+                    archive_rows[obs_type][1].append(row[index + 1])
+
+    start_vec = [span.start for span, on_days in spans]
+    stop_vec = [span.stop for span, on_days in spans]
+    series = {}
+    for obs_type in obs_types:
+        # The rows of each interval
+        span_rows = []
+        for span, on_days in spans:
+            if on_days and obs_type in day_rows:
+                day_times, rows = day_rows[obs_type]
+                span_rows.append(
+                    (
+                        True,
+                        rows[
+                            bisect_left(
+                                day_times, startOfDay(span.start)
+                            ) : bisect_left(day_times, span.stop)
+                        ],
+                    )
+                )
+            else:
+                times, values = archive_rows[obs_type]
+                span_rows.append(
+                    (
+                        False,
+                        values[
+                            bisect_right(times, span.start) : bisect_right(
+                                times, span.stop
+                            )
+                        ],
+                    )
+                )
+
+        for aggregate_type in aggregate_types:
+            do_aggregate = "sum" if aggregate_type == "cumulative" else aggregate_type
+            unit = unit_group = None
+            if spans:
+                unit, unit_group = weewx.units.getStandardUnitType(
+                    archive.std_unit_system, obs_type, do_aggregate
+                )
+            data_vec = []
+            total = 0
+            for from_days, rows in span_rows:
+                if from_days:
+                    value = aggregate_days(do_aggregate, rows)
+                else:
+                    value = aggregate_values(do_aggregate, rows)
+                if aggregate_type == "cumulative":
+                    if value is not None:
+                        total += value
+                    data_vec.append(total)
+                else:
+                    data_vec.append(value)
+            series[obs_type, aggregate_type] = (
+                weewx.units.ValueTuple(list(start_vec), "unix_epoch", "group_time"),
+                weewx.units.ValueTuple(list(stop_vec), "unix_epoch", "group_time"),
+                weewx.units.ValueTuple(data_vec, unit, unit_group),
+            )
+    return series
+
+
+# ======================================================================================
+# Chart plan
+# ======================================================================================
+
+
+def highcharts_options_to_float(d):
+    """
+    Recurse through all the series options and set any strings that
+    should be numbers to float.
+    https://stackoverflow.com/a/54565277/1177153
+    """
+
+    try:
+        for k, v in d.items():
+            if isinstance(v, dict):
+                # Check nested dicts
+                highcharts_options_to_float(v)
+            else:
+                try:
+                    v = to_float(v)
+                    d.update({k: v})
+                except:
+                    pass
+        return d
+    except:
+        # This item isn't a dict, so return it back
+        return d
+
+
+def plain_section(section):
+    """A ConfigObj section as nested OrderedDicts"""
+    return OrderedDict(
+        (key, plain_section(value) if isinstance(value, dict) else value)
+        for key, value in section.items()
+    )
+
+
+class ChartLine(object):
+    """A [[[observation]]] of a chart"""
+
+    __slots__ = ("name", "options", "series", "column", "query")
+
+    # The options that decide the time span, binding and aggregation of the
+    # series read for a line
+    query_options = (
+        "data_binding",
+        "time_length",
+        "time_ago",
+        "day_specific",
+        "month_specific",
+        "year_specific",
+        "timespan_start",
+        "timespan_stop",
+        "start_at_midnight",
+        "start_at_whole_hour",
+        "start_at_beginning_of_month",
+        "aggregate_type",
+        "aggregate_interval",
+        "xAxis_groupby",
+        "xAxis_categories",
+    )
+
+    def __init__(self, name, section):
+        self.name = name
+        # The options with the ones inherited from the chart and the group
+        self.options = accumulateLeaves(section)
+        # The Highcharts series options given for the line, numbers as floats
+        self.series = highcharts_options_to_float(plain_section(section))
+        self.column = self.options.get("observation_type", name)
+        self.query = tuple(
+            str(self.options.get(option)) for option in self.query_options
+        )
+
+    def series_options(self):
+        """A copy of the series options the caller can change"""
+        return copy.deepcopy(self.series)
+
+
+class ChartPlot(object):
+    """A [[chart]] of a chart group"""
+
+    __slots__ = ("name", "options", "lines", "batches")
+
+    def __init__(self, name, section):
+        self.name = name
+        self.options = accumulateLeaves(section)
+        self.lines = tuple(ChartLine(line, section[line]) for line in section.sections)
+        # The observations of the lines that read the same time span, binding
+        # and aggregation, by line name. They are read from the database
+        # together, see HighchartsJsonGenerator.get_series().
+        self.batches = {}
+        for line in self.lines:
+            batch = []
+            for other in self.lines:
+                if other.query == line.query and other.column not in batch:
+                    batch.append(other.column)
+            self.batches[line.name] = tuple(batch)
+
+
+class ChartGroup(object):
+    """A [chart group] of graphs.conf"""
+
+    __slots__ = ("name", "options", "scalars", "plots")
+
+    def __init__(self, name, section):
+        self.name = name
+        self.options = accumulateLeaves(section)
+        # The options given in the group itself, like title and button_text
+        self.scalars = dict((key, section[key]) for key in section.scalars)
+        self.plots = tuple(ChartPlot(plot, section[plot]) for plot in section.sections)
+
+
+class ChartPlan(object):
+    """
+    graphs.conf (or graphs.conf.example if there isn't one) read once and
+    shared by getData and HighchartsJsonGenerator. The plan is read again
+    when the file changes. Treat it as read only.
+    """
+
+    __slots__ = ("path", "stamp", "groups", "json")
 
-        # Build the search list with the new values
-        search_list_extension = {
-            "belchertown_version": VERSION,
-            "belchertown_debug": belchertown_debug,
-            "moment_js_utc_offset": moment_js_utc_offset,
-            "moment_js_tz": moment_js_tz,
-            "highcharts_timezoneoffset": highcharts_timezoneoffset,
-            "system_locale": system_locale,
-            "system_locale_js": system_locale_js,
-            "locale_encoding": locale_encoding,
-            "highcharts_decimal": highcharts_decimal,
-            "highcharts_thousands": highcharts_thousands,
-            "radar_html": radar_html,
-            "radar_html_dark": radar_html_dark,
-            "radar_html_kiosk": radar_html_kiosk,
-            "archive_interval_ms": archive_interval_ms,
-            "ordinate_names": ordinate_names,
-            "charts": json.dumps(charts),
-            "graphpage_titles": json.dumps(graphpage_titles),
-            "graphpage_titles_dict": graphpage_titles,
-            "graphpage_content": json.dumps(graphpage_content),
-            "graph_page_buttons": graph_page_buttons,
-            "alltime": all_stats,
-            "year_outTemp_range_max": year_outTemp_range_max,
-            "year_outTemp_range_min": year_outTemp_range_min,
-            "at_outTemp_range_max": at_outTemp_range_max,
-            "at_outTemp_range_min": at_outTemp_range_min,
-            "rainiest_day": rainiest_day,
-            "at_rainiest_day": at_rainiest_day,
-            "year_rainiest_month": year_rainiest_month,
-            "at_rainiest_month": at_rainiest_month,
-            "at_rain_highest_year": at_rain_highest_year,
-            "year_days_with_rain": year_days_with_rain,
-            "year_days_without_rain": year_days_without_rain,
-            "at_days_with_rain": at_days_with_rain,
-            "at_days_without_rain": at_days_without_rain,
-            "windSpeedUnitLabel": windSpeed_unit_label,
-            "noaa_header_html": noaa_header_html,
-            "default_noaa_file": default_noaa_file,
-            "current_obs_icon": current_obs_icon,
-            "current_obs_summary": current_obs_summary,
-            "visibility": visibility,
-            "visibility_unit": visibility_unit,
-            "cloud_cover": cloud_cover,
-            "station_obs_json": json.dumps(station_obs_json),
-            "station_obs_html": station_obs_html,
-            "all_obs_rounding_json": json.dumps(all_obs_rounding_json),
-            "all_obs_unit_labels_json": json.dumps(all_obs_unit_labels_json),
-            "earthquake_time": eqtime,
-            "earthquake_url": equrl,
-            "earthquake_place": eqplace,
-            "earthquake_magnitude": eqmag,
-            "earthquake_lat": eqlat,
-            "earthquake_lon": eqlon,
-            "earthquake_distance_away": eqdistance,
-            "earthquake_distance_label": eq_distance_label,
-            "earthquake_bearing": eqbearing,
-            "earthquake_bearing_raw": eqbearing_raw,
-            "social_html": social_html,
-            "custom_css_exists": custom_css_exists,
-            "aqi": aqi,
-            "aqi_category": aqi_category,
-            "aqi_location": aqi_location,
-            "beaufort0": label_dict["beaufort0"],
-            "beaufort1": label_dict["beaufort1"],
-            "beaufort2": label_dict["beaufort2"],
-            "beaufort3": label_dict["beaufort3"],
-            "beaufort4": label_dict["beaufort4"],
-            "beaufort5": label_dict["beaufort5"],
-            "beaufort6": label_dict["beaufort6"],
-            "beaufort7": label_dict["beaufort7"],
-            "beaufort8": label_dict["beaufort8"],
-            "beaufort9": label_dict["beaufort9"],
-            "beaufort10": label_dict["beaufort10"],
-            "beaufort11": label_dict["beaufort11"],
-            "beaufort12": label_dict["beaufort12"],
-            "mqtt_websockets_port_kiosk": mqtt_websockets_port_kiosk,
-            "mqtt_websockets_ssl_kiosk": mqtt_websockets_ssl_kiosk,
-        }
-        # Finally, return our extension as a list:
-        return [search_list_extension]
+    # Plans keyed by skin directory, shared for the life of weewx
+    plans = {}
+    lock = threading.Lock()
+
+    def __init__(self, path, stamp):
+        self.path = path
+        self.stamp = stamp
+        chart_dict = configobj.ConfigObj(path, file_error=True)
+        self.groups = tuple(
+            ChartGroup(group, chart_dict[group]) for group in chart_dict.sections
+        )
+        # For graphs.json, which is saved for debugging
+        self.json = json.dumps(chart_dict, indent=4)
+
+    @classmethod
+    def for_skin(cls, config_dict, skin_dict):
+        skin_dir = os.path.join(
+            config_dict["WEEWX_ROOT"],
+            skin_dict["SKIN_ROOT"],
+            skin_dict.get("skin", ""),
+        )
+        path = os.path.join(skin_dir, "graphs.conf")
+        if not os.path.exists(path):
+            path = os.path.join(skin_dir, "graphs.conf.example")
+        try:
+            stat = os.stat(path)
+            stamp = (path, stat.st_mtime, stat.st_size)
+        except OSError:
+            # Let ConfigObj raise the error
+            stamp = None
+        with cls.lock:
+            plan = cls.plans.get(skin_dir)
+            if plan is None or stamp is None or plan.stamp != stamp:
+                plan = cls.plans[skin_dir] = cls(path, stamp)
+            return plan
 
 
 # ======================================================================================
@@ -2143,24 +4322,16 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
     def run(self):
         """Main entry point for file generation."""
 
-        chart_config_path = os.path.join(
-            self.config_dict["WEEWX_ROOT"],
-            self.skin_dict["SKIN_ROOT"],
-            self.skin_dict.get("skin", ""),
-            "graphs.conf",
-        )
-        default_chart_config_path = os.path.join(
-            self.config_dict["WEEWX_ROOT"],
-            self.skin_dict["SKIN_ROOT"],
-            self.skin_dict.get("skin", ""),
-            "graphs.conf.example",
+        self.chart_plan = ChartPlan.for_skin(self.config_dict, self.skin_dict)
+
+        # Series read from the database during this run, see get_series()
+        self.series_cache = {}
+        self.series_cache_stats = {"hits": 0, "misses": 0}
+        self.grouped_series = to_bool(
+            self.skin_dict["Extras"].get("belchertown_grouped_series", True)
         )
-        if os.path.exists(chart_config_path):
-            self.chart_dict = configobj.ConfigObj(chart_config_path, file_error=True)
-        else:
-            self.chart_dict = configobj.ConfigObj(
-                default_chart_config_path, file_error=True
-            )
+        # The observations read together with the current line's
+        self.batch_columns = ()
 
         self.converter = weewx.units.Converter.fromSkinDict(self.skin_dict)
         self.formatter = weewx.units.Formatter.fromSkinDict(self.skin_dict)
@@ -2177,13 +4348,14 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
 
         # Loop through each [section]. This is the first bracket group of
         # options including global options.
-        for chart_group in self.chart_dict.sections:
+        for group in self.chart_plan.groups:
+            chart_group = group.name
             output[
                 chart_group
             ] = (
                 OrderedDict()
             )  # This retains the order in which to load the charts on the page.
-            chart_options = accumulateLeaves(self.chart_dict[chart_group])
+            chart_options = group.options
 
             output[chart_group]["belchertown_version"] = VERSION
             output[chart_group]["generated_timestamp"] = time.strftime(
@@ -2272,7 +4444,8 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
                     continue
 
             # Loop through each [[chart_group]] within the section.
-            for plotname in self.chart_dict[chart_group].sections:
+            for plot in group.plots:
+                plotname = plot.name
                 output[chart_group][plotname] = {}
 
                 # This retains the observation position in the dictionary to
@@ -2288,7 +4461,7 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
                 ] = plotname  # daychart1, weekchart1, etc. Used for the graphs page and the different chart_groups
                 output[chart_group][plotname]["options"]["chart_group"] = chart_group
 
-                plot_options = accumulateLeaves(self.chart_dict[chart_group][plotname])
+                plot_options = plot.options
 
                 # Setup the database binding, default to weewx.conf's binding
                 # if none supplied.
@@ -2372,15 +4545,14 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
                     output[chart_group][plotname]["options"]["exporting"] = "false"
 
                 # Loop through each [[[observation]]] within the chart_group.
-                for line_name in self.chart_dict[chart_group][plotname].sections:
+                for line in plot.lines:
+                    line_name = line.name
                     output[chart_group][plotname]["series"][line_name] = {}
                     output[chart_group][plotname]["series"][line_name][
                         "obsType"
                     ] = line_name
 
-                    line_options = accumulateLeaves(
-                        self.chart_dict[chart_group][plotname][line_name]
-                    )
+                    line_options = line.options
 
                     # Look for any keyword timespans first and default to those
                     # start/stop times for the chart
@@ -2692,9 +4864,9 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
                     # This for loop is to get any user provided highcharts
                     # series config data. Built-in highcharts variable names
                     # accepted.
-                    for highcharts_config, highcharts_value in self.chart_dict[
-                        chart_group
-                    ][plotname][line_name].items():
+                    for highcharts_config, highcharts_value in (
+                        line.series_options().items()
+                    ):
                         output[chart_group][plotname]["series"][line_name][
                             highcharts_config
                         ] = highcharts_value
@@ -2719,15 +4891,15 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
                     # data rounding
                     obs_round = None
                     if (obs_round is None and 
-                        self.chart_dict[chart_group][plotname][line_name].get("numberFormat",dict()).get(
+                        line.series.get("numberFormat",dict()).get(
                             "decimals") is not None
                        ):
                         # The user specified decimals. Use them for rounding,
                         # too.
                         try:
-                            obs_round = float(self.chart_dict[chart_group][plotname][line_name]["numberFormat"]["decimals"])
+                            obs_round = float(line.series["numberFormat"]["decimals"])
                         except (ValueError,TypeError):
-                            logerr("cannot use numberFormat decimals %s for rounding" % self.chart_dict[chart_group][plotname][line_name]["numberFormat"]["decimals"])
+                            logerr("cannot use numberFormat decimals %s for rounding" % line.series["numberFormat"]["decimals"])
                     if obs_round is None:
                         # Add rounding from weewx.conf/skin.conf so Highcharts can use it
                         if observation_type == "rainTotal":
@@ -2754,16 +4926,27 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
 
                     # Set default colors, unless the user has specified
                     # otherwise in graphs.conf
+                    # Optional windRose speed groups: the speeds, in the
+                    # chart's wind speed unit, where each group after the
+                    # first starts
+                    wind_rose_bins = weeutil.weeutil.option_as_list(
+                        line_options.get("windrose_speed_bins", None)
+                    )
+
+                    # One color per speed group, beauford0 for the first.
+                    # Groups past the defaults reuse them in turn.
+                    wind_rose_groups = max(
+                        len(WindRose.colors), len(wind_rose_bins or []) + 1
+                    )
                     wind_rose_color = {}
-                    wind_rose_color[0] = line_options.get("beauford0", "#7cb5ec")
-                    wind_rose_color[1] = line_options.get("beauford1", "#b2df8a")
-                    wind_rose_color[2] = line_options.get("beauford2", "#f7a35c")
-                    wind_rose_color[3] = line_options.get("beauford3", "#8c6bb1")
-                    wind_rose_color[4] = line_options.get("beauford4", "#dd3497")
-                    wind_rose_color[5] = line_options.get("beauford5", "#e4d354")
-                    wind_rose_color[6] = line_options.get("beauford6", "#268bd2")
+                    for i in range(wind_rose_groups):
+                        wind_rose_color[i] = line_options.get(
+                            "beauford%s" % i,
+                            WindRose.colors[i % len(WindRose.colors)],
+                        )
 
                     # Build series data
+                    self.batch_columns = plot.batches[line_name]
                     series_data = self.get_observation_data(
                         binding,
                         archive,
@@ -2779,6 +4962,7 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
                         mirrored_value,
                         weatherRange_obs_lookup,
                         wind_rose_color,
+                        wind_rose_bins,
                         special_target_unit,
                         obs_round
                     )
@@ -2832,7 +5016,127 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
             # Save the graphs.conf to a json file for future debugging
             chart_json_filename = html_dest_dir + "/graphs.json"
             with open(chart_json_filename, mode="w") as cjf:
-                cjf.write(json.dumps(self.chart_dict, indent=4))
+                cjf.write(self.chart_plan.json)
+
+        if weewx.debug:
+            logdbg(
+                "Chart series cache: %(hits)s hits, %(misses)s database reads"
+                % self.series_cache_stats
+            )
+        self.series_cache = {}
+
+    def get_series(
+        self, binding, obs_type, timespan, archive, aggregate_type, aggregate_interval
+    ):
+        """
+        weewx.xtypes.get_series() with a cache for the run, so a series used
+        by more than one chart or chart group (like the homepage and day
+        charts) is only read from the database once. The cache holds the
+        unconverted ValueTuples and every caller gets its own copy of the
+        lists, since they are padded and converted in place.
+        """
+        return self.get_series_set(
+            binding,
+            [obs_type],
+            timespan,
+            archive,
+            [aggregate_type],
+            aggregate_interval,
+        )[obs_type, aggregate_type]
+
+    def get_series_set(
+        self, binding, obs_types, timespan, archive, aggregate_types, aggregate_interval
+    ):
+        """
+        get_series() for each of the observations with each of the
+        aggregations (or [None]) over one time span, like the min, max and
+        avg of a weatherRange chart. Returns a dict of the series by
+        (observation type, aggregate type).
+
+        The series missing from the cache are read together: archive
+        columns with get_archive_series() or get_aggregate_series(), in one
+        pass instead of one query per interval, along with the other lines
+        of the chart that share the time span, binding and aggregation (like
+        outTemp, dewpoint, windchill and heatindex). The rest are read with
+        weewx.xtypes.get_series().
+        """
+        key = (timespan.start, timespan.stop, aggregate_interval)
+        wanted = [
+            (obs_type, aggregate_type)
+            for obs_type in obs_types
+            for aggregate_type in aggregate_types
+        ]
+        missing = [
+            (obs_type, aggregate_type)
+            for obs_type, aggregate_type in wanted
+            if (binding, obs_type, aggregate_type) + key not in self.series_cache
+        ]
+        self.series_cache_stats["hits"] += len(wanted) - len(missing)
+
+        if missing:
+            sqlkeys = getattr(archive, "sqlkeys", ())
+            columns = []
+            for obs_type, aggregate_type in missing:
+                if obs_type not in columns:
+                    columns.append(obs_type)
+            if any(obs_type in self.batch_columns for obs_type in columns):
+                columns += [
+                    column
+                    for column in self.batch_columns
+                    if column not in columns
+                    and any(
+                        (binding, column, aggregate_type) + key not in self.series_cache
+                        for aggregate_type in aggregate_types
+                    )
+                ]
+
+            read = {}
+            if self.grouped_series and aggregate_types == [None]:
+                columns = [column for column in columns if column in sqlkeys]
+                if columns:
+                    for column, series in get_archive_series(
+                        archive, columns, timespan
+                    ).items():
+                        read[column, None] = series
+            elif self.grouped_series:
+                columns = [
+                    column
+                    for column in columns
+                    if all(
+                        aggregate_series_supported(
+                            archive, column, timespan, aggregate_type, aggregate_interval
+                        )
+                        for aggregate_type in aggregate_types
+                    )
+                ]
+                if columns:
+                    read = get_aggregate_series(
+                        archive, columns, timespan, aggregate_types, aggregate_interval
+                    )
+            if read:
+                self.series_cache_stats["misses"] += 1
+
+            for obs_type, aggregate_type in missing:
+                if (obs_type, aggregate_type) not in read:
+                    read[obs_type, aggregate_type] = weewx.xtypes.get_series(
+                        obs_type, timespan, archive, aggregate_type, aggregate_interval
+                    )
+                    self.series_cache_stats["misses"] += 1
+            for (obs_type, aggregate_type), series in read.items():
+                self.series_cache[(binding, obs_type, aggregate_type) + key] = series
+
+        return dict(
+            (
+                (obs_type, aggregate_type),
+                tuple(
+                    weewx.units.ValueTuple(list(vt[0]), vt[1], vt[2])
+                    for vt in self.series_cache[
+                        (binding, obs_type, aggregate_type) + key
+                    ]
+                ),
+            )
+            for obs_type, aggregate_type in wanted
+        )
 
     def get_observation_data(
         self,
@@ -2850,6 +5154,7 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
         mirrored_value,
         weatherRange_obs_lookup,
         wind_rose_color,
+        wind_rose_bins,
         special_target_unit,
         obs_round
     ):
@@ -2859,43 +5164,24 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
         """
 
         if observation == "windRose":
-            # Special Belchertown wind rose with Highcharts aggregator Wind
-            # speeds are split into the first 7 beaufort groups.
+            # Special Belchertown wind rose with Highcharts aggregator. Wind
+            # speeds are split into Beaufort-like groups, see WindRose.
             # https://en.wikipedia.org/wiki/Beaufort_scale
 
-            # Force no aggregate_type
-            if aggregate_type:
-                aggregate_type = None
-
-            # Force no aggregate_interval
-            if aggregate_interval:
-                aggregate_interval = None
-
-            # Get windDir observations.
-            obs_lookup = "windDir"
-            (time_start_vt, time_stop_vt, windDir_vt) = weewx.xtypes.get_series(
-                obs_lookup,
+            # Get the windDir and windSpeed observations, not aggregated
+            series = self.get_series_set(
+                binding,
+                ["windDir", "windSpeed"],
                 TimeSpan(start_ts, end_ts),
                 archive,
-                aggregate_type,
-                aggregate_interval,
+                [None],
+                None,
             )
-            # windDir_vt = self.converter.convert(windDir_vt)
-            # usage_round = int(self.skin_dict['Units']['StringFormats'].get(windDir_vt[2], "0f")[-2])
+            windDir_vt = series["windDir", None][2]
             usage_round = 0  # Force round to 0 decimal
             windDir_round_vt = [self.round_none(x, usage_round) for x in windDir_vt[0]]
-            # windDir_round_vt = [0.0 if v is None else v for v in windDir_round_vt]
 
-            # Get windSpeed observations.
-            obs_lookup = "windSpeed"
-            (time_start_vt, time_stop_vt, windSpeed_vt) = weewx.xtypes.get_series(
-                obs_lookup,
-                TimeSpan(start_ts, end_ts),
-                archive,
-                aggregate_type,
-                aggregate_interval,
-            )
-            windSpeed_vt = self.converter.convert(windSpeed_vt)
+            windSpeed_vt = self.converter.convert(series["windSpeed", None][2])
             usage_round = int(
                 self.skin_dict["Units"]["StringFormats"].get(windSpeed_vt[2], "2f")[-2]
             )
@@ -2904,342 +5190,31 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
             ]
 
             # Exit if the vectors are None
+            empty_windrose = [{"name": "", "data": []}]
             if windDir_vt[1] is None or windSpeed_vt[1] is None:
-                empty_windrose = [{"name": "", "data": []}]
                 return empty_windrose
 
             # Get the unit label from the skin dict for speed.
             windSpeed_unit = windSpeed_vt[1]
             windSpeed_unit_label = self.skin_dict["Units"]["Labels"][windSpeed_unit]
 
-            # Merge the two outputs so we have a consistent data set to filter on
-            merged = zip(windDir_round_vt, windSpeed_round_vt)
-
-            # Sort by beaufort wind speeds
-            (
-                group_0_windDir,
-                group_0_windSpeed,
-                group_1_windDir,
-                group_1_windSpeed,
-                group_2_windDir,
-                group_2_windSpeed,
-                group_3_windDir,
-                group_3_windSpeed,
-                group_4_windDir,
-                group_4_windSpeed,
-                group_5_windDir,
-                group_5_windSpeed,
-                group_6_windDir,
-                group_6_windSpeed,
-            ) = ([] for i in range(14))
-            for windData in merged:
-                if windData[0] is not None and windData[1] is not None:
-                    if windSpeed_unit in ("mile_per_hour", "mile_per_hour2"):
-                        if windData[1] < 1:
-                            group_0_windDir.append(windData[0])
-                            group_0_windSpeed.append(windData[1])
-                        elif 1 <= windData[1] <= 3:
-                            group_1_windDir.append(windData[0])
-                            group_1_windSpeed.append(windData[1])
-                        elif 4 <= windData[1] <= 7:
-                            group_2_windDir.append(windData[0])
-                            group_2_windSpeed.append(windData[1])
-                        elif 8 <= windData[1] <= 12:
-                            group_3_windDir.append(windData[0])
-                            group_3_windSpeed.append(windData[1])
-                        elif 13 <= windData[1] <= 18:
-                            group_4_windDir.append(windData[0])
-                            group_4_windSpeed.append(windData[1])
-                        elif 19 <= windData[1] <= 24:
-                            group_5_windDir.append(windData[0])
-                            group_5_windSpeed.append(windData[1])
-                        elif windData[1] >= 25:
-                            group_6_windDir.append(windData[0])
-                            group_6_windSpeed.append(windData[1])
-                    elif windSpeed_unit in ("km_per_hour", "km_per_hour2"):
-                        if windData[1] < 2:
-                            group_0_windDir.append(windData[0])
-                            group_0_windSpeed.append(windData[1])
-                        elif 2 <= windData[1] <= 5:
-                            group_1_windDir.append(windData[0])
-                            group_1_windSpeed.append(windData[1])
-                        elif 6 <= windData[1] <= 11:
-                            group_2_windDir.append(windData[0])
-                            group_2_windSpeed.append(windData[1])
-                        elif 12 <= windData[1] <= 19:
-                            group_3_windDir.append(windData[0])
-                            group_3_windSpeed.append(windData[1])
-                        elif 20 <= windData[1] <= 28:
-                            group_4_windDir.append(windData[0])
-                            group_4_windSpeed.append(windData[1])
-                        elif 29 <= windData[1] <= 38:
-                            group_5_windDir.append(windData[0])
-                            group_5_windSpeed.append(windData[1])
-                        elif windData[1] >= 39:
-                            group_6_windDir.append(windData[0])
-                            group_6_windSpeed.append(windData[1])
-                    elif windSpeed_unit in ("meter_per_second", "meter_per_second2"):
-                        if windData[1] < 0.5:
-                            group_0_windDir.append(windData[0])
-                            group_0_windSpeed.append(windData[1])
-                        elif 0.5 <= windData[1] <= 1.5:
-                            group_1_windDir.append(windData[0])
-                            group_1_windSpeed.append(windData[1])
-                        elif 1.6 <= windData[1] <= 3.3:
-                            group_2_windDir.append(windData[0])
-                            group_2_windSpeed.append(windData[1])
-                        elif 3.4 <= windData[1] <= 5.5:
-                            group_3_windDir.append(windData[0])
-                            group_3_windSpeed.append(windData[1])
-                        elif 5.6 <= windData[1] <= 7.9:
-                            group_4_windDir.append(windData[0])
-                            group_4_windSpeed.append(windData[1])
-                        elif 8 <= windData[1] <= 10.7:
-                            group_5_windDir.append(windData[0])
-                            group_5_windSpeed.append(windData[1])
-                        elif windData[1] >= 10.8:
-                            group_6_windDir.append(windData[0])
-                            group_6_windSpeed.append(windData[1])
-                    elif windSpeed_unit in ("knot", "knot2"):
-                        if windData[1] < 1:
-                            group_0_windDir.append(windData[0])
-                            group_0_windSpeed.append(windData[1])
-                        elif 1 <= windData[1] <= 3:
-                            group_1_windDir.append(windData[0])
-                            group_1_windSpeed.append(windData[1])
-                        elif 4 <= windData[1] <= 6:
-                            group_2_windDir.append(windData[0])
-                            group_2_windSpeed.append(windData[1])
-                        elif 7 <= windData[1] <= 10:
-                            group_3_windDir.append(windData[0])
-                            group_3_windSpeed.append(windData[1])
-                        elif 11 <= windData[1] <= 16:
-                            group_4_windDir.append(windData[0])
-                            group_4_windSpeed.append(windData[1])
-                        elif 17 <= windData[1] <= 21:
-                            group_5_windDir.append(windData[0])
-                            group_5_windSpeed.append(windData[1])
-                        elif windData[1] >= 22:
-                            group_6_windDir.append(windData[0])
-                            group_6_windSpeed.append(windData[1])
-                    elif windSpeed_unit == "beaufort":
-                        if windData[1] <= 1:
-                            group_0_windDir.append(windData[0])
-                            group_0_windSpeed.append(windData[1])
-                        elif windData[1] == 2:
-                            group_1_windDir.append(windData[0])
-                            group_1_windSpeed.append(windData[1])
-                        elif windData[1] == 3:
-                            group_2_windDir.append(windData[0])
-                            group_2_windSpeed.append(windData[1])
-                        elif windData[1] == 4:
-                            group_3_windDir.append(windData[0])
-                            group_3_windSpeed.append(windData[1])
-                        elif windData[1] == 5:
-                            group_4_windDir.append(windData[0])
-                            group_4_windSpeed.append(windData[1])
-                        elif windData[1] == 6:
-                            group_5_windDir.append(windData[0])
-                            group_5_windSpeed.append(windData[1])
-                        elif windData[1] >= 7:
-                            group_6_windDir.append(windData[0])
-                            group_6_windSpeed.append(windData[1])
-
-            # Get the windRose data
-            group_0_series_data = self.create_windrose_data(
-                group_0_windDir, group_0_windSpeed
-            )
-            group_1_series_data = self.create_windrose_data(
-                group_1_windDir, group_1_windSpeed
-            )
-            group_2_series_data = self.create_windrose_data(
-                group_2_windDir, group_2_windSpeed
-            )
-            group_3_series_data = self.create_windrose_data(
-                group_3_windDir, group_3_windSpeed
-            )
-            group_4_series_data = self.create_windrose_data(
-                group_4_windDir, group_4_windSpeed
-            )
-            group_5_series_data = self.create_windrose_data(
-                group_5_windDir, group_5_windSpeed
-            )
-            group_6_series_data = self.create_windrose_data(
-                group_6_windDir, group_6_windSpeed
-            )
-
-            # Group all together to get wind frequency percentages
-            wind_sum = sum(
-                group_0_series_data
-                + group_1_series_data
-                + group_2_series_data
-                + group_3_series_data
-                + group_4_series_data
-                + group_5_series_data
-                + group_6_series_data
-            )
-            if wind_sum > 0:
-                y = 0
-                while y < len(group_0_series_data):
-                    group_0_series_data[y] = round(
-                        group_0_series_data[y] / wind_sum * 100
-                    )
-                    y += 1
-                y = 0
-                while y < len(group_1_series_data):
-                    group_1_series_data[y] = round(
-                        group_1_series_data[y] / wind_sum * 100
-                    )
-                    y += 1
-                y = 0
-                while y < len(group_2_series_data):
-                    group_2_series_data[y] = round(
-                        group_2_series_data[y] / wind_sum * 100
-                    )
-                    y += 1
-                y = 0
-                while y < len(group_3_series_data):
-                    group_3_series_data[y] = round(
-                        group_3_series_data[y] / wind_sum * 100
-                    )
-                    y += 1
-                y = 0
-                while y < len(group_4_series_data):
-                    group_4_series_data[y] = round(
-                        group_4_series_data[y] / wind_sum * 100
-                    )
-                    y += 1
-                y = 0
-                while y < len(group_5_series_data):
-                    group_5_series_data[y] = round(
-                        group_5_series_data[y] / wind_sum * 100
-                    )
-                    y += 1
-                y = 0
-                while y < len(group_6_series_data):
-                    group_6_series_data[y] = round(
-                        group_6_series_data[y] / wind_sum * 100
-                    )
-                    y += 1
-
-            # Setup the labels based on unit
-            if windSpeed_unit in ("mile_per_hour", "mile_per_hour2"):
-                group_0_speedRange = "< 1"
-                group_1_speedRange = "1-3"
-                group_2_speedRange = "4-7"
-                group_3_speedRange = "8-12"
-                group_4_speedRange = "13-18"
-                group_5_speedRange = "19-24"
-                group_6_speedRange = "25+"
-            elif windSpeed_unit in ("km_per_hour", "km_per_hour2"):
-                group_0_speedRange = "< 2"
-                group_1_speedRange = "2-5"
-                group_2_speedRange = "6-11"
-                group_3_speedRange = "12-19"
-                group_4_speedRange = "20-28"
-                group_5_speedRange = "29-38"
-                group_6_speedRange = "39+"
-            elif windSpeed_unit in ("meter_per_second", "meter_per_second2"):
-                group_0_speedRange = "< 0.5"
-                group_1_speedRange = "0.5-1.5"
-                group_2_speedRange = "1.6-3.3"
-                group_3_speedRange = "3.4-5.5"
-                group_4_speedRange = "5.5-7.9"
-                group_5_speedRange = "8-10.7"
-                group_6_speedRange = "10.8+"
-            elif windSpeed_unit in ("knot", "knot2"):
-                group_0_speedRange = "< 1"
-                group_1_speedRange = "1-3"
-                group_2_speedRange = "4-6"
-                group_3_speedRange = "7-10"
-                group_4_speedRange = "11-16"
-                group_5_speedRange = "17-21"
-                group_6_speedRange = "22+"
-            elif windSpeed_unit == "beaufort":
-                group_0_speedRange = "0"
-                group_1_speedRange = "1"
-                group_2_speedRange = "2"
-                group_3_speedRange = "3"
-                group_4_speedRange = "4"
-                group_5_speedRange = "5"
-                group_6_speedRange = "6+"
-
-            group_0_name = "%s %s" % (group_0_speedRange, windSpeed_unit_label)
-            group_1_name = "%s %s" % (group_1_speedRange, windSpeed_unit_label)
-            group_2_name = "%s %s" % (group_2_speedRange, windSpeed_unit_label)
-            group_3_name = "%s %s" % (group_3_speedRange, windSpeed_unit_label)
-            group_4_name = "%s %s" % (group_4_speedRange, windSpeed_unit_label)
-            group_5_name = "%s %s" % (group_5_speedRange, windSpeed_unit_label)
-            group_6_name = "%s %s" % (group_6_speedRange, windSpeed_unit_label)
-
-            group_0 = {
-                "name": group_0_name,
-                "type": "column",
-                "color": wind_rose_color[0],
-                "zIndex": 106,
-                "stacking": "normal",
-                "fillOpacity": 0.75,
-                "data": group_0_series_data,
-            }
-            group_1 = {
-                "name": group_1_name,
-                "type": "column",
-                "color": wind_rose_color[1],
-                "zIndex": 105,
-                "stacking": "normal",
-                "fillOpacity": 0.75,
-                "data": group_1_series_data,
-            }
-            group_2 = {
-                "name": group_2_name,
-                "type": "column",
-                "color": wind_rose_color[2],
-                "zIndex": 104,
-                "stacking": "normal",
-                "fillOpacity": 0.75,
-                "data": group_2_series_data,
-            }
-            group_3 = {
-                "name": group_3_name,
-                "type": "column",
-                "color": wind_rose_color[3],
-                "zIndex": 103,
-                "stacking": "normal",
-                "fillOpacity": 0.75,
-                "data": group_3_series_data,
-            }
-            group_4 = {
-                "name": group_4_name,
-                "type": "column",
-                "color": wind_rose_color[4],
-                "zIndex": 102,
-                "stacking": "normal",
-                "fillOpacity": 0.75,
-                "data": group_4_series_data,
-            }
-            group_5 = {
-                "name": group_5_name,
-                "type": "column",
-                "color": wind_rose_color[5],
-                "zIndex": 101,
-                "stacking": "normal",
-                "fillOpacity": 0.75,
-                "data": group_5_series_data,
-            }
-            group_6 = {
-                "name": group_6_name,
-                "type": "column",
-                "color": wind_rose_color[6],
-                "zIndex": 100,
-                "stacking": "normal",
-                "fillOpacity": 0.75,
-                "data": group_6_series_data,
-            }
+            windrose = WindRose.for_unit(
+                CompassSectors.for_skin(self.skin_dict), windSpeed_unit, wind_rose_bins
+            )
+            if windrose is None:
+                logerr(
+                    "HighchartsJsonGenerator: no windRose speed groups for %s, "
+                    "set windrose_speed_bins for the chart" % windSpeed_unit
+                )
+                return empty_windrose
 
-            # Append everything into a list and return right away, do not
-            # process rest of function
-            series = [group_0, group_1, group_2, group_3, group_4, group_5, group_6]
-            return series
+            # Return the series right away, do not process rest of function
+            return windrose.series(
+                windDir_round_vt,
+                windSpeed_round_vt,
+                windSpeed_unit_label,
+                wind_rose_color,
+            )
 
         # Special Belchertown Weather Range (radial)
         # https://www.highcharts.com/blog/tutorials/209-the-art-of-the-chart-weather-radials/
@@ -3259,14 +5234,14 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
             if not aggregate_interval:
                 aggregate_interval = 86400
 
-            # Get min values
-            aggregate_type = "min"
+            # Get the min, max and avg values, read together
             try:
-                (time_start_vt, time_stop_vt, obs_vt) = weewx.xtypes.get_series(
-                    obs_lookup,
+                series = self.get_series_set(
+                    binding,
+                    [obs_lookup],
                     TimeSpan(start_ts, end_ts),
                     archive,
-                    aggregate_type,
+                    ["min", "max", "avg"],
                     aggregate_interval,
                 )
             except Exception as e:
@@ -3275,49 +5250,16 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
                     "Error was: %s." % (binding, obs_lookup, e)
                 )
 
+            (time_start_vt, time_stop_vt, obs_vt) = series[obs_lookup, "min"]
             self.insert_null_value_timestamps_to_end_ts(time_start_vt, time_stop_vt, obs_vt, start_ts, end_ts, aggregate_interval)
 
             min_obs_vt = self.converter.convert(obs_vt)
-
-            # Get max values
-            aggregate_type = "max"
-            try:
-                (time_start_vt, time_stop_vt, obs_vt) = weewx.xtypes.get_series(
-                    obs_lookup,
-                    TimeSpan(start_ts, end_ts),
-                    archive,
-                    aggregate_type,
-                    aggregate_interval,
-                )
-            except Exception as e:
-                raise Warning(
-                    "Error trying to use database binding %s to graph observation %s. "
-                    "Error was: %s." % (binding, obs_lookup, e)
-                )
-
-            self.insert_null_value_timestamps_to_end_ts(time_start_vt, time_stop_vt, obs_vt, start_ts, end_ts, aggregate_interval)
-
-            max_obs_vt = self.converter.convert(obs_vt)
-
-            # Get avg values
-            aggregate_type = "avg"
-            try:
-                (time_start_vt, time_stop_vt, obs_vt) = weewx.xtypes.get_series(
-                    obs_lookup,
-                    TimeSpan(start_ts, end_ts),
-                    archive,
-                    aggregate_type,
-                    aggregate_interval,
-                )
-            except Exception as e:
-                raise Warning(
-                    "Error trying to use database binding %s to graph observation %s. "
-                    "Error was: %s." % (binding, obs_lookup, e)
-                )
-
-            self.insert_null_value_timestamps_to_end_ts(time_start_vt, time_stop_vt, obs_vt, start_ts, end_ts, aggregate_interval)
-
-            avg_obs_vt = self.converter.convert(obs_vt)
+            max_obs_vt = self.converter.convert(
+                self.insert_null_values_to_length(series[obs_lookup, "max"][2], time_start_vt)
+            )
+            avg_obs_vt = self.converter.convert(
+                self.insert_null_values_to_length(series[obs_lookup, "avg"][2], time_start_vt)
+            )
 
             obs_unit = avg_obs_vt[1]
             obs_unit_label = self.skin_dict["Units"]["Labels"].get(obs_unit, "")
@@ -3355,46 +5297,29 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
                 aggregate_interval = 86400
             logging.debug("Interval is: %s" % aggregate_interval)
 
-            aggregate_type = "max"
-            # Get min values
-            obs_lookup = "windSpeed"
+            # Get the windSpeed and windGust max values, read together
             try:
-                (time_start_vt, time_stop_vt, obs_vt) = weewx.xtypes.get_series(
-                    obs_lookup,
+                series = self.get_series_set(
+                    binding,
+                    ["windSpeed", "windGust"],
                     TimeSpan(start_ts, end_ts),
                     archive,
-                    aggregate_type,
+                    ["max"],
                     aggregate_interval,
                 )
             except Exception as e:
                 raise Warning(
                     "Error trying to use database binding %s to graph observation %s. "
-                    "Error was: %s." % (binding, obs_lookup, e)
+                    "Error was: %s." % (binding, "windSpeed, windGust", e)
                 )
 
+            (time_start_vt, time_stop_vt, obs_vt) = series["windSpeed", "max"]
             self.insert_null_value_timestamps_to_end_ts(time_start_vt, time_stop_vt, obs_vt, start_ts, end_ts, aggregate_interval)
-            
-            min_obs_vt = self.converter.convert(obs_vt)
-
-            # Get max values
-            obs_lookup = "windGust"
-            try:
-                (time_start_vt, time_stop_vt, obs_vt) = weewx.xtypes.get_series(
-                    obs_lookup,
-                    TimeSpan(start_ts, end_ts),
-                    archive,
-                    aggregate_type,
-                    aggregate_interval,
-                )
-            except Exception as e:
-                raise Warning(
-                    "Error trying to use database binding %s to graph observation %s. "
-                    "Error was: %s." % (binding, obs_lookup, e)
-                )
 
-            self.insert_null_value_timestamps_to_end_ts(time_start_vt, time_stop_vt, obs_vt, start_ts, end_ts, aggregate_interval)
-            
-            max_obs_vt = self.converter.convert(obs_vt)
+            min_obs_vt = self.converter.convert(obs_vt)
+            max_obs_vt = self.converter.convert(
+                self.insert_null_values_to_length(series["windGust", "max"][2], time_start_vt)
+            )
 
             obs_unit = max_obs_vt[1]
             obs_unit_label = self.skin_dict["Units"]["Labels"].get(obs_unit, "")
@@ -3485,10 +5410,19 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
             elif xAxis_groupby == "day": subqry_groupby = '"%Y%m%d"'
             elif xAxis_groupby == "hour": subqry_groupby = '"%Y%m%d%H"'
             else: subqry_groupby = ''
-                            
+
+            # Daily summaries can only be used for whole days, determined by
+            # the start and stop times. 1 or more exact days
+            use_daily_summaries = (
+                xAxis_groupby != "hour"
+                and isStartOfDay(start_ts)
+                and isStartOfDay(end_ts)
+                and end_ts - start_ts > 0
+            )
+
             if driver == "weedb.sqlite":
-                # Use daily summaries where possible - MUST BE FOR WHOLE DAYS determined by start and stop times otherwise use archive
-                if xAxis_groupby != "hour" and isStartOfDay(start_ts) and isStartOfDay(end_ts) and end_ts - start_ts > 0 :  # 1 or more exact days
+                # Use daily summaries where possible, otherwise use archive
+                if use_daily_summaries:
                     # Avg is a special case
                     if aggregate_type == "avg":
                         # Avg(sum) requires a subquery with the correct group by clause
@@ -3585,8 +5519,8 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
                         )
 
             elif driver == "weedb.mysql":
-                # Use daily summaries where possible - MUST BE FOR WHOLE DAYS determined by start and stop times otherwise use archive
-                if xAxis_groupby != "hour" and isStartOfDay(start_ts) and isStartOfDay(end_ts) and end_ts - start_ts > 0 :  # 1 or more exact days
+                # Use daily summaries where possible, otherwise use archive
+                if use_daily_summaries:
                     # Avg is a special case
                     if aggregate_type == "avg":
                         # Avg(sum) requires a subquery with the correct group by clause
@@ -3692,17 +5626,50 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
                 obs_group = None
                 obs_unit_from_target_unit = None
 
+            # Optionally index the archive for this query, or drop the
+            # indexes once they are no longer wanted
+            index_advisor = self.skin_dict["Extras"].get("belchertown_index_advisor", "0")
+            if index_advisor == "drop":
+                belchertown_indexes.drop(binding, archive, driver)
+            elif not use_daily_summaries and to_bool(index_advisor):
+                belchertown_indexes.advise(binding, archive, driver, obs_lookup, sql_lookup)
+
+            # Whole months and years can be read from the monthly and yearly
+            # rollups instead of re-aggregating the daily summaries
+            query = None
+            if use_daily_summaries and to_bool(
+                self.skin_dict["Extras"].get("belchertown_rollups", False)
+            ):
+                if binding not in rollup_engines:
+                    rollup_engines[binding] = BelchertownRollups()
+                rollups = rollup_engines[binding]
+                cycle_ts = self.gen_ts or time.time()
+                if rollups.supports(
+                    xAxis_groupby, aggregate_type, average_type
+                ) and rollups.update(archive, obs_lookup, startOfDay(cycle_ts), cycle_ts):
+                    query = rollups.get_groupby(
+                        archive,
+                        obs_lookup,
+                        xAxis_groupby,
+                        aggregate_type,
+                        average_type,
+                        start_ts,
+                        end_ts,
+                        isinstance(time_length, int),
+                    )
+
             # introduce test to catch any sql errors; a try / except sequence 
             
-            try:
-                query = archive.genSql(sql_lookup)
-            except:
-                raise Warning(
-                    "SQL error in"
-                    "sql_lookup"
-                    "The error is: %s"
-                        % (error)                    
-                )
+            if query is None:
+                try:
+                    query = archive.genSql(sql_lookup)
+                except:
+                    raise Warning(
+                        "SQL error in"
+                        "sql_lookup"
+                        "The error is: %s"
+                            % (error)                    
+                    )
                 
             for row in query:
                 xAxis_labels.append(row[0])
@@ -3737,7 +5704,8 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
 
         # Begin standard observation lookups
         try:
-            (time_start_vt, time_stop_vt, obs_vt) = weewx.xtypes.get_series(
+            (time_start_vt, time_stop_vt, obs_vt) = self.get_series(
+                binding,
                 obs_lookup,
                 TimeSpan(start_ts, end_ts),
                 archive,
@@ -3853,6 +5821,15 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
         for i in range(count):
            obs_vt[0].append(None)
 
+    def insert_null_values_to_length(self, obs_vt, time_start_vt):
+        """
+        Pad a series read together with another to the length of its time
+        vector, after insert_null_value_timestamps_to_end_ts() has padded
+        the time vector. The series of a set share their time vectors.
+        """
+        obs_vt[0].extend([None] * (len(time_start_vt[0]) - len(obs_vt[0])))
+        return obs_vt
+
     def round_none(self, value, places):
         """Round value to 'places' places but also permit a value of None"""
         if value is not None:
@@ -3880,88 +5857,12 @@ class HighchartsJsonGenerator(weewx.reportengine.ReportGenerator):
             int(float(time_ts)),
         )
 
-    def create_windrose_data(self, windDir_list, windSpeed_list):
-        # List comprehension borrowed from weewx-wd extension
-        # Create windrose_list container and initialise to all 0s
-        windrose_list = [0.0 for x in range(16)]
-
-        # Step through each windDir and add corresponding windSpeed to windrose_list
-        x = 0
-        while x < len(windDir_list):
-            # Only want to add windSpeed if both windSpeed and windDir have a value
-            if windSpeed_list[x] is not None and windDir_list[x] is not None:
-                # Add the windSpeed value to the corresponding element of our
-                # windrose list
-                windrose_list[
-                    int((windDir_list[x] + 11.25) / 22.5) % 16
-                ] += windSpeed_list[x]
-            x += 1
-
-        # Step through our windrose list and round all elements to 1 decimal place
-        y = 0
-        while y < len(windrose_list):
-            windrose_list[y] = round(windrose_list[y], 1)
-            y += 1
-        # Need to return a string of the list elements comma separated, no
-        # spaces and bounded by [ and ]
-        # windroseData = '[' + ','.join(str(z) for z in windrose_list) + ']'
-        return windrose_list
-
     def get_cardinal_direction(self, degree):
-        if 0 <= degree <= 11.25:
-            return "N"
-        if 11.26 <= degree <= 33.75:
-            return "NNE"
-        if 33.76 <= degree <= 56.25:
-            return "NE"
-        if 56.26 <= degree <= 78.75:
-            return "ENE"
-        if 78.76 <= degree <= 101.25:
-            return "E"
-        if 101.26 <= degree <= 123.75:
-            return "ESE"
-        if 123.76 <= degree <= 146.25:
-            return "SE"
-        if 146.26 <= degree <= 168.75:
-            return "SSE"
-        if 168.76 <= degree <= 191.25:
-            return "S"
-        if 191.26 <= degree <= 213.75:
-            return "SSW"
-        if 213.76 <= degree <= 236.25:
-            return "SW"
-        if 236.26 <= degree <= 258.75:
-            return "WSW"
-        if 258.76 <= degree <= 281.25:
-            return "W"
-        if 281.26 <= degree <= 303.75:
-            return "WNW"
-        if 303.76 <= degree <= 326.25:
-            return "NW"
-        if 326.26 <= degree <= 348.75:
-            return "NNW"
-        if 348.76 <= degree <= 360:
-            return "N"
+        return CompassSectors.for_names().name(degree)
 
     def highcharts_series_options_to_float(self, d):
         """
         Recurse through all the series options and set any strings that
         should be numbers to float.
-        https://stackoverflow.com/a/54565277/1177153
         """
-
-        try:
-            for k, v in d.items():
-                if isinstance(v, dict):
-                    # Check nested dicts
-                    self.highcharts_series_options_to_float(v)
-                else:
-                    try:
-                        v = to_float(v)
-                        d.update({k: v})
-                    except:
-                        pass
-            return d
-        except:
-            # This item isn't a dict, so return it back
-            return d
+        return highcharts_options_to_float(d)
@@ -32,6 +32,7 @@ class BelchertownInstaller(ExtensionInstaller):
             description=DESCRIPTION,
             author=AUTHOR,
             author_email=AUTHOR_EMAIL,
+            report_services='user.belchertown.BelchertownDataService',
             config=config_dict,
             files=files_dict
         )
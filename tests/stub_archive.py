@@ -0,0 +1,97 @@
+"""
+A small weewx SQLite archive with daily summaries, for the tests.
+"""
+
+import atexit
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+import weewx  # noqa: E402
+import weewx.manager  # noqa: E402
+
+# Only the observations the tests use. Every daily summary is read and
+# written for each record added, so the full schema makes the tests slow
+observations = (
+    "outTemp",
+    "dewpoint",
+    "barometer",
+    "outHumidity",
+    "rain",
+    "windSpeed",
+    "windDir",
+)
+schema = {
+    "table": [
+        ("dateTime", "INTEGER NOT NULL UNIQUE PRIMARY KEY"),
+        ("usUnits", "INTEGER NOT NULL"),
+        ("interval", "INTEGER NOT NULL"),
+    ]
+    + [(obs_type, "REAL") for obs_type in observations],
+    "day_summaries": [(obs_type, "scalar") for obs_type in observations],
+}
+
+# Archives already made, keyed by the make_archive arguments. They are
+# copied for each test
+templates = {}
+
+
+def local_ts(date):
+    """Local midnight of a YYYY-MM-DD date"""
+    return int(time.mktime(time.strptime(date, "%Y-%m-%d")))
+
+
+def make_records(start_ts, stop_ts, interval=10800, skip=()):
+    """
+    Archive records from start_ts up to stop_ts. Each record only depends
+    on its time, so records that are left out and added later are the
+    same as if they had been there from the start. skip is a list of
+    (start, stop) spans to leave out.
+    """
+    records = []
+    for ts in range(start_ts + interval, stop_ts, interval):
+        if any(span_start < ts <= span_stop for span_start, span_stop in skip):
+            continue
+        rand = random.Random(ts)
+        out_temp = 40 + 30 * rand.random()
+        records.append(
+            {
+                "dateTime": ts,
+                "usUnits": weewx.US,
+                "interval": interval // 60,
+                "outTemp": out_temp,
+                "dewpoint": out_temp - 10 * rand.random(),
+                "barometer": 29.5 + rand.random(),
+                "outHumidity": 40 + 50 * rand.random(),
+                "rain": round(rand.random() * 0.2, 2) if rand.random() < 0.15 else 0.0,
+                "windSpeed": 20 * rand.random(),
+                "windDir": 360 * rand.random() if rand.random() < 0.9 else None,
+            }
+        )
+    return records
+
+
+def open_archive(path):
+    return weewx.manager.DaySummaryManager.open_with_create(
+        {"database_name": path, "driver": "weedb.sqlite"}, schema=schema
+    )
+
+
+def make_archive(path, start_ts, stop_ts, interval=10800, skip=()):
+    """Create the archive at path and return its manager"""
+    key = (start_ts, stop_ts, interval, tuple(skip))
+    if key not in templates:
+        template_dir = tempfile.mkdtemp()
+        atexit.register(shutil.rmtree, template_dir, True)
+        template = os.path.join(template_dir, "template.sdb")
+        manager = open_archive(template)
+        manager.addRecord(make_records(start_ts, stop_ts, interval, skip))
+        manager.close()
+        templates[key] = template
+    shutil.copy(templates[key], path)
+    return open_archive(path)
@@ -0,0 +1,408 @@
+"""
+Tests for the forecast downloads, against a local stub HTTP server, and
+the translation of the forecast weather codes.
+
+Needs weewx to be importable. Run from the repository root with:
+
+    python -m unittest discover -s tests
+"""
+
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+import user.belchertown as belchertown  # noqa: E402
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    /slow answers after 2 seconds, /error with a 500 and /ok/<name> with an
+    Aeris style response whose period timestamp is the server's generation.
+    /etag/<name> is the same as /ok/<name> with the generation as its ETag,
+    and answers 304 if the request has it in If-None-Match.
+    """
+
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        etag = '"%s"' % self.server.generation
+        if self.path.startswith("/etag"):
+            self.server.conditional.append(
+                (self.path, self.headers.get("If-None-Match"))
+            )
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+        if self.path.startswith("/slow"):
+            time.sleep(2)
+        if self.path.startswith("/error"):
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        name = self.path.split("/")[-1]
+        body = json.dumps(
+            {
+                "success": True,
+                "error": None,
+                "response": [
+                    {"periods": [{"timestamp": self.server.generation, "feed": name}]}
+                ],
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path.startswith("/etag"):
+            self.send_header("ETag", etag)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (IOError, OSError):
+            # The client gave up on /slow
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class StubFeeds(belchertown.BelchertownFeeds):
+    """The forecast and earthquake feeds, downloaded from the stub server"""
+
+    def __init__(self, html_root, base_url, paths):
+        extras = {
+            "forecast_enabled": "1",
+            "forecast_stale": "3600",
+            "forecast_timeout": "0.5",
+            "forecast_deadline": "1",
+            "earthquake_enabled": "1",
+            "earthquake_stale": "3600",
+            "earthquake_timeout": "1",
+        }
+        super(StubFeeds, self).__init__(extras, html_root, "42.0", "-72.0")
+        self.base_url = base_url
+        self.paths = paths
+
+    def forecast_urls(self):
+        return OrderedDict(
+            (name, self.base_url + path + name) for name, path in self.paths.items()
+        )
+
+    def earthquake_url(self):
+        return self.base_url + "/etag/earthquake"
+
+
+def forecast_reads():
+    """
+    The fields of forecast.json that belchertown.js.tmpl and getData read,
+    as (feed, path) with 0 for a list index, from their
+    data[<feed>][0][...] lookups
+    """
+    root = os.path.join(os.path.dirname(__file__), "..")
+    lookup = re.compile(
+        r"""data\[\(?["']?(forecast_interval|current|aqi|alerts)["']?\)?\]"""
+        r"\[0\]((?:\[[^\[\]]+\])+)"
+    )
+    reads = set()
+    for filename in (
+        os.path.join(root, "skins", "Belchertown", "js", "belchertown.js.tmpl"),
+        os.path.join(root, "bin", "user", "belchertown.py"),
+    ):
+        with open(filename) as file:
+            source = file.read()
+        for match in lookup.finditer(source):
+            path = tuple(
+                key.strip("'\"") if key[0] in "'\"" else 0
+                for key in re.findall(r"\[([^\[\]]+)\]", match.group(2))
+            )
+            if match.group(1) == "forecast_interval":
+                feeds = ("forecast_1hr", "forecast_3hr", "forecast_24hr")
+            else:
+                feeds = (match.group(1),)
+            reads.update((feed, path) for feed in feeds)
+    return reads
+
+
+class FeedsTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer(("127.0.0.1", 0), StubHandler)
+        self.server.hits = []
+        self.server.conditional = []
+        self.server.generation = 2
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.base_url = "http://127.0.0.1:%s" % self.server.server_port
+
+        # A client of our own, so the circuit breaker starts closed and the
+        # retries don't wait
+        self.http_client = belchertown.http_client
+        belchertown.http_client = belchertown.HTTPClient(retries=2, backoff=0.01)
+
+        self.html_root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.html_root, "json"))
+
+    def tearDown(self):
+        belchertown.http_client = self.http_client
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.html_root)
+
+    def test_slow_endpoint(self):
+        start_ts = time.time()
+        pages = belchertown.fetch_urls(
+            {
+                "slow": self.base_url + "/slow/slow",
+                "fast": self.base_url + "/ok/fast",
+            },
+            {},
+            timeout=0.5,
+            deadline=1,
+        )
+        self.assertLess(time.time() - start_ts, 1.5)
+        self.assertEqual(sorted(pages), ["fast"])
+        self.assertEqual(pages["fast"].status, 200)
+
+        # The slow download was cancelled at the deadline. It isn't retried
+        # again and doesn't count against its circuit breaker
+        time.sleep(2.5)
+        hits = self.server.hits.count("/slow/slow")
+        self.assertLessEqual(hits, 2)
+        self.assertNotIn("slow", belchertown.http_client.breaker.failures)
+        time.sleep(1)
+        self.assertEqual(self.server.hits.count("/slow/slow"), hits)
+
+    def test_server_error(self):
+        with self.assertRaises(IOError):
+            belchertown.http_client.get(
+                self.base_url + "/error/error", timeout=1, name="error"
+            )
+        # The first request and 2 retries
+        self.assertEqual(self.server.hits.count("/error/error"), 3)
+
+        # A second failure opens the circuit, so the next call isn't sent
+        with self.assertRaises(IOError):
+            belchertown.http_client.get(
+                self.base_url + "/error/error", timeout=1, name="error"
+            )
+        with self.assertRaises(IOError):
+            belchertown.http_client.get(
+                self.base_url + "/error/error", timeout=1, name="error"
+            )
+        self.assertEqual(self.server.hits.count("/error/error"), 6)
+
+    def test_partial_merge(self):
+        paths = OrderedDict(
+            [
+                ("forecast_24hr", "/ok/"),
+                ("forecast_3hr", "/error/"),
+                ("forecast_1hr", "/slow/"),
+            ]
+        )
+        feeds = StubFeeds(self.html_root, self.base_url, paths)
+
+        # The previous forecast.json, with every part out of date
+        previous = OrderedDict([("timestamp", 1), ("version", feeds.forecast_version)])
+        for name in paths:
+            previous[name] = [
+                {
+                    "success": True,
+                    "error": None,
+                    "response": [{"periods": [{"timestamp": 1}]}],
+                }
+            ]
+        with open(feeds.forecast_file, "w") as file:
+            json.dump(previous, file)
+        feeds.save_meta(
+            feeds.forecast_file,
+            {"feeds": dict((name, {"fetched": 1}) for name in paths)},
+        )
+        self.assertEqual(feeds.stale_forecast_feeds(), list(paths))
+
+        feeds.update_forecast()
+
+        with open(feeds.forecast_file) as file:
+            forecast = json.load(file)
+
+        def period_timestamp(name):
+            return forecast[name][0]["response"][0]["periods"][0]["timestamp"]
+
+        # The part that downloaded is new, the failed ones are kept
+        self.assertEqual(period_timestamp("forecast_24hr"), 2)
+        self.assertEqual(period_timestamp("forecast_3hr"), 1)
+        self.assertEqual(period_timestamp("forecast_1hr"), 1)
+        # and are still stale, so they're tried again on the next update
+        self.assertEqual(feeds.stale_forecast_feeds(), ["forecast_3hr", "forecast_1hr"])
+
+    def test_earthquake_not_modified(self):
+        feeds = StubFeeds(self.html_root, self.base_url, {})
+        self.assertTrue(feeds.earthquake_is_stale())
+        feeds.update_earthquake()
+        self.assertFalse(feeds.earthquake_is_stale())
+        meta = feeds.load_meta(feeds.earthquake_file)
+        self.assertEqual(meta["etag"], '"2"')
+        self.assertEqual(meta["url"], feeds.earthquake_url())
+
+        # Once it is stale the ETag is sent, and a 304 only updates the
+        # .meta file
+        meta["fetched"] = 1
+        feeds.save_meta(feeds.earthquake_file, meta)
+        os.utime(feeds.earthquake_file, (1000, 1000))
+        self.assertTrue(feeds.earthquake_is_stale())
+        feeds.update_earthquake()
+        self.assertEqual(self.server.conditional[-1], ("/etag/earthquake", '"2"'))
+        self.assertEqual(os.path.getmtime(feeds.earthquake_file), 1000)
+        self.assertFalse(feeds.earthquake_is_stale())
+
+        # A changed feed is downloaded again
+        self.server.generation = 3
+        meta = feeds.load_meta(feeds.earthquake_file)
+        meta["fetched"] = 1
+        feeds.save_meta(feeds.earthquake_file, meta)
+        feeds.update_earthquake()
+        with open(feeds.earthquake_file) as file:
+            earthquake = json.load(file)
+        self.assertEqual(earthquake["response"][0]["periods"][0]["timestamp"], 3)
+        self.assertEqual(feeds.load_meta(feeds.earthquake_file)["etag"], '"3"')
+        self.assertFalse(feeds.earthquake_is_stale())
+
+    def test_forecast_not_modified(self):
+        paths = OrderedDict(
+            (name, "/etag/")
+            for name in ("forecast_24hr", "forecast_3hr", "forecast_1hr")
+        )
+        feeds = StubFeeds(self.html_root, self.base_url, paths)
+        feeds.update_forecast()
+        self.assertEqual(
+            sorted(self.server.conditional),
+            sorted(("/etag/" + name, None) for name in paths),
+        )
+        self.assertEqual(feeds.stale_forecast_feeds(), [])
+
+        def make_stale(names):
+            meta = feeds.load_meta(feeds.forecast_file)
+            for name in names:
+                self.assertEqual(meta["feeds"][name]["etag"], '"2"')
+                meta["feeds"][name]["fetched"] = 1
+            feeds.save_meta(feeds.forecast_file, meta)
+            self.assertEqual(feeds.stale_forecast_feeds(), list(names))
+
+        def period_timestamps():
+            with open(feeds.forecast_file) as file:
+                forecast = json.load(file)
+            return [
+                forecast[name][0]["response"][0]["periods"][0]["timestamp"]
+                for name in paths
+            ]
+
+        # The stale parts send their ETags. They are all not modified, so
+        # the file is kept and only the .meta file is updated
+        make_stale(paths)
+        os.utime(feeds.forecast_file, (1000, 1000))
+        del self.server.conditional[:]
+        feeds.update_forecast()
+        self.assertEqual(
+            sorted(self.server.conditional),
+            sorted(("/etag/" + name, '"2"') for name in paths),
+        )
+        self.assertEqual(os.path.getmtime(feeds.forecast_file), 1000)
+        self.assertEqual(feeds.stale_forecast_feeds(), [])
+
+        # Only the stale part is downloaded again once it has changed
+        self.server.generation = 3
+        make_stale(["forecast_3hr"])
+        del self.server.conditional[:]
+        feeds.update_forecast()
+        self.assertEqual(self.server.conditional, [("/etag/forecast_3hr", '"2"')])
+        self.assertEqual(period_timestamps(), [2, 3, 2])
+        self.assertEqual(feeds.stale_forecast_feeds(), [])
+        meta = feeds.load_meta(feeds.forecast_file)
+        self.assertEqual(meta["feeds"]["forecast_3hr"]["etag"], '"3"')
+        self.assertEqual(meta["feeds"]["forecast_24hr"]["etag"], '"2"')
+
+    def test_forecast_fields(self):
+        # An Aeris response with every field the skin reads, and one more
+        # in each object that it doesn't
+        reads = forecast_reads()
+        self.assertIn(("current", ("response", "ob", "icon")), reads)
+        self.assertIn(("forecast_3hr", ("response", 0, "periods", 0, "pop")), reads)
+        responses = {}
+        # The longest first, so a field that holds others is made as an object
+        for feed, path in sorted(reads, key=lambda read: -len(read[1])):
+            data = responses.setdefault(feed, {"unused": 1})
+            for i, key in enumerate(path):
+                if i + 1 == len(path):
+                    value = "value"
+                elif path[i + 1] == 0:
+                    value = []
+                else:
+                    value = {"unused": 1}
+                if key == 0:
+                    if not data:
+                        data.append(value)
+                    data = data[0]
+                else:
+                    data = data.setdefault(key, value)
+
+        feeds = StubFeeds(self.html_root, self.base_url, {})
+        for feed, path in reads:
+            projected = feeds.project_forecast(feed, responses[feed])
+            data = projected
+            for key in path:
+                try:
+                    data = data[key]
+                except (KeyError, IndexError):
+                    self.fail("forecast.json has no %s in %s" % (path, feed))
+            # The fields that are kept whole, like the error, keep the rest
+            self.assertNotIn("unused", projected)
+            if feed.startswith("forecast_"):
+                self.assertNotIn("unused", projected["response"][0]["periods"][0])
+            elif feed == "current":
+                self.assertNotIn("unused", projected["response"]["ob"])
+
+
+class AerisCodedWeatherTest(unittest.TestCase):
+    labels = {
+        "forecast_cloud_code_CL": "Clear",
+        "forecast_coverage_code_C": "Chance of",
+        "forecast_intensity_code_L": "Light",
+        "forecast_weather_code_RW": "Rain Showers",
+    }
+
+    def test_translate(self):
+        translator = belchertown.AerisCodedWeather.for_labels(self.labels)
+        self.assertIs(translator, belchertown.AerisCodedWeather.for_labels(self.labels))
+        self.assertEqual(translator.translate("::CL"), "Clear")
+        self.assertEqual(translator.translate("C:L:RW"), "Chance of Light Rain Showers")
+        self.assertEqual(translator.translate("::RW"), "Rain Showers")
+
+    def test_missing_labels(self):
+        # A code without a label is shown as the name of the label, the
+        # way skin.conf shows a missing label
+        translator = belchertown.AerisCodedWeather.for_labels(self.labels)
+        self.assertEqual(translator.translate("::XX"), "forecast_weather_code_XX")
+        self.assertEqual(
+            translator.translate("PA:VH:RW"),
+            "forecast_coverage_code_PA forecast_intensity_code_VH Rain Showers",
+        )
+        self.assertEqual(translator.translate("::OV"), "forecast_cloud_code_OV")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Tests for the archive indexes of belchertown_index_advisor.
+
+Needs weewx to be importable. Run from the repository root with:
+
+    python -m unittest discover -s tests
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from stub_archive import local_ts, make_archive
+
+import user.belchertown as belchertown
+
+START_TS = local_ts("2023-01-01")
+STOP_TS = local_ts("2023-02-01")
+
+GROUPBY_SQL = (
+    'SELECT strftime("%H", datetime(dateTime, "unixepoch", "localtime")) AS hour, '
+    "MAX(outTemp) AS obs FROM archive WHERE dateTime >= {0} AND dateTime < {1} "
+    "GROUP BY hour;".format(START_TS, STOP_TS)
+)
+
+
+class IndexesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.manager = make_archive(
+            os.path.join(self.tmpdir, "weewx.sdb"), START_TS, STOP_TS
+        )
+        self.indexes = belchertown.BelchertownIndexes()
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.tmpdir)
+
+    def index_names(self):
+        return self.indexes.index_names(self.manager, "weedb.sqlite", "archive")
+
+    def test_advise(self):
+        rows = list(self.manager.genSql(GROUPBY_SQL))
+        for observation in ("outTemp", "rain", "outTemp", "windchill"):
+            self.indexes.advise(
+                "wx_binding", self.manager, "weedb.sqlite", observation, GROUPBY_SQL
+            )
+        # Only archive columns are indexed
+        self.assertEqual(
+            self.index_names(),
+            ["belchertown_archive_outTemp", "belchertown_archive_rain"],
+        )
+        self.assertIn(
+            "belchertown_archive_outTemp",
+            self.indexes.explain(self.manager, "weedb.sqlite", GROUPBY_SQL),
+        )
+        self.assertEqual(list(self.manager.genSql(GROUPBY_SQL)), rows)
+
+    def test_drop(self):
+        self.indexes.advise(
+            "wx_binding", self.manager, "weedb.sqlite", "outTemp", GROUPBY_SQL
+        )
+        with belchertown.weedb.Transaction(self.manager.connection) as cursor:
+            cursor.execute("CREATE INDEX station_archive_outTemp ON archive (outTemp);")
+
+        # Only the indexes the skin created are dropped
+        self.indexes.drop("wx_binding", self.manager, "weedb.sqlite")
+        self.assertEqual(self.index_names(), [])
+        self.assertIsNotNone(
+            self.manager.getSql(
+                "SELECT name FROM sqlite_master WHERE name = 'station_archive_outTemp';"
+            )
+        )
+
+        # and they are created again if the advisor is turned back on
+        self.indexes.advise(
+            "wx_binding", self.manager, "weedb.sqlite", "outTemp", GROUPBY_SQL
+        )
+        self.assertEqual(self.index_names(), ["belchertown_archive_outTemp"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,296 @@
+"""
+Tests for the records engine, against the full daily summary queries the
+skin used before the records were kept incrementally.
+
+Needs weewx to be importable. Run from the repository root with:
+
+    python -m unittest discover -s tests
+"""
+
+import decimal
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from stub_archive import local_ts, make_archive, make_records
+
+import user.belchertown as belchertown
+
+
+START_TS = local_ts("2022-10-01")
+TODAY_TS = local_ts("2024-03-15")
+STOP_TS = TODAY_TS + 12 * 3600
+# Days that are missing from the archive until they are backfilled
+GAP = (local_ts("2023-06-10"), local_ts("2023-06-13"))
+
+
+class DecimalManager(object):
+    """A manager which returns the results of SUM() as a Decimal, like MySQL"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.connection = manager.connection
+
+    def getSql(self, sql, sqlargs=()):
+        row = self.manager.getSql(sql, sqlargs)
+        if row is None or "SUM(" not in sql:
+            return row
+        return tuple(
+            decimal.Decimal(repr(value)) if isinstance(value, (int, float)) else value
+            for value in row
+        )
+
+    def genSql(self, sql, sqlargs=()):
+        return self.manager.genSql(sql, sqlargs)
+
+
+class RecordsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.manager = make_archive(
+            os.path.join(self.tmpdir, "weewx.sdb"), START_TS, STOP_TS, skip=[GAP]
+        )
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.tmpdir)
+
+    def new_engine(self):
+        return belchertown.BelchertownRecords(
+            [
+                belchertown.DailyRangeRecords("outTemp", 1),
+                belchertown.RainRecords(),
+            ]
+        )
+
+    def query(self, sql):
+        return list(self.manager.getSql(sql))
+
+    def full_scan(self, today_ts=TODAY_TS):
+        """The records from the queries the skin used before"""
+        year = time.localtime(today_ts).tm_year
+        year_ts = local_ts("%s-01-01" % year)
+        range_sql = (
+            "SELECT dateTime, ROUND( (max - min), 1 ) as total, ROUND( min, 1 ) "
+            "as min, ROUND( max, 1 ) as max FROM archive_day_outTemp WHERE %s "
+            "min IS NOT NULL AND max IS NOT NULL ORDER BY total %s LIMIT 1;"
+        )
+        year_where = "dateTime >= %s AND dateTime < %s AND" % (year_ts, today_ts)
+        at_where = "dateTime < %s AND" % today_ts
+        return {
+            "outTemp_range": {
+                "year_max": self.query(range_sql % (year_where, "DESC")),
+                "year_min": self.query(range_sql % (year_where, "ASC")),
+                "at_max": self.query(range_sql % (at_where, "DESC")),
+                "at_min": self.query(range_sql % (at_where, "ASC")),
+            },
+            "rain": {
+                "year_day": self.query(
+                    "SELECT dateTime, sum FROM archive_day_rain WHERE dateTime >= %s "
+                    "ORDER BY sum DESC LIMIT 1;" % year_ts
+                ),
+                "at_day": self.query(
+                    "SELECT dateTime, sum FROM archive_day_rain ORDER BY sum DESC LIMIT 1"
+                ),
+                "year_month": self.query(
+                    'SELECT strftime("%%m", datetime(dateTime, "unixepoch", "localtime")) '
+                    "as month, SUM( sum ) as total FROM archive_day_rain WHERE "
+                    'strftime("%%Y", datetime(dateTime, "unixepoch", "localtime")) = "%s" '
+                    "GROUP BY month ORDER BY total DESC LIMIT 1;" % year
+                ),
+                "at_month": self.query(
+                    'SELECT strftime("%m", datetime(dateTime, "unixepoch", "localtime")) '
+                    'as month, strftime("%Y", datetime(dateTime, "unixepoch", "localtime")) '
+                    "as year, SUM( sum ) as total FROM archive_day_rain GROUP BY month, "
+                    "year ORDER BY total DESC LIMIT 1;"
+                ),
+                "at_year": self.query(
+                    'SELECT strftime("%Y", datetime(dateTime, "unixepoch", "localtime")) '
+                    "as year, SUM( sum ) as total FROM archive_day_rain GROUP BY year "
+                    "ORDER BY total DESC LIMIT 1;"
+                ),
+            },
+        }
+
+    def assertMatchesFullScan(self, records, today_ts=TODAY_TS):
+        expected = self.full_scan(today_ts)
+        for key, value in expected["outTemp_range"].items():
+            self.assertEqual(records["outTemp_range"][key], list(value), key)
+        rain = records["rain"]
+        for key in ("year_day", "at_day"):
+            self.assertEqual(rain[key][0], expected["rain"][key][0], key)
+            self.assertAlmostEqual(rain[key][1], expected["rain"][key][1], 9, key)
+        # Months are [year, month, total], the query gives the month first
+        month, total = expected["rain"]["year_month"]
+        self.assertEqual(rain["year_month"][1], int(month))
+        self.assertAlmostEqual(rain["year_month"][2], total, 9)
+        month, year, total = expected["rain"]["at_month"]
+        self.assertEqual(rain["at_month"][:2], [int(year), int(month)])
+        self.assertAlmostEqual(rain["at_month"][2], total, 9)
+        year, total = expected["rain"]["at_year"]
+        self.assertEqual(rain["at_year"][0], int(year))
+        self.assertAlmostEqual(rain["at_year"][1], total, 9)
+
+    def test_matches_full_scan(self):
+        self.assertMatchesFullScan(self.new_engine().get_records(self.manager, TODAY_TS))
+
+    def test_incremental(self):
+        # Built up to 40 days ago, then the days since are folded in
+        engine = self.new_engine()
+        engine.persist = False
+        engine.update(self.manager, TODAY_TS - 40 * 86400)
+        self.assertMatchesFullScan(engine.get_records(self.manager, TODAY_TS))
+
+    def test_saved_state(self):
+        records = self.new_engine().get_records(self.manager, TODAY_TS)
+        engine = self.new_engine()
+        engine.fold = None  # Loading the saved state must not read any days
+        self.assertEqual(engine.get_records(self.manager, TODAY_TS), records)
+
+    def test_backfill(self):
+        engine = self.new_engine()
+        engine.get_records(self.manager, TODAY_TS)
+        # Fill the gap with the days that were missing. The shape check of
+        # the next report cycle notices the new days
+        self.manager.addRecord(
+            [
+                record
+                for record in make_records(START_TS, STOP_TS)
+                if GAP[0] < record["dateTime"] <= GAP[1]
+            ]
+        )
+        watermark = engine.state["watermark"]
+        records = engine.get_records(self.manager, TODAY_TS)
+        self.assertEqual(engine.state["watermark"], watermark)
+        self.assertMatchesFullScan(records)
+        self.assertEqual(
+            engine.state["tables"]["archive_day_rain"]["shape"][0],
+            self.query("SELECT COUNT(*) FROM archive_day_rain WHERE dateTime < %s" % TODAY_TS)[0],
+        )
+
+    def test_corrected_value(self):
+        engine = self.new_engine()
+        engine.get_records(self.manager, TODAY_TS)
+        # A correction doesn't add or remove days, so it is found when the
+        # sums are checked at the start of the next day
+        day_ts = local_ts("2023-02-01")
+        with belchertown.weedb.Transaction(self.manager.connection) as cursor:
+            cursor.execute(
+                "UPDATE archive_day_rain SET sum = 9.5 WHERE dateTime = ?", (day_ts,)
+            )
+        self.assertNotEqual(
+            engine.get_records(self.manager, TODAY_TS)["rain"]["at_day"][0], day_ts
+        )
+        records = engine.get_records(self.manager, TODAY_TS + 86400)
+        self.assertEqual(records["rain"]["at_day"], [day_ts, 9.5])
+        self.assertMatchesFullScan(records, TODAY_TS + 86400)
+
+        # and when weewx starts
+        with belchertown.weedb.Transaction(self.manager.connection) as cursor:
+            cursor.execute(
+                "UPDATE archive_day_rain SET sum = 0.0 WHERE dateTime = ?", (day_ts,)
+            )
+        records = self.new_engine().get_records(self.manager, TODAY_TS + 86400)
+        self.assertMatchesFullScan(records, TODAY_TS + 86400)
+
+    def test_verify(self):
+        engine = self.new_engine()
+        self.assertTrue(engine.verify(self.manager, TODAY_TS))
+        engine.state["records"]["rain"]["at_day"] = [START_TS, 99.0]
+        self.assertFalse(engine.verify(self.manager, TODAY_TS))
+        self.assertMatchesFullScan(engine.get_records(self.manager, TODAY_TS))
+
+    def test_daily_ranges(self):
+        # Any observation with a daily summary, from the same pass. Only
+        # outTemp is rounded
+        engine = belchertown.BelchertownRecords(
+            [
+                belchertown.DailyRangeRecords("outTemp", 1),
+                belchertown.DailyRangeRecords("barometer"),
+                belchertown.DailyRangeRecords("outHumidity"),
+            ]
+        )
+        engine.persist = False
+        engine.update(self.manager, TODAY_TS - 40 * 86400)
+        records = engine.get_records(self.manager, TODAY_TS)
+        year_ts = local_ts("%s-01-01" % time.localtime(TODAY_TS).tm_year)
+        for obs_type in ("barometer", "outHumidity"):
+            range_sql = (
+                "SELECT dateTime, max - min as total, min, max FROM archive_day_%s "
+                "WHERE dateTime >= %%s AND dateTime < %s AND min IS NOT NULL "
+                "ORDER BY total %%s, dateTime ASC LIMIT 1;" % (obs_type, TODAY_TS)
+            )
+            for key, start_ts, order in (
+                ("year_max", year_ts, "DESC"),
+                ("year_min", year_ts, "ASC"),
+                ("at_max", 0, "DESC"),
+                ("at_min", 0, "ASC"),
+            ):
+                self.assertEqual(
+                    records["%s_range" % obs_type][key],
+                    self.query(range_sql % (start_ts, order)),
+                    (obs_type, key),
+                )
+        self.assertEqual(
+            records["outTemp_range"],
+            self.new_engine().get_records(self.manager, TODAY_TS)["outTemp_range"],
+        )
+
+    def full_scan_streaks(self, where):
+        """The longest wet and dry streaks, the way the skin counted them before"""
+        wet = dry = 0
+        wet_days = {}
+        dry_days = {}
+        for day_ts, rain in self.manager.genSql(
+            "SELECT dateTime, ROUND( sum, 2 ) FROM archive_day_rain WHERE %s count > 0;"
+            % where
+        ):
+            wet = wet + 1 if rain != 0 else 0
+            dry = dry + 1 if rain == 0 else 0
+            wet_days[day_ts] = wet
+            dry_days[day_ts] = dry
+        return (
+            list(max(zip(wet_days.values(), wet_days.keys()))),
+            list(max(zip(dry_days.values(), dry_days.keys()))),
+        )
+
+    def test_rain_streaks(self):
+        engine = belchertown.BelchertownRecords([belchertown.RainStreakRecords()])
+        engine.persist = False
+        engine.update(self.manager, TODAY_TS - 100 * 86400)
+        streaks = engine.get_records(self.manager, TODAY_TS)["rain_streak"]
+        self.assertEqual(
+            [streaks["at_wet"], streaks["at_dry"]], list(self.full_scan_streaks(""))
+        )
+        year_where = (
+            'strftime("%%Y", datetime(dateTime, "unixepoch", "localtime")) = "%s" AND'
+            % time.localtime(TODAY_TS).tm_year
+        )
+        self.assertEqual(
+            [streaks["year_wet"], streaks["year_dry"]],
+            list(self.full_scan_streaks(year_where)),
+        )
+        # The gap has no daily summaries, so it doesn't break a streak
+        self.assertGreater(streaks["at_dry"][0], 1)
+
+    def test_decimal_sums(self):
+        manager = DecimalManager(self.manager)
+        engine = self.new_engine()
+        self.assertTrue(engine.verify(manager, TODAY_TS))
+        for fingerprint in engine.state["tables"].values():
+            for value in fingerprint["shape"] + fingerprint["sums"]:
+                self.assertIsInstance(value, (int, float))
+        # The state was saved, so another engine can use it
+        saved = self.new_engine()
+        saved.fold = None
+        self.assertEqual(
+            saved.get_records(manager, TODAY_TS), engine.get_records(manager, TODAY_TS)
+        )
+        json.dumps(saved.state)
+
+
+if __name__ == "__main__":
+    unittest.main()
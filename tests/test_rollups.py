@@ -0,0 +1,255 @@
+"""
+Tests for the monthly and yearly rollups, against the daily summary
+queries of the xAxis_groupby charts.
+
+Needs weewx to be importable. Run from the repository root with:
+
+    python -m unittest discover -s tests
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from stub_archive import local_ts, make_archive, make_records
+
+import user.belchertown as belchertown
+
+START_TS = local_ts("2021-11-20")
+TODAY_TS = local_ts("2024-03-15")
+STOP_TS = TODAY_TS + 12 * 3600
+# Days that are missing from the archive until they are backfilled
+GAP = (local_ts("2023-06-10"), local_ts("2023-06-13"))
+
+AGGREGATES = [
+    ("sum", None),
+    ("min", None),
+    ("max", None),
+    ("avg", None),
+    ("avg", "sum"),
+    ("avg", "min"),
+    ("avg", "max"),
+]
+
+
+def groupby_sql(
+    obs_type,
+    xAxis_groupby,
+    aggregate_type,
+    average_type,
+    start_ts,
+    stop_ts,
+    chronological,
+):
+    """The SQLite daily summary query of an xAxis_groupby chart"""
+    strformat = {"month": "%m", "year": "%Y"}[xAxis_groupby]
+    subqry_groupby = {"month": '"%Y%m"', "year": '"%Y"'}[xAxis_groupby]
+    order_sql = " ORDER BY dateTime ASC" if chronological else ""
+    if aggregate_type == "avg" and average_type == "sum":
+        return (
+            'SELECT dt1 AS {0}, AVG(obs1) AS obs FROM (SELECT strftime("{1}", '
+            'datetime(dateTime, "unixepoch", "localtime")) AS dt1, sum(sum) AS obs1 '
+            "FROM archive_day_{2} WHERE dateTime >= {3} AND dateTime < {4} GROUP BY "
+            'strftime({5}, datetime(dateTime, "unixepoch", "localtime"))) '
+            "GROUP BY {0}{6};".format(
+                xAxis_groupby,
+                strformat,
+                obs_type,
+                start_ts,
+                stop_ts,
+                subqry_groupby,
+                order_sql,
+            )
+        )
+    if aggregate_type == "avg" and average_type is not None:
+        select = "avg(%s)" % average_type
+    elif aggregate_type == "avg":
+        select = "SUM(wsum)/SUM(sumtime)"
+    else:
+        select = "{0}({0})".format(aggregate_type)
+    return (
+        'SELECT strftime("{0}", datetime(dateTime, "unixepoch", "localtime")) AS {1}, '
+        "{2} AS obs FROM archive_day_{3} WHERE dateTime >= {4} AND dateTime < {5} "
+        "GROUP BY {1}{6};".format(
+            strformat, xAxis_groupby, select, obs_type, start_ts, stop_ts, order_sql
+        )
+    )
+
+
+class RollupsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.manager = make_archive(
+            os.path.join(self.tmpdir, "weewx.sdb"), START_TS, STOP_TS, skip=[GAP]
+        )
+        self.rollups = belchertown.BelchertownRollups()
+        self.cycle = 0
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.tmpdir)
+
+    def update(self, obs_type, today_ts=TODAY_TS):
+        """Update the rollups for a new report cycle"""
+        self.cycle += 1
+        self.assertTrue(
+            self.rollups.update(self.manager, obs_type, today_ts, self.cycle)
+        )
+
+    def assertMatchesDailySummaries(
+        self, obs_type, start_ts=START_TS, stop_ts=TODAY_TS
+    ):
+        for xAxis_groupby in ("month", "year"):
+            for aggregate_type, average_type in AGGREGATES:
+                for chronological in (True, False):
+                    if (
+                        chronological
+                        and xAxis_groupby == "month"
+                        and stop_ts - start_ts > 366 * 86400
+                    ):
+                        # The months of different years share a label, and
+                        # the query has no order for them. Charts in
+                        # chronological order span a year at most
+                        continue
+                    if chronological and average_type == "sum":
+                        # The subquery has no dateTime to order by
+                        continue
+                    rows = self.rollups.get_groupby(
+                        self.manager,
+                        obs_type,
+                        xAxis_groupby,
+                        aggregate_type,
+                        average_type,
+                        start_ts,
+                        stop_ts,
+                        chronological,
+                    )
+                    expected = list(
+                        self.manager.genSql(
+                            groupby_sql(
+                                obs_type,
+                                xAxis_groupby,
+                                aggregate_type,
+                                average_type,
+                                start_ts,
+                                stop_ts,
+                                chronological,
+                            )
+                        )
+                    )
+                    case = (
+                        obs_type,
+                        xAxis_groupby,
+                        aggregate_type,
+                        average_type,
+                        chronological,
+                    )
+                    self.assertEqual(
+                        [row[0] for row in rows], [row[0] for row in expected], case
+                    )
+                    for (label, value), (_, expected_value) in zip(rows, expected):
+                        self.assertAlmostEqual(
+                            value, expected_value, 9, case + (label,)
+                        )
+
+    def month_days(self, obs_type, month_ts):
+        return self.manager.getSql(
+            "SELECT days FROM belchertown_month_%s WHERE dateTime = ?" % obs_type,
+            (month_ts,),
+        )[0]
+
+    def test_matches_daily_summaries(self):
+        for obs_type in ("outTemp", "rain"):
+            self.update(obs_type)
+            self.assertMatchesDailySummaries(obs_type)
+            # Spans which start and end inside a month or a year
+            self.assertMatchesDailySummaries(
+                obs_type, local_ts("2022-02-11"), local_ts("2023-09-23")
+            )
+            self.assertMatchesDailySummaries(
+                obs_type, local_ts("2022-03-15"), local_ts("2023-03-01")
+            )
+
+    def test_tables(self):
+        self.update("outTemp")
+        tables = self.manager.connection.tables()
+        self.assertIn("belchertown_month_outTemp", tables)
+        self.assertIn("belchertown_year_outTemp", tables)
+        self.assertFalse(
+            [table for table in tables if table.startswith("archive_month")]
+        )
+        # Only complete months and years are stored
+        self.assertEqual(
+            self.rollups.watermarks["outTemp"],
+            (local_ts("2024-03-01"), local_ts("2024-01-01")),
+        )
+
+    def test_incremental(self):
+        # Months and years are added as they close
+        self.update("outTemp", local_ts("2022-12-20"))
+        self.assertEqual(
+            self.rollups.watermarks["outTemp"],
+            (local_ts("2022-12-01"), local_ts("2022-01-01")),
+        )
+        self.update("outTemp")
+        self.assertEqual(
+            self.rollups.watermarks["outTemp"],
+            (local_ts("2024-03-01"), local_ts("2024-01-01")),
+        )
+        self.assertMatchesDailySummaries("outTemp")
+
+        # and aren't read again
+        rows = list(self.manager.genSql("SELECT * FROM belchertown_month_outTemp"))
+        rollups = belchertown.BelchertownRollups()
+        self.assertTrue(rollups.update(self.manager, "outTemp", TODAY_TS, 1))
+        self.assertEqual(
+            list(self.manager.genSql("SELECT * FROM belchertown_month_outTemp")), rows
+        )
+
+    def test_backfill(self):
+        self.update("outTemp")
+        june_ts = local_ts("2023-06-01")
+        days = self.month_days("outTemp", june_ts)
+        # Fill the gap with the days that were missing. The next report
+        # cycle notices the new days and rebuilds the tables
+        self.manager.addRecord(
+            [
+                record
+                for record in make_records(START_TS, STOP_TS)
+                if GAP[0] < record["dateTime"] <= GAP[1]
+            ]
+        )
+        self.update("outTemp")
+        self.assertEqual(self.month_days("outTemp", june_ts), days + 3)
+        self.assertMatchesDailySummaries("outTemp")
+
+    def test_corrected_value(self):
+        self.update("outTemp")
+        day_ts = local_ts("2022-07-04")
+        with belchertown.weedb.Transaction(self.manager.connection) as cursor:
+            cursor.execute(
+                "UPDATE archive_day_outTemp SET max = 150.0 WHERE dateTime = ?",
+                (day_ts,),
+            )
+        # A correction doesn't add or remove days, so it is found when the
+        # values are checked at the start of the next day
+        self.update("outTemp")
+        self.assertNotEqual(
+            self.rollups.get_groupby(
+                self.manager, "outTemp", "year", "max", None, START_TS, TODAY_TS, True
+            )[1][1],
+            150.0,
+        )
+        self.update("outTemp", TODAY_TS + 86400)
+        self.assertEqual(
+            self.rollups.get_groupby(
+                self.manager, "outTemp", "year", "max", None, START_TS, TODAY_TS, True
+            )[1],
+            ("2022", 150.0),
+        )
+        self.assertMatchesDailySummaries("outTemp")
+
+
+if __name__ == "__main__":
+    unittest.main()
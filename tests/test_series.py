@@ -0,0 +1,246 @@
+"""
+Tests for the chart series read by the skin, against weewx.xtypes.get_series().
+
+Needs weewx to be importable. Run from the repository root with:
+
+    python -m unittest discover -s tests
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import configobj
+import weewx.xtypes
+from weeutil.weeutil import TimeSpan
+
+from stub_archive import local_ts, make_archive
+
+import user.belchertown as belchertown
+
+START_TS = local_ts("2023-01-01")
+STOP_TS = local_ts("2023-04-01") + 12 * 3600
+
+OBS_TYPES = ["outTemp", "dewpoint", "rain", "windDir"]
+AGGREGATE_TYPES = ["min", "max", "sum", "count", "avg", "cumulative"]
+
+
+class SeriesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.manager = make_archive(
+            os.path.join(self.tmpdir, "weewx.sdb"), START_TS, STOP_TS
+        )
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.tmpdir)
+
+    def assertSeriesEqual(self, series, expected, msg=None):
+        for value_tuple, expected_tuple in zip(series, expected):
+            self.assertEqual(value_tuple[1:], expected_tuple[1:], msg)
+            self.assertEqual(len(value_tuple[0]), len(expected_tuple[0]), msg)
+            for value, expected_value in zip(value_tuple[0], expected_tuple[0]):
+                if expected_value is None:
+                    self.assertIsNone(value, msg)
+                else:
+                    self.assertAlmostEqual(value, expected_value, 9, msg)
+
+    def test_aggregate_series(self):
+        for timespan, aggregate_interval in (
+            # Hours, so from the archive rows
+            (TimeSpan(local_ts("2023-01-10") + 5 * 3600, local_ts("2023-01-14")), 3600),
+            # Days which don't start at midnight
+            (
+                TimeSpan(local_ts("2023-01-10") + 5 * 3600, local_ts("2023-02-20")),
+                86400,
+            ),
+            # Weeks from midnight, so from the daily summaries, past the end
+            # of the archive
+            (TimeSpan(local_ts("2023-01-02"), local_ts("2023-05-01")), 7 * 86400),
+            # Weeks from midnight, but the last one ends mid-day, so the
+            # daily summaries and the archive rows are both used
+            (
+                TimeSpan(local_ts("2023-01-02"), local_ts("2023-02-10") + 7 * 3600),
+                7 * 86400,
+            ),
+            # Before the start of the archive
+            (TimeSpan(local_ts("2022-12-20"), local_ts("2023-01-05")), 6 * 3600),
+        ):
+            series = belchertown.get_aggregate_series(
+                self.manager, OBS_TYPES, timespan, AGGREGATE_TYPES, aggregate_interval
+            )
+            self.assertEqual(
+                sorted(series),
+                sorted((obs, agg) for obs in OBS_TYPES for agg in AGGREGATE_TYPES),
+            )
+            for (obs_type, aggregate_type), value in series.items():
+                if belchertown.aggregate_series_supported(
+                    self.manager, obs_type, timespan, aggregate_type, aggregate_interval
+                ):
+                    get_series = weewx.xtypes.get_series
+                else:
+                    # The skin leaves these to the weewx daily summaries,
+                    # which group them in one query and end the last
+                    # interval at the last day. Compare with weewx
+                    # aggregating each interval
+                    get_series = weewx.xtypes.ArchiveTable.get_series
+                self.assertSeriesEqual(
+                    value,
+                    get_series(
+                        obs_type,
+                        timespan,
+                        self.manager,
+                        aggregate_type,
+                        aggregate_interval,
+                    ),
+                    (obs_type, aggregate_type, timespan, aggregate_interval),
+                )
+
+    def test_aggregate_series_supported(self):
+        def supported(timespan, aggregate_type, aggregate_interval, obs_type="outTemp"):
+            return belchertown.aggregate_series_supported(
+                self.manager, obs_type, timespan, aggregate_type, aggregate_interval
+            )
+
+        days = TimeSpan(local_ts("2023-01-02"), local_ts("2023-03-01"))
+        hours = TimeSpan(local_ts("2023-01-02") + 3600, local_ts("2023-01-05"))
+        self.assertTrue(supported(hours, "avg", 3600))
+        self.assertTrue(supported(days, "cumulative", 86400))
+        # Not archive columns, or not an aggregation weewx has
+        self.assertFalse(supported(hours, "avg", 3600, "wind"))
+        self.assertFalse(supported(hours, "first", 3600))
+        # The weewx daily summaries already do whole days in one query
+        if "get_series" in vars(weewx.xtypes.DailySummaries):
+            self.assertFalse(supported(days, "avg", 86400))
+
+    def test_archive_series(self):
+        for timespan in (
+            TimeSpan(local_ts("2023-01-10") + 5 * 3600, local_ts("2023-01-14")),
+            # Past either end of the archive
+            TimeSpan(local_ts("2022-12-30"), local_ts("2023-01-02")),
+            TimeSpan(local_ts("2023-03-30"), local_ts("2023-04-05")),
+        ):
+            series = belchertown.get_archive_series(self.manager, OBS_TYPES, timespan)
+            self.assertEqual(sorted(series), sorted(OBS_TYPES))
+            for obs_type, value in series.items():
+                self.assertSeriesEqual(
+                    value,
+                    weewx.xtypes.get_series(obs_type, timespan, self.manager),
+                    (obs_type, timespan),
+                )
+
+    def test_chart_batches(self):
+        # Lines that share the time span, binding and aggregation of their
+        # chart are read together
+        chart = configobj.ConfigObj(
+            [
+                "[day]",
+                "    time_length = 86400",
+                "    [[temperature]]",
+                "        [[[outTemp]]]",
+                "        [[[dewpoint]]]",
+                "        [[[outTempMax]]]",
+                "            observation_type = outTemp",
+                "        [[[rain]]]",
+                "            aggregate_type = sum",
+                "            aggregate_interval = 3600",
+                "        [[[windDir]]]",
+                "            time_length = 3600",
+            ]
+        )
+        plot = belchertown.ChartPlot("temperature", chart["day"]["temperature"])
+        self.assertEqual(plot.batches["outTemp"], ("outTemp", "dewpoint"))
+        self.assertEqual(plot.batches["outTempMax"], ("outTemp", "dewpoint"))
+        self.assertEqual(plot.batches["rain"], ("rain",))
+        self.assertEqual(plot.batches["windDir"], ("windDir",))
+
+    def new_generator(self, grouped_series=True, batch_columns=()):
+        """A chart generator with only what get_series_set() uses"""
+        generator = belchertown.HighchartsJsonGenerator.__new__(
+            belchertown.HighchartsJsonGenerator
+        )
+        generator.series_cache = {}
+        generator.series_cache_stats = {"hits": 0, "misses": 0}
+        generator.grouped_series = grouped_series
+        generator.batch_columns = batch_columns
+        return generator
+
+    def test_series_set(self):
+        timespan = TimeSpan(local_ts("2023-01-10") + 5 * 3600, local_ts("2023-02-20"))
+        for grouped_series in (True, False):
+            generator = self.new_generator(grouped_series, ("outTemp", "dewpoint"))
+            for aggregate_types, aggregate_interval in (
+                ([None], None),
+                (["min", "max", "avg"], 86400),
+            ):
+                case = (grouped_series, aggregate_types)
+                stats = dict(generator.series_cache_stats)
+
+                # A miss reads the series
+                series = generator.get_series_set(
+                    "wx_binding",
+                    ["outTemp"],
+                    timespan,
+                    self.manager,
+                    aggregate_types,
+                    aggregate_interval,
+                )
+                self.assertGreater(
+                    generator.series_cache_stats["misses"], stats["misses"], case
+                )
+                self.assertEqual(generator.series_cache_stats["hits"], stats["hits"])
+                self.assertEqual(
+                    set(series), set(("outTemp", agg) for agg in aggregate_types)
+                )
+                for (obs_type, aggregate_type), value in series.items():
+                    self.assertSeriesEqual(
+                        value,
+                        weewx.xtypes.get_series(
+                            obs_type,
+                            timespan,
+                            self.manager,
+                            aggregate_type,
+                            aggregate_interval,
+                        ),
+                        case + (obs_type, aggregate_type),
+                    )
+
+                # The other line of the batch is a hit, and so is reading
+                # outTemp again. Changing what was returned doesn't change
+                # the cache
+                series[("outTemp", aggregate_types[0])][2][0][0] = -999.0
+                misses = generator.series_cache_stats["misses"]
+                hits = generator.series_cache_stats["hits"]
+                for obs_type in ("dewpoint", "outTemp"):
+                    cached = generator.get_series_set(
+                        "wx_binding",
+                        [obs_type],
+                        timespan,
+                        self.manager,
+                        aggregate_types,
+                        aggregate_interval,
+                    )
+                    for (obs_type, aggregate_type), value in cached.items():
+                        self.assertSeriesEqual(
+                            value,
+                            weewx.xtypes.get_series(
+                                obs_type,
+                                timespan,
+                                self.manager,
+                                aggregate_type,
+                                aggregate_interval,
+                            ),
+                            case + (obs_type, aggregate_type),
+                        )
+                if grouped_series:
+                    self.assertEqual(generator.series_cache_stats["misses"], misses)
+                self.assertEqual(
+                    generator.series_cache_stats["hits"],
+                    hits + (2 if grouped_series else 1) * len(aggregate_types),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
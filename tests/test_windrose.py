@@ -0,0 +1,163 @@
+"""
+Tests for the compass sectors and the windRose speed bins.
+
+Needs weewx to be importable. Run from the repository root with:
+
+    python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+import user.belchertown as belchertown  # noqa: E402
+
+
+class CompassSectorsTest(unittest.TestCase):
+    def compass(self, directions):
+        skin_dict = {"Units": {"Ordinates": {"directions": directions}}}
+        return belchertown.CompassSectors.for_skin(skin_dict)
+
+    def test_default(self):
+        compass = belchertown.CompassSectors.for_skin({"Units": {}})
+        self.assertEqual(compass.count, 16)
+        self.assertEqual(compass.labels, list(belchertown.CompassSectors.default_names))
+        self.assertIs(compass, belchertown.CompassSectors.for_names())
+        # A single name has no sectors
+        with mock.patch.object(belchertown, "logerr") as logerr:
+            self.assertIs(self.compass("N/A"), compass)
+        self.assertEqual(logerr.call_count, 1)
+
+    def test_sectors(self):
+        for directions, names in (
+            (
+                "N, NNE, NE, ENE, E, ESE, SE, SSE, S, SSW, SW, WSW, W, WNW, NW, NNW, N/A".split(
+                    ", "
+                ),
+                {
+                    0: "N",
+                    11.24: "N",
+                    11.25: "NNE",
+                    33.74: "NNE",
+                    33.75: "NE",
+                    180: "S",
+                    348.74: "NNW",
+                    348.75: "N",
+                    360: "N",
+                },
+            ),
+            (
+                ["N", "NE", "E", "SE", "S", "SW", "W", "NW", "-"],
+                {0: "N", 22.49: "N", 22.5: "NE", 67.5: "E", 337.49: "NW", 337.5: "N"},
+            ),
+            (
+                ["Nord", "Est", "Sud", "Ouest", "---"],
+                {0: "Nord", 44.9: "Nord", 45: "Est", 225: "Ouest", 315: "Nord"},
+            ),
+        ):
+            compass = self.compass(directions)
+            self.assertEqual(compass.count, len(compass.labels) - 1)
+            self.assertEqual(compass.width * compass.count, 360)
+            degrees = list(names) + [None]
+            expected = list(names.values()) + [compass.labels[-1]]
+            self.assertEqual([compass.name(degree) for degree in degrees], expected)
+            self.assertEqual(compass.name_list(degrees), expected)
+            self.assertEqual(
+                compass.indexes(degrees),
+                [compass.index(degree) for degree in degrees],
+            )
+            self.assertIsNone(compass.indexes(degrees)[-1])
+
+    def test_windrose(self):
+        # The windrose has a column per sector
+        compass = self.compass(["N", "E", "S", "W", "N/A"])
+        windrose = belchertown.WindRose.for_unit(compass, "knot")
+        rose = windrose.histogram([0, 50, 100, 200, 300], [5, 5, 5, 5, 5])
+        self.assertEqual([len(speed_bin) for speed_bin in rose], [4] * 7)
+        self.assertEqual(rose[2], [5.0, 10.0, 5.0, 5.0])
+
+
+class WindRoseTest(unittest.TestCase):
+    def setUp(self):
+        self.compass = belchertown.CompassSectors.for_names()
+
+    def speed_bin(self, windrose, windSpeed):
+        """The speed bin a northerly wind of windSpeed goes in"""
+        rose = windrose.histogram([0.0], [windSpeed])
+        return [speed_bin[0] for speed_bin in rose].index(round(windSpeed, 1))
+
+    def test_default_bins(self):
+        for unit, (edges, labels) in belchertown.WindRose.speed_bins.items():
+            self.assertEqual(len(labels), len(edges) + 1, unit)
+            windrose = belchertown.WindRose.for_unit(self.compass, unit)
+            # A speed on an edge goes in the bin above it, and the label of
+            # that bin starts at the edge. The beaufort bins keep the labels
+            # the skin has always given them
+            for i, edge in enumerate(edges):
+                self.assertEqual(self.speed_bin(windrose, edge), i + 1, (unit, edge))
+                self.assertEqual(self.speed_bin(windrose, edge - 0.01), i, (unit, edge))
+                if unit != "beaufort":
+                    self.assertTrue(
+                        labels[i + 1].startswith("%g" % edge), (unit, labels[i + 1])
+                    )
+            self.assertEqual(self.speed_bin(windrose, 0.1), 0, unit)
+
+    def test_meter_per_second(self):
+        windrose = belchertown.WindRose.for_unit(self.compass, "meter_per_second")
+        self.assertEqual(windrose.labels[3:5], ("3.4-5.5", "5.6-7.9"))
+        self.assertEqual(windrose.labels[self.speed_bin(windrose, 5.5)], "3.4-5.5")
+        self.assertEqual(windrose.labels[self.speed_bin(windrose, 5.6)], "5.6-7.9")
+        self.assertEqual(windrose.labels[self.speed_bin(windrose, 7.9)], "5.6-7.9")
+        self.assertEqual(windrose.labels[self.speed_bin(windrose, 8)], "8-10.7")
+
+    def test_configured_bins(self):
+        windrose = belchertown.WindRose.for_unit(
+            self.compass, "mile_per_hour", ["10", "2.5", "5"]
+        )
+        self.assertEqual(windrose.edges, (2.5, 5.0, 10.0))
+        self.assertEqual(windrose.labels, ("< 2.5", "2.5-5", "5-10", "10+"))
+        self.assertEqual(self.speed_bin(windrose, 2.4), 0)
+        self.assertEqual(self.speed_bin(windrose, 5), 2)
+        self.assertEqual(self.speed_bin(windrose, 30), 3)
+
+    def test_invalid_bins(self):
+        # Bins that aren't numbers fall back to the defaults of the unit
+        with mock.patch.object(belchertown, "logerr") as logerr:
+            windrose = belchertown.WindRose.for_unit(
+                self.compass, "knot", ["1", "fast", "20"]
+            )
+        self.assertEqual(logerr.call_count, 1)
+        self.assertIn("1, fast, 20", logerr.call_args[0][0])
+        self.assertEqual(
+            (windrose.edges, windrose.labels), belchertown.WindRose.speed_bins["knot"]
+        )
+
+        # and there are none for a unit without default bins
+        with mock.patch.object(belchertown, "logerr") as logerr:
+            self.assertIsNone(
+                belchertown.WindRose.for_unit(self.compass, "foot_per_second", ["x"])
+            )
+        self.assertEqual(logerr.call_count, 1)
+        self.assertIsNone(
+            belchertown.WindRose.for_unit(self.compass, "foot_per_second")
+        )
+
+    def test_histogram(self):
+        windrose = belchertown.WindRose.for_unit(self.compass, "mile_per_hour")
+        rose = windrose.histogram(
+            [0.0, 11.2, 11.3, 350.0, None, 90.0], [3.0, 1.0, 8.0, 25.0, 10.0, None]
+        )
+        self.assertEqual(len(rose), 7)
+        # 11.25 is the edge between N and NNE, and 1 the edge of the 1-3 bin
+        self.assertEqual(rose[1][0], 4.0)
+        self.assertEqual(rose[3][1], 8.0)
+        self.assertEqual(rose[6][0], 25.0)
+        # Samples without a direction or a speed are left out
+        self.assertEqual(sum(map(sum, rose)), 37.0)
+
+
+if __name__ == "__main__":
+    unittest.main()